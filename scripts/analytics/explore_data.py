@@ -1,43 +1,167 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load the combined data
-data_path = "data/processed/merged_user_video_data.csv"
-try:
-    df = pd.read_csv(data_path)
-    print("Data loaded successfully.")
-except Exception as e:
-    print(f"Error loading data: {e}")
-
-# Inspect the first few rows of the data
-print(df.head())
-
-# Check the data types and basic statistics
-print(df.info())
-print(df.describe())
-
-# Visualization of views count distribution
-plt.figure(figsize=(10, 6))
-sns.histplot(df['view_count'], bins=20, kde=True)
-plt.title('Distribution of Video Views')
-plt.xlabel('Views')
-plt.ylabel('Frequency')
-plt.show()
-
-# Top 10 most liked videos
-top_liked_videos = df.sort_values(by='like_count', ascending=False).head(10)
-plt.figure(figsize=(10, 6))
-sns.barplot(x='title', y='like_count', data=top_liked_videos)
-plt.title('Top 10 Most Liked Videos')
-plt.xlabel('Video Title')
-plt.ylabel('Like Count')
-plt.xticks(rotation=90)
-plt.show()
-
-# Correlation heatmap (if numeric columns exist)
-corr = df[['view_count', 'like_count', 'comment_count']].corr()
-plt.figure(figsize=(8, 6))
-sns.heatmap(corr, annot=True, cmap='coolwarm', linewidths=0.5)
-plt.title('Correlation Heatmap between Views, Likes, and Comments')
-plt.show()
+import argparse
+import html
+import os
+import sys
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.exploration import profile_table
+from src.storage import read_table
+
+DATA_PATH = "data/processed/merged_user_video_data.csv"
+CORRELATION_COLUMNS = ['view_count', 'like_count', 'comment_count']
+
+# Interactive exploration of a table small enough to load whole
+def explore_in_memory(data_path=DATA_PATH):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Load the combined data
+    try:
+        df = read_table(data_path)
+        print("Data loaded successfully.")
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return
+
+    # Inspect the first few rows of the data
+    print(df.head())
+
+    # Check the data types and basic statistics
+    print(df.info())
+    print(df.describe())
+
+    # Visualization of views count distribution
+    plt.figure(figsize=(10, 6))
+    sns.histplot(df['view_count'], bins=20, kde=True)
+    plt.title('Distribution of Video Views')
+    plt.xlabel('Views')
+    plt.ylabel('Frequency')
+    plt.show()
+
+    # Top 10 most liked videos
+    top_liked_videos = df.sort_values(by='like_count', ascending=False).head(10)
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x='title', y='like_count', data=top_liked_videos)
+    plt.title('Top 10 Most Liked Videos')
+    plt.xlabel('Video Title')
+    plt.ylabel('Like Count')
+    plt.xticks(rotation=90)
+    plt.show()
+
+    # Correlation heatmap (if numeric columns exist)
+    corr = df[CORRELATION_COLUMNS].corr()
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(corr, annot=True, cmap='coolwarm', linewidths=0.5)
+    plt.title('Correlation Heatmap between Views, Likes, and Comments')
+    plt.show()
+
+# Plot the pre-aggregated histogram, top list and correlation matrix to PNG files
+def _plot_report(profile, output_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plots = {}
+    histogram = profile.histograms['view_count']
+    bins = histogram.to_frame()
+    plt.figure(figsize=(10, 6))
+    plt.bar(bins['lower'], bins['count'], width=bins['upper'] - bins['lower'], align='edge')
+    plt.xscale('log')
+    plt.title('Distribution of Video Views' + (f" ({histogram.zeros} rows with 0 views not shown)"
+                                               if histogram.zeros else ""))
+    plt.xlabel('Views (log-binned)')
+    plt.ylabel('Frequency')
+    plots['view_count_histogram'] = os.path.join(output_dir, "view_count_histogram.png")
+    plt.savefig(plots['view_count_histogram'], bbox_inches='tight')
+    plt.close()
+
+    top_liked_videos = profile.top.to_frame()
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x='title', y='like_count', data=top_liked_videos)
+    plt.title(f'Top {profile.top.n} Most Liked Videos')
+    plt.xlabel('Video Title')
+    plt.ylabel('Like Count')
+    plt.xticks(rotation=90)
+    plots['top_liked_videos'] = os.path.join(output_dir, "top_liked_videos.png")
+    plt.savefig(plots['top_liked_videos'], bbox_inches='tight')
+    plt.close()
+
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(profile.comoments.correlation(), annot=True, cmap='coolwarm', linewidths=0.5)
+    plt.title('Correlation Heatmap between Views, Likes, and Comments')
+    plots['correlation_heatmap'] = os.path.join(output_dir, "correlation_heatmap.png")
+    plt.savefig(plots['correlation_heatmap'], bbox_inches='tight')
+    plt.close()
+    return plots
+
+def write_report(profile, output_dir="reports/exploration"):
+    """
+    Write a profile as a static report: one CSV per aggregate, PNG plots and an index.html.
+
+    Args:
+        profile (TableProfile): Profile computed by profile_table.
+        output_dir (str): Directory for the report files.
+
+    Returns:
+        str: Path of the index.html.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # (file name, heading, table, whether the index holds labels)
+    tables = [
+        ('info', 'Columns', profile.info(), True),
+        ('describe', 'Statistics (quartiles are approximate)', profile.describe(), True),
+        ('top_liked_videos', f'Top {profile.top.n} most liked videos', profile.top.to_frame(), False),
+        ('correlation', 'Correlation between views, likes and comments', profile.comoments.correlation(), True),
+        ('view_count_histogram', 'Views histogram', profile.histograms['view_count'].to_frame(), False),
+    ]
+    for name, _, table, index in tables:
+        table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=index)
+
+    try:
+        plots = _plot_report(profile, output_dir)
+    except ImportError as e:
+        print(f"Plots skipped ({e}); the report only has tables.")
+        plots = {}
+
+    sections = [f"<p>{profile.rows} rows. Statistics are per row, so videos count once per interaction.</p>",
+                "<h2>First rows</h2>", profile.head.to_html() if profile.head is not None else ""]
+    for _, title, table, index in tables:
+        sections += [f"<h2>{html.escape(title)}</h2>", table.to_html(index=index)]
+    sections += [f'<h2>{html.escape(name.replace("_", " ").capitalize())}</h2><img src="{os.path.basename(path)}">'
+                 for name, path in plots.items()]
+    report_path = os.path.join(output_dir, "index.html")
+    with open(report_path, "w") as f:
+        f.write("<html><head><meta charset='utf-8'><title>Data exploration</title></head><body>"
+                "<h1>Data exploration</h1>" + "\n".join(sections) + "</body></html>\n")
+    return report_path
+
+# One streaming pass over the table, then a static report of the aggregates
+def explore_report(data_path=DATA_PATH, output_dir="reports/exploration", chunksize=100_000, top_n=10, columns=None):
+    profile = profile_table(data_path, chunksize=chunksize, columns=columns, histogram_columns=['view_count'],
+                            correlation_columns=CORRELATION_COLUMNS, top_key='like_count', top_n=top_n)
+    print(f"Profiled {profile.rows} rows.")
+    print(profile.describe())
+    report_path = write_report(profile, output_dir)
+    print(f"Report written to {report_path}")
+    return report_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explore the merged user and video data.")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--report", action="store_true",
+                        help="Profile the data in one streaming pass and write a static report instead of "
+                             "loading it whole and showing the plots")
+    parser.add_argument("--output-dir", default="reports/exploration")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--columns", nargs="*", help="Only profile these columns in the report (default: all)")
+    args = parser.parse_args()
+
+    if args.report:
+        explore_report(args.data_path, args.output_dir, chunksize=args.chunksize, columns=args.columns)
+    else:
+        explore_in_memory(args.data_path)
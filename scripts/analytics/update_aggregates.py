@@ -0,0 +1,37 @@
+import os
+import sys
+import yaml
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.aggregates import AnalyticsViews
+from src.instrumentation import export_metrics
+from src.snapshot_store import TrendingSnapshotStore
+from src.spark_engine import build_aggregates_spark, get_processing_engine
+
+# Refresh the engagement, channel-performance and hashtag views from new trending snapshots
+def update_aggregates(snapshot_store_path, state_dir="data/aggregates", output_dir="data/processed",
+                      heavy_hitters=None):
+    views = AnalyticsViews(state_dir, heavy_hitters=heavy_hitters)
+    with TrendingSnapshotStore(snapshot_store_path) as store:
+        updated = views.refresh_from_store(store)
+    views.save()
+    print(f"Updated {updated} videos in the analytics views (watermark {views.watermark})")
+
+    for path in views.write(output_dir):
+        print(f"Saved {path}")
+    return views
+
+if __name__ == "__main__":
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    export_metrics("update_aggregates")
+    if get_processing_engine() == "spark":
+        # Recompute the views on the cluster from the full snapshot history
+        for path in build_aggregates_spark(config["paths"]["snapshot_store"]):
+            print(f"Saved {path}")
+    else:
+        update_aggregates(config["paths"]["snapshot_store"])
@@ -0,0 +1,134 @@
+import argparse
+import functools
+import os
+import sys
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.benchmark import BenchmarkCase, compare_results, load_results, run_suite, save_results
+from src.synthetic_data import write_synthetic_dataset
+
+# Each stage is imported inside its benchmark so the measured process only loads what it runs
+
+def preprocess_user_behavior(data_dir, chunksize=None):
+    from scripts.extract.data_processing.preprocess_user_behavior import preprocess_user_behavior
+    output = os.path.join(data_dir, "out", "preprocessed_user_behavior_data.csv")
+    if preprocess_user_behavior(os.path.join(data_dir, "user_behavior_data.csv"), output,
+                                chunksize=chunksize, engine="pandas") is None:
+        raise RuntimeError("preprocess_user_behavior failed")
+
+def load_merge_inputs(data_dir):
+    from src.storage import read_table
+    return (read_table(os.path.join(data_dir, "user_behavior_data.csv")),
+            read_table(os.path.join(data_dir, "trending_videos.csv")))
+
+def merge_user_video_data(data_dir, inputs):
+    from scripts.user_behavior_processing import merge_user_video_data
+    merge_user_video_data(*inputs)
+
+def load_and_merge_data(data_dir):
+    from scripts.extract.recommendation.recommendation_system import load_and_merge_data
+    from src.id_dictionary import IdDictionaries
+    from src.storage import write_table
+    merged = load_and_merge_data(os.path.join(data_dir, "trending_videos.csv"),
+                                 os.path.join(data_dir, "user_behavior_data.csv"),
+                                 id_dictionaries=IdDictionaries(os.path.join(data_dir, "out", "id_dictionaries")))
+    if merged is None:
+        raise RuntimeError("load_and_merge_data failed")
+    write_table(merged, os.path.join(data_dir, "out", "merged_data.csv"))
+
+def train_svd(data_dir):
+    from scripts.recommendation import train_model
+    from src.id_dictionary import IdDictionaries
+    train_model(os.path.join(data_dir, "user_behavior_data.csv"), os.path.join(data_dir, "out", "svd_model.pkl"),
+                id_dictionaries=IdDictionaries(os.path.join(data_dir, "out", "id_dictionaries")))
+
+def train_als(data_dir):
+    from scripts.recommendation import train_als_model
+    from src.id_dictionary import IdDictionaries
+    train_als_model(os.path.join(data_dir, "user_behavior_data.csv"), os.path.join(data_dir, "out", "als_model.pkl"),
+                    id_dictionaries=IdDictionaries(os.path.join(data_dir, "out", "id_dictionaries")))
+
+def recommend_top_n(data_dir, n_users):
+    # Top-10 for the first n_users users of the ALS artifact written by train_als
+    import numpy as np
+    from src.model_artifact import load_factor_model
+    from src.retrieval import RetrievalEngine
+    model = load_factor_model(os.path.join(data_dir, "out", "als_model.fmodel"))
+    RetrievalEngine(model).top_k(np.asarray(model.user_codes[:n_users]), 10)
+    return min(n_users, len(model.user_codes))
+
+def content_recommend(data_dir):
+    from src.recommendation import recommend, train_model
+    from src.storage import read_table
+    videos = read_table(os.path.join(data_dir, "trending_videos.csv"),
+                        columns=['video_id', 'title', 'description', 'channel_title'])
+    model = train_model(videos, index_dir=os.path.join(data_dir, "out", "content_index"))
+    recommend(model, videos['video_id'].iloc[0])
+    return len(videos)
+
+def cli_startup(data_dir):
+    # Wall time of a fresh `cli.py --help`: interpreter start plus everything imported up front
+    import subprocess
+    subprocess.run([sys.executable, os.path.join(project_root, "scripts", "cli.py"), "--help"],
+                   check=True, capture_output=True)
+
+def build_cases(data_dir, dataset):
+    rows, n_videos = dataset['rows'], dataset['videos_count']
+    return [
+        BenchmarkCase('cli_startup', functools.partial(cli_startup, data_dir)),
+        BenchmarkCase('preprocess_user_behavior', functools.partial(preprocess_user_behavior, data_dir), rows=rows),
+        BenchmarkCase('preprocess_user_behavior_chunked',
+                      functools.partial(preprocess_user_behavior, data_dir, chunksize=250_000), rows=rows),
+        BenchmarkCase('merge_user_video_data', functools.partial(merge_user_video_data, data_dir),
+                      setup=functools.partial(load_merge_inputs, data_dir), rows=rows),
+        BenchmarkCase('load_and_merge_data', functools.partial(load_and_merge_data, data_dir), rows=rows),
+        BenchmarkCase('train_svd', functools.partial(train_svd, data_dir), rows=rows),
+        BenchmarkCase('train_als', functools.partial(train_als, data_dir), rows=rows),
+        BenchmarkCase('recommend_top_n', functools.partial(recommend_top_n, data_dir, 10_000)),
+        BenchmarkCase('content_recommend', functools.partial(content_recommend, data_dir), rows=n_videos),
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on seeded synthetic data.")
+    parser.add_argument("--rows", type=float, default=1e5, help="Interaction rows to generate (10^4 to 10^8)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="*", help="Only run these stages")
+    parser.add_argument("--data-dir", default="data/benchmarks", help="Where datasets and results are kept")
+    parser.add_argument("--baseline", default="data/benchmarks/baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    # Datasets are generated once per (rows, seed) and reused by later runs
+    rows = int(args.rows)
+    dataset_dir = os.path.join(args.data_dir, f"synthetic-{rows}-{args.seed}")
+    dataset_file = os.path.join(dataset_dir, "dataset.json")
+    if os.path.exists(dataset_file):
+        dataset = load_results(dataset_file)
+    else:
+        print(f"Generating {rows} synthetic interactions in {dataset_dir}...")
+        written = write_synthetic_dataset(dataset_dir, rows, seed=args.seed)
+        dataset = {'rows': rows, 'seed': args.seed, 'videos_count': written['videos_count'], 'users': written['users']}
+        save_results(dataset, dataset_file)
+
+    cases = [case for case in build_cases(dataset_dir, dataset) if not args.stages or case.name in args.stages]
+    results = run_suite(cases, dataset)
+    results_path = save_results(results, os.path.join(args.data_dir, "results",
+                                                      f"{results['created_at'].replace(':', '')}.json"))
+    print(f"Results saved to {results_path}")
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = compare_results(results, load_results(args.baseline), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['stage']} {regression['metric']}: {regression['baseline']} -> "
+                  f"{regression['current']} ({regression['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
@@ -0,0 +1,176 @@
+import argparse
+import os
+import sys
+import time
+
+_started = time.perf_counter()
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# Only the standard library is imported up front. Every command imports what it runs
+# inside its handler, so `--help` or `upload` never pay for pandas, scikit-learn,
+# surprise or the YouTube client, and nothing runs at import time.
+
+# Fetch the configured trending chart and store it like the pipeline does
+def fetch(args):
+    from scripts.extract.fetch_trending import fetch_and_store, load_config, setup_logging
+    credentials, config = load_config()
+    setup_logging(args.log_file)
+    videos = fetch_and_store(credentials, config)
+    print(f"Fetched {len(videos)} trending videos.")
+
+# Clean, fill and scale the raw user behavior export
+def preprocess(args):
+    from scripts.extract.data_processing.preprocess_user_behavior import preprocess_user_behavior
+    result = preprocess_user_behavior(args.input, args.output, output_format=args.format,
+                                      chunksize=args.chunksize, n_jobs=args.n_jobs, engine=args.engine)
+    return 0 if result is not None else 1
+
+# Join the trending videos with the preprocessed user behavior
+def merge(args):
+    from scripts.extract.recommendation.recommendation_system import load_and_merge_data
+    from src.spark_engine import get_processing_engine, merge_data_spark
+    from src.storage import get_config_option, get_storage_option, write_table
+    videos = args.videos or get_config_option("paths", "raw_data", "data/raw/trending_videos.csv")
+    layout = args.layout or get_storage_option("merge_layout", "wide")
+    if (args.engine or get_processing_engine()) == "spark":
+        merge_data_spark(videos, args.user_behavior, args.output, layout=layout)
+        print(f"Merged data saved to {args.output}")
+        return 0
+    merged_data = load_and_merge_data(videos, args.user_behavior, layout=layout)
+    if merged_data is None:
+        return 1
+    written_path = merged_data.save(args.output) if layout == "star" else write_table(merged_data, args.output)
+    print(f"Merged data saved to {written_path}")
+    return 0
+
+# Train the SVD (explicit ratings) or implicit ALS recommender
+def train(args):
+    from scripts.recommendation import train_als_model, train_model
+    if args.algorithm == "svd":
+        train_model(args.data, args.output or "models/svd_model.pkl")
+    else:
+        train_als_model(args.data, args.output or "models/als_model.fmodel", score_column=args.score_column,
+                        factors=args.factors, iterations=args.iterations)
+
+# Score one user and video pair, or list the top videos for some users
+def recommend(args):
+    from scripts.recommendation import recommend, recommend_top_n
+    if args.video_id:
+        if len(args.user_ids) != 1:
+            print("--video-id scores exactly one user.", file=sys.stderr)
+            return 2
+        recommend(args.user_ids[0], args.video_id, args.model)
+    else:
+        recommend_top_n(args.user_ids, args.model, n=args.n, nprobe=args.nprobe)
+    return 0
+
+# Upload local files to S3 in parallel
+def upload(args):
+    from scripts.upload.upload_to_s3 import upload_files_to_s3
+    if args.keys and len(args.keys) != len(args.files):
+        print("Give one --keys entry per file.", file=sys.stderr)
+        return 2
+    results = upload_files_to_s3(args.files, args.bucket, args.keys or None, max_workers=args.max_workers)
+    return 1 if any(error is not None for error in results.values()) else 0
+
+# Profile the merged data in one streaming pass and write a static report
+def explore(args):
+    from scripts.analytics.explore_data import explore_report
+    explore_report(args.data_path, args.output_dir, chunksize=args.chunksize, top_n=args.n, columns=args.columns)
+
+# Bring the whole pipeline (or some of its stages) up to date
+def pipeline(args):
+    from scripts.main import build_pipeline
+    try:
+        statuses = build_pipeline(args.max_workers).run(args.stages or None, force=args.force)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for stage, status in statuses.items():
+        print(f"{stage}: {status}")
+    return 1 if any(status in ('failed', 'blocked') for status in statuses.values()) else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="YouTube trending data pipeline.")
+    parser.add_argument("--timings", action="store_true",
+                        help="Print the CLI startup time and the command's run time to stderr")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    command = commands.add_parser("fetch", help="Fetch the trending videos from the YouTube API")
+    command.add_argument("--log-file", default="logs/fetch_trending.log")
+    command.set_defaults(handler=fetch)
+
+    command = commands.add_parser("preprocess", help="Preprocess the raw user behavior data")
+    command.add_argument("--input", default="data/raw/user_behavior_data.csv")
+    command.add_argument("--output", default="data/processed/preprocessed_user_behavior_data.csv")
+    command.add_argument("--format", choices=["parquet", "csv"], help="Defaults to the configured storage format")
+    command.add_argument("--chunksize", type=int, help="Process out of core in chunks of this many rows")
+    command.add_argument("--n-jobs", type=int, default=1, help="Worker processes in chunked mode")
+    command.add_argument("--engine", choices=["pandas", "spark"], help="Defaults to processing.engine")
+    command.set_defaults(handler=preprocess)
+
+    command = commands.add_parser("merge", help="Merge the trending videos with the user behavior data")
+    command.add_argument("--videos", help="Defaults to paths.raw_data")
+    command.add_argument("--user-behavior", default="data/processed/preprocessed_user_behavior_data.csv")
+    command.add_argument("--output", default="data/processed/merged_data.csv")
+    command.add_argument("--layout", choices=["wide", "star"], help="Defaults to storage.merge_layout")
+    command.add_argument("--engine", choices=["pandas", "spark"], help="Defaults to processing.engine")
+    command.set_defaults(handler=merge)
+
+    command = commands.add_parser("train", help="Train a recommendation model")
+    command.add_argument("--algorithm", choices=["svd", "als"], default="als")
+    command.add_argument("--data", default="data/processed/merged_data.csv")
+    command.add_argument("--output", help="Defaults to models/svd_model.pkl or models/als_model.fmodel")
+    command.add_argument("--score-column", default="watch_time", help="Interaction strength column (ALS)")
+    command.add_argument("--factors", type=int, default=64)
+    command.add_argument("--iterations", type=int, default=15)
+    command.set_defaults(handler=train)
+
+    command = commands.add_parser("recommend", help="Recommend videos from a trained model")
+    command.add_argument("user_ids", nargs="+")
+    command.add_argument("--video-id", help="Score this video for the user instead of listing the top videos")
+    command.add_argument("--model", default="models/als_model.fmodel")
+    command.add_argument("-n", type=int, default=10, help="Videos per user")
+    command.add_argument("--nprobe", type=int, help="Use the approximate index, probing this many clusters")
+    command.set_defaults(handler=recommend)
+
+    command = commands.add_parser("upload", help="Upload files to S3")
+    command.add_argument("files", nargs="+")
+    command.add_argument("--bucket", default="youtube-data-singapore")
+    command.add_argument("--keys", nargs="*", help="Object keys, one per file (default: the file paths)")
+    command.add_argument("--max-workers", type=int, default=4)
+    command.set_defaults(handler=upload)
+
+    command = commands.add_parser("explore", help="Write a static exploration report of the merged data")
+    command.add_argument("--data-path", default="data/processed/merged_user_video_data.csv")
+    command.add_argument("--output-dir", default="reports/exploration")
+    command.add_argument("--chunksize", type=int, default=100_000)
+    command.add_argument("-n", type=int, default=10, help="Videos in the most liked list")
+    command.add_argument("--columns", nargs="*", help="Only profile these columns (default: all)")
+    command.set_defaults(handler=explore)
+
+    command = commands.add_parser("pipeline", help="Run the pipeline, skipping up-to-date stages")
+    command.add_argument("stages", nargs="*", help="Stages to bring up to date (default: all)")
+    command.add_argument("--force", action="store_true")
+    command.add_argument("--max-workers", type=int, default=4)
+    command.set_defaults(handler=pipeline)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    startup = time.perf_counter() - _started
+    # Each command exports its metrics to a textfile of its own, e.g. logs/metrics.cli-train.prom
+    from src.instrumentation import export_metrics
+    export_metrics(f"cli-{args.command}")
+    start = time.perf_counter()
+    status = args.handler(args)
+    if args.timings:
+        print(f"startup {startup:.3f}s, {args.command} {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return status or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
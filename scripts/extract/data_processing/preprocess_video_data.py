@@ -1,8 +1,17 @@
+import os
+import sys
 import pandas as pd
 
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.storage import read_table
+
 def preprocess_video_data(file_path):
     try:
-        df = pd.read_csv(file_path)
+        df = read_table(file_path)
         print("Video data loaded successfully.")
     except FileNotFoundError:
         print(f"Error: File {file_path} not found.")
@@ -2,8 +2,25 @@ import json
 import pandas as pd
 import yaml
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import logging
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.instrumentation import count, current_span, export_metrics, instrumented
+from src.snapshot_store import TrendingSnapshotStore
+from src.storage import write_table
+
+# The API returns at most 50 items per page; each videos().list call costs 1 quota unit
+PAGE_SIZE = 50
+VIDEOS_LIST_QUOTA_COST = 1
 
 # Load API credentials and configurations
 def load_config():
@@ -21,55 +38,189 @@ def setup_logging(log_file):
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
 
-# Fetch trending videos
-def fetch_trending_videos(youtube_api_key, region_code, max_results):
-    youtube = build("youtube", "v3", developerKey=youtube_api_key)
-    response = youtube.videos().list(
-        part="snippet,statistics",
-        chart="mostPopular",
-        regionCode=region_code,
-        maxResults=max_results
-    ).execute()
+class QuotaExceededError(RuntimeError):
+    pass
 
-    videos = []
-    for item in response['items']:
-        video_data = {
-            "video_id": item["id"],
-            "title": item["snippet"]["title"],
-            "channel_title": item["snippet"]["channelTitle"],
-            "category_id": item["snippet"]["categoryId"],
-            "published_at": item["snippet"]["publishedAt"],
-            "view_count": item["statistics"].get("viewCount", 0),
-            "like_count": item["statistics"].get("likeCount", 0),
-            "comment_count": item["statistics"].get("commentCount", 0),
-            "description": item["snippet"]["description"]
+# Thread-safe counter of API quota units spent against an optional limit
+class QuotaBudget:
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def spend(self, units):
+        with self._lock:
+            if self.limit is not None and self.used + units > self.limit:
+                raise QuotaExceededError(
+                    f"Quota limit of {self.limit} units reached ({self.used} used)"
+                )
+            self.used += units
+
+# Build a YouTube API client
+def build_youtube_client(youtube_api_key):
+    return build("youtube", "v3", developerKey=youtube_api_key, cache_discovery=False)
+
+# googleapiclient clients are not thread-safe, so keep one client per worker thread
+class YouTubeClientPool:
+    def __init__(self, youtube_api_key=None, client_factory=None):
+        if client_factory is None:
+            client_factory = lambda: build_youtube_client(youtube_api_key)
+        self._client_factory = client_factory
+        self._local = threading.local()
+
+    def get(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._client_factory()
+            self._local.client = client
+        return client
+
+def _parse_video_item(item):
+    return {
+        "video_id": item["id"],
+        "title": item["snippet"]["title"],
+        "channel_title": item["snippet"]["channelTitle"],
+        "category_id": item["snippet"]["categoryId"],
+        "published_at": item["snippet"]["publishedAt"],
+        "view_count": item["statistics"].get("viewCount", 0),
+        "like_count": item["statistics"].get("likeCount", 0),
+        "comment_count": item["statistics"].get("commentCount", 0),
+        "description": item["snippet"]["description"]
+    }
+
+# Yield the raw items of the trending chart for one region, following nextPageToken
+def iter_trending_items(client, region_code, max_results=None, quota=None):
+    page_token = None
+    fetched = 0
+    while True:
+        page_size = PAGE_SIZE if max_results is None else min(PAGE_SIZE, max_results - fetched)
+        if page_size <= 0:
+            return
+        if quota is not None:
+            quota.spend(VIDEOS_LIST_QUOTA_COST)
+        request_args = {
+            "part": "snippet,statistics",
+            "chart": "mostPopular",
+            "regionCode": region_code,
+            "maxResults": page_size,
         }
-        videos.append(video_data)
+        if page_token:
+            request_args["pageToken"] = page_token
+        response = client.videos().list(**request_args).execute()
+        count('api_requests_total', api='youtube', endpoint='videos.list')
+        count('youtube_quota_units_total', VIDEOS_LIST_QUOTA_COST, endpoint='videos.list')
+
+        for item in response.get("items", []):
+            yield item
+            fetched += 1
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
 
+# Fetch trending videos
+def fetch_trending_videos(youtube_api_key, region_code, max_results, client=None):
+    if client is None:
+        client = build_youtube_client(youtube_api_key)
+    videos = [_parse_video_item(item) for item in iter_trending_items(client, region_code, max_results)]
     return pd.DataFrame(videos)
 
-# Save data to CSV
-def save_to_csv(df, file_path):
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    df.to_csv(file_path, index=False)
-    logging.info(f"Data saved to {file_path}")
+# Fetch the trending chart for several regions concurrently.
+# max_workers caps the number of in-flight requests and quota_limit caps the
+# quota units spent by this call. Pass `client` (any object exposing
+# videos().list(...).execute()) to reuse a single client, e.g. a local fake of the API.
+# A region that runs out of quota or fails with an API error keeps the pages it already
+# fetched (the top of its chart) and the other regions carry on; such regions are listed
+# with their error in the result's attrs["incomplete_regions"].
+def fetch_trending_regions(region_codes, youtube_api_key=None, max_results=None,
+                           max_workers=8, quota_limit=None, client=None):
+    quota = QuotaBudget(quota_limit)
+    if client is not None:
+        get_client = lambda: client
+    else:
+        get_client = YouTubeClientPool(youtube_api_key).get
 
-# Main script
-if __name__ == "__main__":
-    credentials, config = load_config()
-    setup_logging("logs/fetch_trending.log")
+    def fetch_region(region_code):
+        rows = []
+        try:
+            for item in iter_trending_items(get_client(), region_code, max_results, quota):
+                row = _parse_video_item(item)
+                row["region_code"] = region_code
+                rows.append(row)
+        except (QuotaExceededError, HttpError, OSError) as e:
+            # The pages fetched so far are already paid for
+            return rows, e
+        return rows, None
 
-    try:
-        logging.info("Fetching trending videos...")
+    videos = []
+    incomplete_regions = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_region, region): region for region in region_codes}
+        for future in as_completed(futures):
+            region_code = futures[future]
+            rows, error = future.result()
+            if error is not None:
+                incomplete_regions[region_code] = str(error)
+                logging.warning(f"Region {region_code} stopped after {len(rows)} videos: {error}")
+            else:
+                logging.info(f"Fetched {len(rows)} trending videos for region {region_code}")
+            videos.extend(rows)
+
+    logging.info(f"Fetched {len(videos)} trending videos across {len(region_codes)} regions "
+                 f"using {quota.used} quota units")
+    videos_df = pd.DataFrame(videos)
+    videos_df.attrs["incomplete_regions"] = incomplete_regions
+    return videos_df
+
+# Save data as a Parquet dataset (or CSV when format="csv" / storage.format is csv)
+def save_to_csv(df, file_path, format=None):
+    partition_cols = ["region_code"] if "region_code" in df.columns else None
+    written_path = write_table(df, file_path, format=format, partition_cols=partition_cols)
+    logging.info(f"Data saved to {written_path}")
+
+# Fetch the configured chart, append it to the snapshot store and save it as the raw data
+@instrumented()
+def fetch_and_store(credentials, config):
+    logging.info("Fetching trending videos...")
+    youtube_config = config["youtube"]
+    if youtube_config.get("region_codes"):
+        videos_df = fetch_trending_regions(
+            region_codes=youtube_config["region_codes"],
+            youtube_api_key=credentials["youtube_api_key"],
+            max_results=youtube_config.get("max_results"),
+            max_workers=youtube_config.get("max_workers", 8),
+            quota_limit=youtube_config.get("quota_limit")
+        )
+    else:
         videos_df = fetch_trending_videos(
             youtube_api_key=credentials["youtube_api_key"],
-            region_code=config["youtube"]["region_code"],
-            max_results=config["youtube"]["max_results"]
+            region_code=youtube_config["region_code"],
+            max_results=youtube_config.get("max_results")
         )
+    for region_code, error in videos_df.attrs.get("incomplete_regions", {}).items():
+        logging.warning(f"Storing the partial chart of region {region_code} ({error})")
 
-        logging.info("Saving trending videos to CSV...")
-        save_to_csv(videos_df, config["paths"]["raw_data"])
+    logging.info("Appending trending snapshot to the snapshot store...")
+    with TrendingSnapshotStore(config["paths"]["snapshot_store"]) as store:
+        if "region_code" in videos_df.columns:
+            for region_code, region_df in videos_df.groupby("region_code"):
+                store.append(region_df.drop(columns=["region_code"]), region_code)
+        else:
+            store.append(videos_df, youtube_config["region_code"])
+        logging.info(f"Snapshot store watermark is now {store.watermark()}")
 
+    logging.info("Saving trending videos...")
+    save_to_csv(videos_df, config["paths"]["raw_data"])
+    current_span().add(rows_in=len(videos_df))
+    return videos_df
+
+# Main script
+if __name__ == "__main__":
+    credentials, config = load_config()
+    setup_logging("logs/fetch_trending.log")
+    export_metrics("fetch_trending")
+
+    try:
+        fetch_and_store(credentials, config)
         logging.info("Process completed successfully!")
     except Exception as e:
         logging.error(f"Error occurred: {e}")
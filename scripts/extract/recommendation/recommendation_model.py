@@ -1,36 +1,72 @@
-import pandas as pd
-from surprise import SVD, Dataset, Reader
-from surprise.model_selection import train_test_split, accuracy
-
-# Load the merged data from CSV
-merged_data_path = 'data/processed/merged_data.csv'
-merged_data = pd.read_csv(merged_data_path)
-
-# Check if the merged data was loaded correctly
-if merged_data is None or merged_data.empty:
-    raise ValueError("Merged data is empty or not loaded correctly.")
-
-# Create an interaction matrix
-# Here, using 'watch_time' as the interaction score, adjust as necessary
-merged_data['interaction_score'] = merged_data['watch_time']
-
-# Prepare data for the 'surprise' library
-interaction_data = merged_data[['user_id', 'video_id', 'interaction_score']]
-reader = Reader(rating_scale=(0, 100))  # Adjust scale based on your data range
-data = Dataset.load_from_df(interaction_data, reader)
-
-# Train-test split
-trainset, testset = train_test_split(data, test_size=0.2)
-
-# Collaborative filtering model using SVD (Singular Value Decomposition)
-model = SVD()
-model.fit(trainset)
-
-# Make predictions and evaluate the model
-predictions = model.test(testset)
-rmse = accuracy.rmse(predictions)
-print(f"RMSE of the collaborative filtering model: {rmse:.2f}")
-
-# Example prediction: estimating interaction score for a user and video pair
-predicted_score = model.predict('user123', 'abc123')
-print(f"Predicted interaction score for user123 and video abc123: {predicted_score.est:.2f}")
+import os
+import sys
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.storage import read_table
+from src.id_dictionary import IdDictionaries
+
+def train_interaction_model(merged_data_path='data/processed/merged_data.csv', id_dictionaries=None):
+    """
+    Train an SVD collaborative filtering model on the watch time of the merged data.
+
+    Args:
+        merged_data_path (str): Merged data (CSV file or Parquet dataset).
+        id_dictionaries (IdDictionaries, optional): Shared id dictionaries. Defaults to the
+            dictionaries under data/id_dictionaries.
+
+    Returns:
+        tuple: The fitted surprise SVD model and its test RMSE.
+    """
+    # surprise is only loaded when a model is actually trained
+    from surprise import SVD, Dataset, Reader, accuracy
+    from surprise.model_selection import train_test_split
+
+    # Load the merged data, only the columns the model needs
+    merged_data = read_table(merged_data_path, columns=['user_id', 'video_id', 'watch_time'])
+
+    # Check if the merged data was loaded correctly
+    if merged_data is None or merged_data.empty:
+        raise ValueError("Merged data is empty or not loaded correctly.")
+
+    # Create an interaction matrix
+    # Here, using 'watch_time' as the interaction score, adjust as necessary
+    merged_data['interaction_score'] = merged_data['watch_time']
+
+    # Map the ids to dense integer codes shared with the merge step
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(merged_data)
+    id_dictionaries.save()
+    merged_data = merged_data[(merged_data['user_code'] >= 0) & (merged_data['video_code'] >= 0)]
+
+    # Prepare data for the 'surprise' library
+    interaction_data = merged_data[['user_code', 'video_code', 'interaction_score']]
+    reader = Reader(rating_scale=(0, 100))  # Adjust scale based on your data range
+    data = Dataset.load_from_df(interaction_data, reader)
+
+    # Train-test split
+    trainset, testset = train_test_split(data, test_size=0.2)
+
+    # Collaborative filtering model using SVD (Singular Value Decomposition)
+    model = SVD()
+    model.fit(trainset)
+
+    # Make predictions and evaluate the model
+    predictions = model.test(testset)
+    rmse = accuracy.rmse(predictions)
+    print(f"RMSE of the collaborative filtering model: {rmse:.2f}")
+    return model, rmse
+
+if __name__ == "__main__":
+    model, rmse = train_interaction_model()
+
+    # Example prediction: estimating interaction score for a user and video pair
+    id_dictionaries = IdDictionaries()
+    user_code = int(id_dictionaries.encode_values('user_id', ['user123'], add=False)[0])
+    video_code = int(id_dictionaries.encode_values('video_id', ['abc123'], add=False)[0])
+    predicted_score = model.predict(user_code, video_code)
+    print(f"Predicted interaction score for user123 and video abc123: {predicted_score.est:.2f}")
@@ -1,76 +1,98 @@
+import os
+import sys
 import pandas as pd
-import re
 
-def load_and_merge_data(video_metadata_path, user_behavior_path):
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.storage import get_storage_option, read_table, write_table
+from src.star_schema import build_star
+from src.id_dictionary import IdDictionaries
+from src.spark_engine import get_processing_engine, merge_data_spark
+from src.instrumentation import debug_preview, instrumented
+
+# Tables handed over in memory (e.g. by the pipeline runner) are copied, since the id
+# columns are normalized in place
+def _load_table(table):
+    return table.copy() if isinstance(table, pd.DataFrame) else read_table(table)
+
+@instrumented()
+def load_and_merge_data(video_metadata_path, user_behavior_path, id_dictionaries=None, layout="wide"):
     """
     Load and merge video metadata and user behavior data.
     
     Args:
-        video_metadata_path (str): Path to the video metadata CSV file.
-        user_behavior_path (str): Path to the user behavior data CSV file.
+        video_metadata_path (str or pd.DataFrame): Path to the video metadata CSV file or Parquet
+            dataset, or the already loaded table (left unmodified).
+        user_behavior_path (str or pd.DataFrame): Path to the user behavior data CSV file or
+            Parquet dataset, or the already loaded table (left unmodified).
+        id_dictionaries (IdDictionaries, optional): Persistent user_id/video_id dictionaries.
+            New ids are added and saved. Defaults to the dictionaries under data/id_dictionaries.
+        layout (str): "wide" returns the joined DataFrame; "star" returns a StarView that keeps
+            the video metadata once per video and joins it to the interactions on demand.
     
     Returns:
-        pd.DataFrame: Merged DataFrame containing video metadata and user behavior data.
+        pd.DataFrame: Merged DataFrame containing video metadata and user behavior data,
+        with int32 `video_code`/`user_code` columns from the id dictionaries
+        (a StarView when layout="star").
     """
     try:
         # Load video metadata
-        video_metadata = pd.read_csv(video_metadata_path)
+        video_metadata = _load_table(video_metadata_path)
         if video_metadata.empty:
             raise ValueError("Video metadata file is empty or contains no columns.")
         print("Video metadata loaded successfully.")
-        print(f"Columns in video metadata: {video_metadata.columns.tolist()}")
+        debug_preview("Columns in video metadata:", lambda: video_metadata.columns.tolist())
 
         # Load user behavior data
-        user_behavior = pd.read_csv(user_behavior_path)
+        user_behavior = _load_table(user_behavior_path)
         if user_behavior.empty:
             raise ValueError("User behavior data file is empty or contains no columns.")
         print("User behavior data loaded successfully.")
-        print(f"Columns in user behavior data: {user_behavior.columns.tolist()}")
-
-        # Preview original data before any processing
-        print("\nOriginal preview of video metadata:")
-        print(video_metadata.head())
-
-        print("\nOriginal preview of user behavior data:")
-        print(user_behavior.head())
+        debug_preview("Columns in user behavior data:", lambda: user_behavior.columns.tolist())
 
-        # Standardize video_id columns
-        def standardize_video_id(video_id):
-            if pd.isnull(video_id):
-                return None  # Handle NaN values
-            return re.sub(r'[^a-zA-Z0-9]', '', str(video_id)).lower()
+        # Preview original data before any processing (only with instrumentation.debug)
+        debug_preview("\nOriginal preview of video metadata:", video_metadata.head)
+        debug_preview("\nOriginal preview of user behavior data:", user_behavior.head)
 
-        video_metadata['video_id'] = video_metadata['video_id'].apply(standardize_video_id)
-        user_behavior['video_id'] = user_behavior['video_id'].apply(standardize_video_id)
+        # Standardize the id columns and map them to dense integer codes
+        if id_dictionaries is None:
+            id_dictionaries = IdDictionaries()
+        id_dictionaries.encode_frame(video_metadata)
+        id_dictionaries.encode_frame(user_behavior)
+        id_dictionaries.save()
 
         # Drop rows with NaN video_id in user behavior data
-        user_behavior = user_behavior.dropna(subset=['video_id'])
+        user_behavior = user_behavior[user_behavior['video_code'] >= 0]
 
         # Print unique video IDs after standardization
-        print("\nUnique video IDs in video metadata after standardization:")
-        print(video_metadata['video_id'].unique())
-
-        print("\nUnique video IDs in user behavior data after standardization:")
-        print(user_behavior['video_id'].unique())
+        debug_preview("\nUnique video IDs in video metadata after standardization:",
+                      lambda: video_metadata['video_id'].unique())
+        debug_preview("\nUnique video IDs in user behavior data after standardization:",
+                      lambda: user_behavior['video_id'].unique())
 
         # Identify missing video_ids
-        missing_in_metadata = user_behavior[~user_behavior['video_id'].isin(video_metadata['video_id'])]['video_id']
-        missing_in_behavior = video_metadata[~video_metadata['video_id'].isin(user_behavior['video_id'])]['video_id']
-
-        if not missing_in_metadata.empty:
-            print("\nvideo_ids in user behavior data not in video metadata:")
-            print(missing_in_metadata)
-
-        if not missing_in_behavior.empty:
-            print("\nvideo_ids in video metadata not in user behavior data:")
-            print(missing_in_behavior)
+        debug_preview("\nvideo_ids in user behavior data not in video metadata:", lambda: user_behavior[
+            ~user_behavior['video_code'].isin(video_metadata['video_code'])]['video_id'])
+        debug_preview("\nvideo_ids in video metadata not in user behavior data:", lambda: video_metadata[
+            ~video_metadata['video_code'].isin(user_behavior['video_code'])]['video_id'])
 
         # Merge the data
-        merged_data = pd.merge(video_metadata, user_behavior, on='video_id', how='inner')
+        if layout == "star":
+            star = build_star(user_behavior, video_metadata)
+            if star.facts().empty:
+                raise ValueError("Merging resulted in an empty dataset. Check 'video_id' consistency.")
+            print("Data merged successfully into interaction and video tables.")
+            return star
+
+        # Join on the integer codes; the normalized video_id string comes from the metadata side
+        merged_data = pd.merge(video_metadata, user_behavior.drop(columns=['video_id']), on='video_code', how='inner')
         if merged_data.empty:
             raise ValueError("Merging resulted in an empty dataset. Check 'video_id' consistency.")
         print("Data merged successfully.")
-        print(f"Columns in merged data: {merged_data.columns.tolist()}")
+        debug_preview("Columns in merged data:", lambda: merged_data.columns.tolist())
         
         return merged_data
 
@@ -82,16 +104,22 @@ def load_and_merge_data(video_metadata_path, user_behavior_path):
 if __name__ == "__main__":
     video_metadata_path = 'data/processed/video_metadata.csv'  # Path to video metadata
     user_behavior_path = 'data/processed/preprocessed_user_behavior_data.csv'  # Path to preprocessed user behavior data
+    merged_data_path = 'data/processed/merged_data.csv'
 
-    merged_data = load_and_merge_data(video_metadata_path, user_behavior_path)
-
-    if merged_data is not None and not merged_data.empty:
-        # Proceed with further processing if data is successfully loaded and merged
-        print("Proceeding with recommendation system processing...")
+    layout = get_storage_option("merge_layout", "wide")
+    if get_processing_engine() == "spark":
+        # The Spark engine reads both inputs and writes the merged output itself
+        merge_data_spark(video_metadata_path, user_behavior_path, merged_data_path, layout=layout)
     else:
-        print("Data merging failed. Please check the debug outputs for issues.")
-        
-    # Add this part at the end of the merge function
-merged_data_path = 'data/processed/merged_data.csv'
-merged_data.to_csv(merged_data_path, index=False)
-print(f"Merged data saved to {merged_data_path}")
+        merged_data = load_and_merge_data(video_metadata_path, user_behavior_path, layout=layout)
+
+        if merged_data is not None:
+            # Proceed with further processing if data is successfully loaded and merged
+            print("Proceeding with recommendation system processing...")
+            if layout == "star":
+                written_path = merged_data.save(merged_data_path)
+            else:
+                written_path = write_table(merged_data, merged_data_path)
+            print(f"Merged data saved to {written_path}")
+        else:
+            print("Data merging failed. Please check the debug outputs for issues.")
@@ -1,30 +1,127 @@
+import argparse
 import os
 import sys
 
-# Dynamically add the project root directory to sys.path
+# Make the shared modules in src/ importable when run as a script
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(project_root)
+if project_root not in sys.path:
+    sys.path.append(project_root)
 
-# Print the sys.path for debugging
-print("Updated sys.path:")
-for path in sys.path:
-    print(path)
+from src.instrumentation import export_metrics
+from src.pipeline import Artifact, Pipeline, Stage
+from src.storage import get_config_option
 
-# Import modules from src
-from src.data_preprocessing import preprocess_data
-from src.recommendation import train_model, recommend
+# The stage functions import their scripts lazily, so skipped stages never load
+# the YouTube client, scikit-learn or boto3
 
-# Sample data to process (replace this with your actual data)
-data = "raw data"
+# Fetch the configured trending chart (always runs: the chart changes between runs)
+def fetch_trending():
+    from scripts.extract.fetch_trending import fetch_and_store, load_config
+    credentials, config = load_config()
+    return fetch_and_store(credentials, config)
 
-# Call the preprocessing function
-processed_data = preprocess_data(data)
-print("Data after preprocessing:", processed_data)
+# Clean, fill and scale the raw user behavior export
+def preprocess_user_behavior(user_behavior_raw, output_path):
+    from scripts.extract.data_processing.preprocess_user_behavior import preprocess_user_behavior
+    result = preprocess_user_behavior(user_behavior_raw, output_path)
+    if result is None:
+        raise RuntimeError("User behavior preprocessing failed.")
+    # The Spark engine only returns the path it wrote
+    return result if hasattr(result, 'columns') else None
 
-# Train the model
-model = train_model(processed_data)
-print("Model:", model)
+# Join the trending videos with the preprocessed behavior on the shared video codes
+def load_and_merge_data(trending_videos, user_behavior, output_path):
+    from scripts.extract.recommendation.recommendation_system import load_and_merge_data
+    from src.storage import write_table
+    merged_data = load_and_merge_data(trending_videos, user_behavior)
+    if merged_data is None:
+        raise RuntimeError("Merging video metadata and user behavior failed.")
+    write_table(merged_data, output_path)
+    return merged_data
 
-# Make recommendations
-recommendations = recommend(model, processed_data)
-print("Recommendations:", recommendations)
+# Train the implicit ALS recommender on the merged interactions
+def train_model(merged_data, model_output, score_column):
+    from scripts.recommendation import train_als_model
+    return train_als_model(merged_data, model_output, score_column=score_column)
+
+# Index the text of the trending videos and write the most similar videos of each one
+def content_recommendations(trending_videos, index_dir, output_path, k):
+    from src.recommendation import recommend_all, train_model
+    model = train_model(trending_videos, index_dir)
+    return recommend_all(model, trending_videos['video_id'], k=k, output_path=output_path)
+
+# Stream the trending videos to S3
+def upload_to_s3(trending_videos, bucket_name, key):
+    from src.s3_sink import upload_dataframe
+    bytes_uploaded = upload_dataframe(trending_videos, bucket_name, key)
+    print(f"Uploaded {bytes_uploaded} bytes to {bucket_name}/{key}")
+
+# Source files a stage runs, part of its fingerprint
+def _sources(*paths):
+    return [os.path.join(project_root, path) for path in paths]
+
+def build_pipeline(max_workers=4):
+    raw_data = get_config_option("paths", "raw_data", "data/raw/trending_videos.csv")
+    user_behavior_path = 'data/processed/preprocessed_user_behavior_data.csv'
+    merged_data_path = 'data/processed/merged_data.csv'
+    model_output = 'models/als_model.fmodel'
+    recommendations_path = 'data/processed/recommendations.csv'
+
+    stages = [
+        Stage('fetch_trending', fetch_trending,
+              outputs=[Artifact('trending_videos', raw_data, 'table')],
+              config=['youtube', 'paths', 'storage'],
+              code=_sources('scripts/extract/fetch_trending.py', 'src/snapshot_store.py'),
+              always_run=True),
+        Stage('preprocess_user_behavior', preprocess_user_behavior,
+              inputs=['user_behavior_raw'],
+              outputs=[Artifact('user_behavior', user_behavior_path, 'table')],
+              params={'output_path': user_behavior_path},
+              config=['storage', 'processing'],
+              code=_sources('scripts/extract/data_processing/preprocess_user_behavior.py',
+                             'src/streaming_preprocessing.py')),
+        Stage('load_and_merge_data', load_and_merge_data,
+              inputs=['trending_videos', 'user_behavior'],
+              outputs=[Artifact('merged_data', merged_data_path, 'table')],
+              params={'output_path': merged_data_path},
+              config=['storage'],
+              code=_sources('scripts/extract/recommendation/recommendation_system.py', 'src/id_dictionary.py')),
+        Stage('train_model', train_model,
+              inputs=['merged_data'],
+              outputs=[Artifact('model', model_output, 'model')],
+              params={'model_output': model_output, 'score_column': 'watch_time'},
+              code=_sources('scripts/recommendation.py', 'src/als.py', 'src/incremental.py',
+                            'src/model_artifact.py')),
+        Stage('content_recommendations', content_recommendations,
+              inputs=['trending_videos'],
+              outputs=[Artifact('content_recommendations', recommendations_path, 'table')],
+              params={'index_dir': 'data/content_index', 'output_path': recommendations_path, 'k': 10},
+              config=['storage'],
+              code=_sources('src/recommendation.py', 'src/content_similarity.py')),
+        Stage('upload_to_s3', upload_to_s3,
+              inputs=['trending_videos'],
+              params={'bucket_name': 'youtube-data-singapore', 'key': 'data/raw/trending_videos.csv'},
+              code=_sources('src/s3_sink.py')),
+    ]
+    # The raw user behavior export is not produced by any stage; see paths.user_behavior_raw
+    user_behavior_raw = get_config_option("paths", "user_behavior_raw", "data/raw/user_behavior_data.csv")
+    sources = [Artifact('user_behavior_raw', user_behavior_raw, 'file')]
+    return Pipeline(stages, sources=sources, max_workers=max_workers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose outputs are up to date.")
+    parser.add_argument("stages", nargs="*", help="Stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="store_true", help="Rerun the selected stages even if they are up to date")
+    parser.add_argument("--max-workers", type=int, default=4, help="Stages run concurrently")
+    args = parser.parse_args()
+
+    export_metrics("pipeline")
+    try:
+        statuses = build_pipeline(args.max_workers).run(args.stages or None, force=args.force)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for stage, status in statuses.items():
+        print(f"{stage}: {status}")
+    if any(status in ('failed', 'blocked') for status in statuses.values()):
+        sys.exit(1)
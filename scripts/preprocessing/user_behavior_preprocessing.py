@@ -1,40 +1,69 @@
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-import numpy as np
+import os
+import sys
 
-def preprocess_user_behavior(data_path, save_path):
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.storage import read_table, write_table
+from src.streaming_preprocessing import preprocess_user_behavior_frame, preprocess_user_behavior_streaming
+from src.spark_engine import get_processing_engine, preprocess_user_behavior_spark
+from src.instrumentation import debug_preview, instrumented
+
+@instrumented()
+def preprocess_user_behavior(data_path, output_path, output_format=None, chunksize=None, n_jobs=1,
+                             stats_path=None, refit=True, engine=None):
     """
     Preprocess user behavior data: handle missing values, normalize, and scale features.
 
     Args:
         data_path (str): Path to the user behavior data CSV file.
-        save_path (str): Path to save the preprocessed user behavior data.
+        output_path (str): Path to save the preprocessed user behavior data.
+        output_format (str, optional): 'parquet' or 'csv'. Defaults to the configured storage format.
+        chunksize (int, optional): Process the data out of core in chunks of this many rows.
+            The statistics are fitted in a first pass and applied in a second one.
+        n_jobs (int): Worker processes used per pass in chunked mode.
+        stats_path (str, optional): JSON file where chunked mode saves the fitted statistics.
+        refit (bool): In chunked mode, set to False to reuse the statistics in stats_path.
+        engine (str, optional): 'pandas' or 'spark'. Defaults to `processing.engine` in config.yaml.
 
     Returns:
-        pd.DataFrame: Preprocessed user behavior DataFrame.
+        pd.DataFrame: Preprocessed user behavior DataFrame, or the fitted
+        UserBehaviorStats in chunked mode (the data itself is streamed to output_path), or the
+        path written by the Spark engine.
     """
+    if (engine or get_processing_engine()) == "spark":
+        try:
+            return preprocess_user_behavior_spark(data_path, output_path, output_format=output_format)
+        except Exception as e:
+            print(f"Error preprocessing user behavior data: {e}")
+            return None
+
+    if chunksize:
+        try:
+            stats = preprocess_user_behavior_streaming(data_path, output_path, stats_path=stats_path,
+                                                       chunksize=chunksize, n_jobs=n_jobs,
+                                                       output_format=output_format, refit=refit)
+            print("User behavior data preprocessing completed in chunked mode.")
+            return stats
+        except Exception as e:
+            print(f"Error preprocessing user behavior data: {e}")
+            return None
+
     try:
         # Load the user behavior data
-        df = pd.read_csv(data_path)
+        df = read_table(data_path)
         print("User behavior data loaded successfully.")
-        
-        # Display the columns
-        print(f"Columns available in the dataset: {df.columns.tolist()}")
-
-        # Handle missing values
-        numeric_cols = ['watch_time', 'average_view_duration', 'likes', 'dislikes',
-                        'comments', 'CTR', 'shares', 'audience_retention']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].fillna(df[col].median())
+        debug_preview("Columns available in the dataset:", lambda: df.columns.tolist())
 
-        # Normalize and scale features
-        scaler = MinMaxScaler()
-        df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
+        # Strip '%' from percentage columns, fill missing values with the median and
+        # min-max scale, as the chunked and Spark paths do
+        df, _ = preprocess_user_behavior_frame(df)
 
         # Save the preprocessed data
-        df.to_csv(save_path, index=False)
-        print(f"Preprocessed data saved to {save_path}")
+        written_path = write_table(df, output_path, format=output_format)
+        print(f"Preprocessed data saved to {written_path}")
 
         print("User behavior data preprocessing completed.")
         return df
@@ -46,5 +75,5 @@ def preprocess_user_behavior(data_path, save_path):
 # Example usage
 if __name__ == "__main__":
     data_path = "data/processed/user_behavior_data.csv"
-    save_path = "data/processed/preprocessed_user_behavior_data.csv"
-    preprocess_user_behavior(data_path, save_path)
+    output_path = "data/processed/preprocessed_user_behavior_data.csv"
+    preprocess_user_behavior(data_path, output_path)
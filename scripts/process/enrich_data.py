@@ -1,11 +1,15 @@
-import io
-import pandas as pd
-import boto3
+import os
+import sys
 
-# Function to upload a DataFrame to S3
-def upload_to_s3(df, bucket_name, file_key):
-    csv_buffer = io.StringIO()  # Creates an in-memory text stream
-    df.to_csv(csv_buffer, index=False)  # Writes the DataFrame to the buffer
-    csv_buffer.seek(0)  # Moves the buffer position to the start of the data
-    s3 = boto3.client('s3')  # Create an S3 client
-    s3.put_object(Bucket=bucket_name, Body=csv_buffer.getvalue(), Key=file_key)  # Uploads to S3
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.s3_sink import upload_dataframe
+
+# Function to upload a DataFrame to S3.
+# The DataFrame is serialized in chunks straight into a multipart upload, so memory
+# stays bounded by the part size; use format="parquet" or compression="gzip" to shrink it.
+def upload_to_s3(df, bucket_name, file_key, format="csv", compression=None, client=None):
+    return upload_dataframe(df, bucket_name, file_key, format=format, compression=compression, client=client)
@@ -1,13 +1,39 @@
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
-from surprise import accuracy
-import pandas as pd
+import os
+import sys
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# Only the numpy-based serving modules are imported here; training, search and the id
+# dictionaries (pandas) are imported by the functions that need them
+from src.factor_model import FactorModel
+from src.model_artifact import ARTIFACT_EXTENSION, artifact_path_for, load_ids, load_model, load_seen_items, read_header
+from src.retrieval import RetrievalEngine, SeenItems
+from src.instrumentation import instrumented
+
+@instrumented()
+def train_model(data_file, model_output, id_dictionaries=None):
+    # surprise is only needed to train the SVD model; serving reads the compact artifact
+    from surprise import Dataset, Reader, SVD, accuracy
+    from surprise.model_selection import train_test_split
+    from src.id_dictionary import IdDictionaries
+    from src.incremental import publish_model
+    from src.storage import read_table
 
-def train_model(data_file, model_output):
     # Load preprocessed data
-    df = pd.read_csv(data_file)
+    df = read_table(data_file, columns=['user_id', 'video_id', 'rating'])
+
+    # Train on dense integer codes instead of the raw id strings
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(df)
+    id_dictionaries.save()
+    df = df[(df['user_code'] >= 0) & (df['video_code'] >= 0)]
+
     reader = Reader(rating_scale=(0, 1))
-    data = Dataset.load_from_df(df[['user_id', 'video_id', 'rating']], reader)
+    data = Dataset.load_from_df(df[['user_code', 'video_code', 'rating']], reader)
 
     # Split data into train and test sets
     trainset, testset = train_test_split(data, test_size=0.25)
@@ -20,20 +46,198 @@ def train_model(data_file, model_output):
     predictions = algo.test(testset)
     print("RMSE:", accuracy.rmse(predictions))
 
-    # Save the trained model
+    # Save the trained model; write then rename so a running server never loads a partial file
     import joblib
-    joblib.dump(algo, model_output)
+    os.makedirs(os.path.dirname(model_output) or ".", exist_ok=True)
+    tmp_output = f"{model_output}.tmp"
+    joblib.dump(algo, tmp_output)
+    os.replace(tmp_output, model_output)
     print(f"Model saved to {model_output}")
 
-def recommend(user_id, video_id, model_path):
-    # Load the trained model
-    import joblib
-    algo = joblib.load(model_path)
+    # Export the compact memory-mappable artifact used for serving
+    model = FactorModel.from_surprise(algo)
+    artifact_path = publish_model(model, artifact_path_for(model_output), metadata={"algorithm": "svd"},
+                                  full_retrain=True, seen=SeenItems.from_surprise_trainset(model, algo.trainset),
+                                  id_dictionaries=id_dictionaries)
+    print(f"Model artifact saved to {artifact_path}")
+
+@instrumented()
+def train_als_model(data_file, model_output, score_column='rating', factors=64, iterations=15,
+                    regularization=0.01, alpha=40.0, id_dictionaries=None):
+    import pandas as pd
+    from src.als import ImplicitALS
+    from src.id_dictionary import IdDictionaries
+    from src.incremental import publish_model
+    from src.storage import read_table
+
+    # Load the interactions (or take them from an in-memory table); the score column is
+    # treated as implicit feedback strength
+    columns = ['user_id', 'video_id', score_column]
+    df = data_file[columns].copy() if isinstance(data_file, pd.DataFrame) else read_table(data_file, columns=columns)
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(df)
+    id_dictionaries.save()
+
+    # Train implicit ALS on a CSR confidence matrix using all cores
+    als = ImplicitALS(factors=factors, iterations=iterations, regularization=regularization, alpha=alpha)
+    model = als.fit(df['user_code'].to_numpy(), df['video_code'].to_numpy(), df[score_column].to_numpy())
+
+    # Save in the same compact artifact format the SVD path serves from
+    seen = SeenItems.from_codes(model, df['user_code'].to_numpy(), df['video_code'].to_numpy(),
+                                df[score_column].to_numpy())
+    artifact_path = publish_model(model, artifact_path_for(model_output), metadata={
+        "algorithm": "implicit_als", "factors": factors, "iterations": iterations,
+        "regularization": regularization, "alpha": alpha, "score_column": score_column,
+    }, full_retrain=True, seen=seen, id_dictionaries=id_dictionaries)
+    print(f"Model artifact saved to {artifact_path}")
+    return model
+
+@instrumented()
+def tune_model(data_file, output_dir="models/search", param_grid=None, n_iter=None, n_folds=5,
+               n_jobs=None, id_dictionaries=None):
+    from src.id_dictionary import IdDictionaries
+    from src.model_search import best_params, fit_svd, search, write_search_output
+    from src.storage import read_table
+
+    # Load the interactions once as flat code/rating arrays
+    df = read_table(data_file, columns=['user_id', 'video_id', 'rating'])
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(df)
+    id_dictionaries.save()
+    df = df[(df['user_code'] >= 0) & (df['video_code'] >= 0)]
+    user_codes = df['user_code'].to_numpy()
+    video_codes = df['video_code'].to_numpy()
+    ratings = df['rating'].to_numpy()
+
+    # Cross-validate the candidates in parallel, pruning poor ones fold by fold
+    results = search(user_codes, video_codes, ratings, param_grid=param_grid, n_iter=n_iter,
+                     n_folds=n_folds, n_jobs=n_jobs)
+    params = best_params(results, param_grid)
+    print(f"Best parameters: {params} (CV RMSE {results['mean_rmse'].iloc[0]:.4f})")
+
+    # Refit the winner on all data and publish it together with the results table
+    model = fit_svd(user_codes, video_codes, ratings, params)
+    write_search_output(results, model, output_dir, metadata={
+        "algorithm": "svd", **params, "cv_rmse": float(results['mean_rmse'].iloc[0]),
+    }, seen=SeenItems.from_codes(model, user_codes, video_codes), id_dictionaries=id_dictionaries)
+    print(f"Search results and best model saved to {output_dir}")
+    return results
+
+@instrumented()
+def update_model(new_data_file, model_output, full_data_file="data/processed_data.csv",
+                 retrain_every_hours=24.0, id_dictionaries=None):
+    from src.id_dictionary import IdDictionaries
+    from src.incremental import needs_full_retrain, update_artifact
+    from src.storage import read_table
+
+    # Retrain from scratch on schedule (or when no artifact exists yet)
+    artifact_path = artifact_path_for(model_output)
+    metadata = read_header(artifact_path)['metadata'] if os.path.exists(artifact_path) else {}
+    score_column = metadata.get('score_column', 'rating')
+    if needs_full_retrain(artifact_path, retrain_every_hours):
+        print("Scheduled full retrain")
+        if metadata.get('algorithm') == 'implicit_als':
+            return train_als_model(full_data_file, model_output, score_column=score_column,
+                                   factors=metadata['factors'], iterations=metadata['iterations'],
+                                   regularization=metadata['regularization'], alpha=metadata['alpha'],
+                                   id_dictionaries=id_dictionaries)
+        return train_model(full_data_file, model_output, id_dictionaries=id_dictionaries)
+
+    # Otherwise fold the new interactions into the current model and publish the next version
+    df = read_table(new_data_file, columns=['user_id', 'video_id', score_column])
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(df)
+    id_dictionaries.save()
+    # Implicit ALS re-solves returning users and videos against all their interactions; the
+    # artifact stores them with its seen items, including every batch folded in before
+    model = update_artifact(artifact_path, df['user_code'].to_numpy(), df['video_code'].to_numpy(),
+                            df[score_column].to_numpy(), id_dictionaries=id_dictionaries)
+    print(f"Folded {len(df)} new interactions into {artifact_path} "
+          f"({len(model.user_codes)} users, {len(model.item_codes)} videos)")
+    return model
+
+@instrumented()
+def evaluate_model(data_file, k=10, test_fraction=0.2, params=None, min_rating=None, id_dictionaries=None):
+    from src.evaluation import ranking_metrics, time_split
+    from src.id_dictionary import IdDictionaries
+    from src.model_search import fit_svd
+    from src.storage import read_table
+
+    # Hold out the most recent interactions instead of a random sample
+    df = read_table(data_file, columns=['user_id', 'video_id', 'rating', 'timestamp'])
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    id_dictionaries.encode_frame(df)
+    id_dictionaries.save()
+    df = df[(df['user_code'] >= 0) & (df['video_code'] >= 0)]
+    train, test = time_split(df, test_fraction=test_fraction)
+
+    # Fit on the past and measure top-k quality on the future for all test users at once
+    model = fit_svd(train['user_code'].to_numpy(), train['video_code'].to_numpy(), train['rating'].to_numpy(),
+                    params or {})
+    metrics = ranking_metrics(model, train['user_code'].to_numpy(), train['video_code'].to_numpy(),
+                              test['user_code'].to_numpy(), test['video_code'].to_numpy(), k=k,
+                              test_ratings=test['rating'].to_numpy(), min_rating=min_rating)
+    print(f"Ranking metrics on the {len(test)} most recent interactions: {metrics}")
+    return metrics
+
+def recommend(user_id, video_id, model_path, id_dictionaries=None):
+    # Load the trained model, memory-mapping the compact artifact when it exists
+    artifact_path = artifact_path_for(model_path)
+    model = load_model(artifact_path if os.path.exists(artifact_path) else model_path)
+
+    # Map the ids to the integer codes the model was trained on (unknown ids map to -1),
+    # with the ids stored in the artifact when it has them
+    if id_dictionaries is None and os.path.exists(artifact_path):
+        id_dictionaries = load_ids(artifact_path, model)
+    if id_dictionaries is None:
+        from src.id_dictionary import IdDictionaries
+        id_dictionaries = IdDictionaries()
+    user_code = int(id_dictionaries.encode_values('user_id', [user_id], add=False)[0])
+    video_code = int(id_dictionaries.encode_values('video_id', [video_id], add=False)[0])
 
     # Make a prediction
-    prediction = algo.predict(user_id, video_id)
-    print(f"Predicted rating for user {user_id} and video {video_id}: {prediction.est}")
+    prediction = float(model.score([user_code], [video_code])[0])
+    print(f"Predicted rating for user {user_id} and video {video_id}: {prediction}")
+    return prediction
+
+@instrumented()
+def recommend_top_n(user_ids, model_path, n=10, id_dictionaries=None, nprobe=None):
+    # Compact artifacts (e.g. the ALS model) are memory-mapped and need neither joblib nor
+    # surprise; the videos to skip are stored with them
+    if model_path.endswith(ARTIFACT_EXTENSION):
+        model = load_model(model_path)
+        engine = RetrievalEngine(model, seen=load_seen_items(model_path))
+        if id_dictionaries is None:
+            id_dictionaries = load_ids(model_path, model)
+    else:
+        # Load the trained model and pull its factors into float32 matrices
+        import joblib
+        algo = joblib.load(model_path)
+        model = FactorModel.from_surprise(algo)
+        engine = RetrievalEngine(model, seen=SeenItems.from_surprise_trainset(model, algo.trainset))
+    if nprobe is not None:
+        engine.build_ann_index()
+
+    # Score all users in batches with one matrix multiply each, skipping already-seen videos
+    if id_dictionaries is None:
+        from src.id_dictionary import IdDictionaries
+        id_dictionaries = IdDictionaries()
+    user_codes = id_dictionaries.encode_values('user_id', user_ids, add=False)
+    item_codes, scores = engine.top_k(user_codes, n, nprobe=nprobe)
+
+    recommendations = {}
+    for user_id, codes, user_scores in zip(user_ids, item_codes, scores):
+        found = codes >= 0
+        video_ids = id_dictionaries['video_id'].decode(codes[found])
+        recommendations[user_id] = list(zip(video_ids, user_scores[found].tolist()))
+        print(f"Top {n} videos for user {user_id}: {recommendations[user_id]}")
+    return recommendations
 
 if __name__ == "__main__":
     train_model("data/processed_data.csv", "models/svd_model.pkl")
+    evaluate_model("data/processed_data.csv")
     recommend("user_123", "video_456", "models/svd_model.pkl")
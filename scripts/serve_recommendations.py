@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.recommendation_server import serve
+
+# Long-running recommendation server: the model is loaded once, reloaded when
+# models/svd_model.fmodel is replaced, and concurrent requests are scored in micro-batches.
+#   GET /score?user_id=..&video_id=..   GET /top?user_id=..&n=10   GET /metrics
+if __name__ == "__main__":
+    serve("models/svd_model.fmodel", host="127.0.0.1", port=8000)
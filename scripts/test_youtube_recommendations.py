@@ -1,8 +1,37 @@
 import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from googleapiclient.discovery import build
 import logging
 
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.instrumentation import count, record_cache
+from src.storage import read_table
+
+# The API accepts at most 50 ids per videos().list call
+MAX_IDS_PER_REQUEST = 50
+
+# How long each resource part stays fresh in the local cache (seconds).
+# Titles and durations rarely change, statistics go stale quickly.
+DEFAULT_PART_TTL = {
+    "snippet": 7 * 24 * 3600,
+    "contentDetails": 30 * 24 * 3600,
+    "statistics": 3600,
+}
+
+# How long an id the API did not return (deleted, private or mistyped video) is
+# remembered as missing before it is asked for again (seconds)
+DEFAULT_MISSING_TTL = 24 * 3600
+
 # Load API credentials from a separate file
 def load_credentials():
     with open("config/credentials.json", "r") as f:
@@ -16,30 +45,196 @@ def setup_logging(log_file):
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
 
+# Persistent local cache of videos().list resource parts keyed by (video_id, part),
+# plus negative entries for the ids the API did not return
+class VideoDetailsCache:
+    def __init__(self, db_path="data/cache/video_details.sqlite", part_ttl=None,
+                 missing_ttl=DEFAULT_MISSING_TTL):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.part_ttl = dict(DEFAULT_PART_TTL, **(part_ttl or {}))
+        self.missing_ttl = missing_ttl
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS video_parts ("
+                "video_id TEXT NOT NULL, part TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (video_id, part))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS missing_videos ("
+                "video_id TEXT PRIMARY KEY, checked_at REAL NOT NULL)"
+            )
+
+    def get_fresh(self, video_ids, parts, now=None):
+        """
+        Return {video_id: {part: data}} for the cached parts that have not expired.
+        """
+        now = time.time() if now is None else now
+        fresh = {}
+        video_ids = list(video_ids)
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT video_id, part, fetched_at, data FROM video_parts "
+                    f"WHERE video_id IN ({placeholders})", chunk
+                ).fetchall()
+                for video_id, part, fetched_at, data in rows:
+                    if part in parts and now - fetched_at <= self.part_ttl.get(part, 0):
+                        fresh.setdefault(video_id, {})[part] = json.loads(data)
+        return fresh
+
+    def get_missing(self, video_ids, now=None):
+        """
+        Return the set of ids recorded as missing within the last missing_ttl seconds.
+        """
+        now = time.time() if now is None else now
+        missing = set()
+        video_ids = list(video_ids)
+        with self._lock:
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT video_id FROM missing_videos WHERE video_id IN ({placeholders}) "
+                    f"AND checked_at >= ?", chunk + [now - self.missing_ttl]
+                ).fetchall()
+                missing.update(video_id for video_id, in rows)
+        return missing
+
+    def put(self, items, parts, now=None):
+        now = time.time() if now is None else now
+        rows = [
+            (item["id"], part, now, json.dumps(item[part]))
+            for item in items for part in parts if part in item
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO video_parts (video_id, part, fetched_at, data) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+            # A video that came back (e.g. made public again) is no longer missing
+            self._conn.executemany("DELETE FROM missing_videos WHERE video_id = ?",
+                                   [(item["id"],) for item in items])
+
+    def put_missing(self, video_ids, now=None):
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO missing_videos (video_id, checked_at) VALUES (?, ?)",
+                [(video_id, now) for video_id in video_ids]
+            )
+
+    def close(self):
+        self._conn.close()
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _video_record(video_id, parts):
+    snippet = parts.get("snippet", {})
+    statistics = parts.get("statistics", {})
+    content_details = parts.get("contentDetails", {})
+    return {
+        "video_id": video_id,
+        "title": snippet.get("title"),
+        "channel_title": snippet.get("channelTitle"),
+        "view_count": statistics.get("viewCount", 0),
+        "like_count": statistics.get("likeCount", 0),
+        "comment_count": statistics.get("commentCount", 0),
+        "duration": content_details.get("duration"),
+        "published_at": snippet.get("publishedAt"),
+        "description": snippet.get("description")
+    }
+
+# Batch lookup of video details: only ids whose cached parts are missing or
+# expired hit the API, in concurrent requests of up to 50 ids each
+class VideoDetailsService:
+    def __init__(self, youtube_api_key=None, cache=None, client=None, max_workers=4,
+                 parts=("snippet", "statistics", "contentDetails")):
+        self.youtube_api_key = youtube_api_key
+        self.cache = cache if cache is not None else VideoDetailsCache()
+        self.parts = tuple(parts)
+        self.max_workers = max_workers
+        self._client = client
+        self._local = threading.local()
+        self.api_calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _get_client(self):
+        if self._client is not None:
+            return self._client
+        # googleapiclient clients are not thread-safe: one per worker thread
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = build("youtube", "v3", developerKey=self.youtube_api_key, cache_discovery=False)
+            self._local.client = client
+        return client
+
+    def _fetch_chunk(self, video_ids, parts):
+        response = self._get_client().videos().list(
+            part=",".join(parts),
+            id=",".join(video_ids),
+            maxResults=MAX_IDS_PER_REQUEST
+        ).execute()
+        count('api_requests_total', api='youtube', endpoint='videos.list')
+        count('youtube_quota_units_total', 1, endpoint='videos.list')
+        return response.get("items", [])
+
+    def lookup(self, video_ids):
+        video_ids = list(dict.fromkeys(str(v) for v in video_ids))
+        resolved = self.cache.get_fresh(video_ids, self.parts)
+        known_missing = self.cache.get_missing(
+            [v for v in video_ids if len(resolved.get(v, {})) < len(self.parts)])
+
+        # Group ids by the parts they are missing so each request asks only for what is stale
+        missing = {}
+        for video_id in video_ids:
+            stale_parts = tuple(p for p in self.parts if p not in resolved.get(video_id, {}))
+            if stale_parts and video_id not in known_missing:
+                missing.setdefault(stale_parts, []).append(video_id)
+            else:
+                self.cache_hits += 1
+        requests = [
+            (chunk, parts) for parts, ids in missing.items()
+            for chunk in _chunks(ids, MAX_IDS_PER_REQUEST)
+        ]
+        stale = sum(len(chunk) for chunk, _ in requests)
+        self.cache_misses += stale
+        record_cache('video_details', hit=True, count=len(video_ids) - stale)
+        record_cache('video_details', hit=False, count=stale)
+
+        if requests:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(lambda req: (self._fetch_chunk(*req), req), requests)
+                for items, (chunk, parts) in results:
+                    self.api_calls += 1
+                    self.cache.put(items, parts)
+                    for item in items:
+                        entry = resolved.setdefault(item["id"], {})
+                        entry.update({part: item[part] for part in parts if part in item})
+                    returned = {item["id"] for item in items}
+                    self.cache.put_missing([v for v in chunk if v not in returned])
+
+        # Ids the API did not return (deleted or private videos) are left out, and are not
+        # asked for again until their negative cache entry expires
+        return pd.DataFrame(
+            [_video_record(v, resolved[v]) for v in video_ids if v in resolved],
+            columns=list(_video_record("", {}).keys())
+        )
+
 # Fetch video details using YouTube API
-def fetch_video_details(youtube_api_key, video_ids):
-    youtube = build("youtube", "v3", developerKey=youtube_api_key)
-    
-    response = youtube.videos().list(
-        part="snippet,statistics,contentDetails",
-        id=",".join(video_ids)
-    ).execute()
-    
-    video_data = []
-    for item in response['items']:
-        video_data.append({
-            "video_id": item["id"],
-            "title": item["snippet"]["title"],
-            "channel_title": item["snippet"]["channelTitle"],
-            "view_count": item["statistics"].get("viewCount", 0),
-            "like_count": item["statistics"].get("likeCount", 0),
-            "comment_count": item["statistics"].get("commentCount", 0),
-            "duration": item["contentDetails"]["duration"],
-            "published_at": item["snippet"]["publishedAt"],
-            "description": item["snippet"]["description"]
-        })
-    
-    return pd.DataFrame(video_data)
+def fetch_video_details(youtube_api_key, video_ids, service=None):
+    if service is None:
+        service = VideoDetailsService(youtube_api_key)
+    return service.lookup(video_ids)
 
 # Main script to test video recommendations
 def main():
@@ -48,17 +243,19 @@ def main():
     
     try:
         # Load the merged dataset
-        user_video_data = pd.read_csv("data/processed/merged_user_video_data.csv")
+        user_video_data = read_table("data/processed/merged_user_video_data.csv", columns=["video_id"])
         
         # Get the list of video IDs from the merged dataset
-        video_ids = user_video_data['video_id'].unique()[:5]  # Limit to top 5 for testing
+        video_ids = user_video_data['video_id'].dropna().unique()
         
-        logging.info(f"Fetching details for video IDs: {video_ids}")
+        logging.info(f"Fetching details for {len(video_ids)} video IDs")
         
-        # Fetch the video details using YouTube API
-        video_details = fetch_video_details(credentials["youtube_api_key"], video_ids)
+        # Fetch the video details using YouTube API; cached ids cost no quota
+        service = VideoDetailsService(credentials["youtube_api_key"])
+        video_details = fetch_video_details(credentials["youtube_api_key"], video_ids, service=service)
         
-        logging.info(f"Fetched video details successfully.")
+        logging.info(f"Fetched video details successfully: {service.cache_hits} cache hits, "
+                     f"{service.cache_misses} misses, {service.api_calls} API calls.")
         
         # Display the fetched video details
         print(video_details)
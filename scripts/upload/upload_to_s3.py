@@ -1,16 +1,32 @@
-import boto3
+import os
+import sys
 
-# Configure the AWS S3 client
-s3_client = boto3.client('s3')
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.s3_sink import get_s3_client, upload_files
 
 def upload_file_to_s3(file_path, bucket_name, object_name=None):
     if object_name is None:
         object_name = file_path  # Use the file name if no object name is provided
-    try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
-        print(f"File {file_path} uploaded to {bucket_name}/{object_name}")
-    except Exception as e:
-        print(f"Error uploading file: {e}")
+    upload_files_to_s3([file_path], bucket_name, [object_name])
+
+# Upload several files in parallel; large files are sent as parallel multipart uploads.
+# The shared S3 client is created on the first upload, not when this module is imported
+def upload_files_to_s3(file_paths, bucket_name, object_names=None, max_workers=4):
+    if object_names is None:
+        object_names = list(file_paths)  # Use the file names if no object names are provided
+    results = upload_files(file_paths, bucket_name, object_names, client=get_s3_client(), max_workers=max_workers)
+    for file_path, object_name in zip(file_paths, object_names):
+        error = results.get(file_path)
+        if error is None:
+            print(f"File {file_path} uploaded to {bucket_name}/{object_name}")
+        else:
+            print(f"Error uploading file: {error}")
+    return results
 
 # Example usage
-upload_file_to_s3('data/raw/trending_videos.csv', 'youtube-data-singapore')
+if __name__ == "__main__":
+    upload_file_to_s3('data/raw/trending_videos.csv', 'youtube-data-singapore')
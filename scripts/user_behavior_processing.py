@@ -1,7 +1,18 @@
 import pandas as pd
-import boto3
-import io
 import sys
+import os
+
+# Make the shared modules in src/ importable when run as a script
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.storage import get_storage_option, read_table, write_table
+from src.id_dictionary import IdDictionaries
+from src.star_schema import build_star
+from src.s3_cache import S3ReadCache
+from src.spark_engine import get_processing_engine, merge_data_spark
+from src.instrumentation import current_span, instrumented
 
 # Ensuring default encoding (not necessary in most cases but added for clarity)
 # sys.setdefaultencoding('utf-8')  # Not needed in Python 3
@@ -10,41 +21,78 @@ import sys
 def load_user_data(file_path='data/raw/user_behavior.csv'):
     try:
         # Open with explicit UTF-8 encoding to avoid potential issues
-        user_data = pd.read_csv(file_path, encoding='utf-8')
+        user_data = read_table(file_path)
         print("User data loaded successfully.")
         return user_data
     except Exception as e:
         print(f"Error loading user data: {e}")
         return None
 
-# Function to load video metadata from an S3 bucket
-def load_video_metadata_from_s3(bucket_name='youtube-data-singapore', file_key='data/raw/trending_videos.csv'):
-    s3 = boto3.client('s3')
+# Local read-through cache shared by every S3 read in this process
+_s3_cache = None
+
+def get_s3_cache():
+    global _s3_cache
+    if _s3_cache is None:
+        _s3_cache = S3ReadCache()
+    return _s3_cache
+
+# Function to load video metadata from an S3 bucket.
+# The object is only downloaded again when its ETag changed since the cached copy;
+# pass `columns` to read only some columns (column chunks only for Parquet objects).
+def load_video_metadata_from_s3(bucket_name='youtube-data-singapore', file_key='data/raw/trending_videos.csv',
+                                columns=None, cache=None):
+    cache = cache or get_s3_cache()
     try:
-        obj = s3.get_object(Bucket=bucket_name, Key=file_key)
         # Ensure we're reading the file with UTF-8 encoding
-        video_data = pd.read_csv(io.BytesIO(obj['Body'].read()), encoding='utf-8')
+        video_data = cache.read_dataframe(bucket_name, file_key, columns=columns, encoding='utf-8')
         print("Video metadata loaded successfully.")
         return video_data
     except Exception as e:
         print(f"Error loading video metadata from S3: {e}")
         return None
 
-# Function to merge user data with video metadata
-def merge_user_video_data(user_data, video_data):
-    merged_data = pd.merge(user_data, video_data, on='video_id', how='inner')
+# Function to merge user data with video metadata.
+# Both sides are joined on the int32 video_code from the shared id dictionaries.
+# layout="star" returns a StarView (interaction facts + one row per video joined by
+# video_code) instead of repeating the video columns on every interaction.
+@instrumented()
+def merge_user_video_data(user_data, video_data, layout="wide", id_dictionaries=None):
+    current_span().add(rows_in=len(user_data) + len(video_data))
+    if id_dictionaries is None:
+        id_dictionaries = IdDictionaries()
+    if layout == "star":
+        merged_data = build_star(user_data, video_data, id_dictionaries=id_dictionaries)
+    else:
+        # The id columns are normalized in place, so the callers' frames are copied
+        user_data = id_dictionaries.encode_frame(user_data.copy())
+        video_data = id_dictionaries.encode_frame(video_data.copy())
+        id_dictionaries.save()
+        user_data = user_data[user_data['video_code'] >= 0].drop(columns=['video_id'])
+        merged_data = pd.merge(user_data, video_data, on='video_code', how='inner')
+        current_span().add(rows_out=len(merged_data))
     print("User and video data merged successfully.")
     return merged_data
 
 # Main function
 if __name__ == "__main__":
-    # Load the data
-    user_data = load_user_data()
-    video_data = load_video_metadata_from_s3()
-
-    # Check if data was loaded successfully before merging
-    if user_data is not None and video_data is not None:
-        combined_data = merge_user_video_data(user_data, video_data)
-        # Optionally save the combined data to a CSV for review or use in further processing
-        combined_data.to_csv('data/processed/merged_user_video_data.csv', index=False, encoding='utf-8')
-        print("Combined data saved to 'data/processed/merged_user_video_data.csv'.")
+    layout = get_storage_option("merge_layout", "wide")
+    if get_processing_engine() == "spark":
+        # Spark reads the up-to-date local copy of the S3 object and writes the merged output itself
+        video_path = get_s3_cache().get_path('youtube-data-singapore', 'data/raw/trending_videos.csv')
+        merge_data_spark(video_path, 'data/raw/user_behavior.csv', 'data/processed/merged_user_video_data.csv',
+                         layout=layout)
+    else:
+        # Load the data
+        user_data = load_user_data()
+        video_data = load_video_metadata_from_s3()
+
+        # Check if data was loaded successfully before merging
+        if user_data is not None and video_data is not None:
+            combined_data = merge_user_video_data(user_data, video_data, layout=layout)
+            # Optionally save the combined data for review or use in further processing
+            if layout == "star":
+                written_path = combined_data.save('data/processed/merged_user_video_data.csv')
+            else:
+                written_path = write_table(combined_data, 'data/processed/merged_user_video_data.csv')
+            print(f"Combined data saved to '{written_path}'.")
@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.storage import write_table
+
+HASHTAG_PATTERN = r"(#\w+)"
+COUNT_COLUMNS = ['view_count', 'like_count', 'comment_count']
+VIDEO_COLUMNS = ['title', 'channel_title', 'description'] + COUNT_COLUMNS
+CHANNEL_COLUMNS = ['videos', 'total_views', 'total_likes', 'total_comments']
+
+
+def engagement_rate(like_count, view_count):
+    """
+    Likes per view, 0 for videos without views.
+    """
+    likes = np.asarray(like_count, dtype=np.float64)
+    views = np.asarray(view_count, dtype=np.float64)
+    return np.divide(likes, views, out=np.zeros_like(likes), where=views > 0)
+
+
+def extract_hashtags(descriptions):
+    """
+    Hashtags of every description as one long Series indexed by the description's index.
+    """
+    matches = pd.Series(descriptions).fillna("").astype(str).str.extractall(HASHTAG_PATTERN)[0]
+    return matches.droplevel('match')
+
+
+def count_hashtags(descriptions):
+    """
+    Occurrences of each hashtag over a collection of descriptions.
+
+    Returns:
+        pd.Series: Counts indexed by hashtag, most frequent first.
+    """
+    return extract_hashtags(descriptions).value_counts()
+
+
+class SpaceSavingCounter:
+    """
+    Bounded-memory heavy-hitters counter (Space-Saving, Metwally et al. 2005), updated in batches.
+
+    At most `capacity` items are tracked. Items entering a full counter inherit the smallest
+    tracked count, so every count is overestimated by at most `error[item]` and any item
+    more frequent than total/capacity is kept. Counters built on separate chunks can be
+    combined with merge().
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.error = pd.Series(dtype='int64')
+
+    def update(self, counts):
+        """
+        Add a batch of (item -> count) observations, e.g. the value_counts of one chunk.
+        """
+        batch = pd.Series(counts, dtype='int64')
+        floor = int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+        entering = batch.index.difference(self.counts.index)
+        totals = self.counts.add(batch, fill_value=0)
+        totals[entering] += floor
+        errors = self.error.reindex(totals.index).fillna(floor)
+        self._truncate(totals, errors)
+        return self
+
+    def merge(self, other):
+        merged = SpaceSavingCounter(self.capacity)
+        merged._truncate(self.counts.add(other.counts, fill_value=0), self.error.add(other.error, fill_value=0))
+        return merged
+
+    def _truncate(self, totals, errors):
+        keep = totals.nlargest(self.capacity).index
+        self.counts = totals[keep].astype('int64')
+        self.error = errors[keep].astype('int64')
+
+    def most_common(self, n=None):
+        return self.counts.sort_values(ascending=False, kind='stable').head(n)
+
+
+class AnalyticsViews:
+    """
+    Engagement, channel-performance and hashtag tables maintained as materialized views.
+
+    The state is the latest row per video plus mergeable partial aggregates: per-channel
+    sums of video counts, views, likes and comments, and per-hashtag counts. Applying a
+    batch of changed videos subtracts each video's previous contribution and adds the new
+    one, so an update costs the size of the batch rather than of the history. With
+    `heavy_hitters` set, hashtags go to a bounded SpaceSavingCounter instead; it only
+    counts additions, so hashtags of edited descriptions are not retracted.
+    """
+
+    def __init__(self, state_dir="data/aggregates", heavy_hitters=None):
+        self.state_dir = state_dir
+        self.videos = pd.DataFrame(columns=VIDEO_COLUMNS + ['hashtags']).rename_axis('video_id')
+        self.channels = pd.DataFrame(columns=CHANNEL_COLUMNS, dtype='int64').rename_axis('channel_title')
+        self.hashtag_counts = pd.Series(dtype='int64', name='Count').rename_axis('Hashtag')
+        self.heavy_hitters = SpaceSavingCounter(heavy_hitters) if heavy_hitters else None
+        self.watermark = 0
+        self.load()
+
+    def apply(self, changes):
+        """
+        Fold a batch of new or updated videos into the views.
+
+        Args:
+            changes (pd.DataFrame): One row per video with video_id and any of title,
+                channel_title, description, view_count, like_count, comment_count. Missing
+                columns or nulls keep the video's previous values.
+
+        Returns:
+            int: Number of videos updated.
+        """
+        changes = changes.drop_duplicates('video_id', keep='last').set_index('video_id')
+        if changes.empty:
+            return 0
+        old = self.videos.reindex(changes.index)
+        known = self.videos.index.isin(changes.index)
+        new = changes.reindex(columns=VIDEO_COLUMNS).combine_first(old[VIDEO_COLUMNS])
+        for column in COUNT_COLUMNS:
+            new[column] = pd.to_numeric(new[column], errors='coerce').fillna(0).astype('int64')
+
+        # Hashtags are only re-extracted for videos whose description arrived in this batch
+        new['hashtags'] = old['hashtags']
+        if 'description' in changes.columns:
+            described = changes['description'].notna()
+            tags = extract_hashtags(changes.loc[described, 'description'])
+            new.loc[described, 'hashtags'] = tags.groupby(level=0).agg(' '.join).reindex(
+                changes.index[described]).fillna('')
+            self._update_hashtags(old.loc[described, 'hashtags'], new.loc[described, 'hashtags'])
+
+        # Retract the previous contribution of known videos (new videos have no channel yet)
+        self.channels = self._add_channels(self.channels, old, sign=-1)
+        self.channels = self._add_channels(self.channels, new, sign=1)
+        self.channels = self.channels[self.channels['videos'] > 0]
+        self.videos = pd.concat([self.videos[~known], new[VIDEO_COLUMNS + ['hashtags']]])
+        return len(new)
+
+    @staticmethod
+    def _add_channels(channels, videos, sign):
+        videos = videos.dropna(subset=['channel_title'])
+        if videos.empty:
+            return channels
+        partial = pd.DataFrame({
+            'videos': 1,
+            'total_views': videos['view_count'].astype('int64'),
+            'total_likes': videos['like_count'].astype('int64'),
+            'total_comments': videos['comment_count'].astype('int64'),
+        }, index=videos.index).groupby(videos['channel_title']).sum()
+        return channels.add(sign * partial, fill_value=0).astype('int64')
+
+    def _update_hashtags(self, old_tags, new_tags):
+        added = new_tags.dropna().str.split().explode().dropna().value_counts()
+        if self.heavy_hitters is not None:
+            self.heavy_hitters.update(added)
+            return
+        removed = old_tags.dropna().str.split().explode().dropna().value_counts()
+        counts = self.hashtag_counts.add(added, fill_value=0).sub(removed, fill_value=0)
+        self.hashtag_counts = counts[counts > 0].astype('int64').rename('Count').rename_axis('Hashtag')
+
+    def refresh_from_store(self, store):
+        """
+        Apply every statistics and metadata change the snapshot store recorded after the
+        views' watermark, then advance the watermark.
+
+        Returns:
+            int: Number of videos updated.
+        """
+        with store.read_transaction():
+            stats, stats_watermark = store.stats_changes_since(self.watermark)
+            metadata, metadata_watermark = store.metadata_changes_since(self.watermark)
+        new_watermark = max(stats_watermark, metadata_watermark)
+        stats = stats.sort_values('snapshot_id').drop_duplicates('video_id', keep='last')
+        changes = pd.merge(
+            metadata[['video_id', 'title', 'channel_title', 'description']],
+            stats[['video_id'] + COUNT_COLUMNS],
+            on='video_id', how='outer',
+        )
+        updated = self.apply(changes)
+        self.watermark = new_watermark
+        return updated
+
+    def engagement_metrics(self):
+        videos = self.videos.reset_index()
+        return pd.DataFrame({
+            'video_id': videos['video_id'],
+            'title': videos['title'],
+            'view_count': videos['view_count'].astype('int64'),
+            'like_count': videos['like_count'].astype('int64'),
+            'comment_count': videos['comment_count'].astype('int64'),
+            'engagement_rate': engagement_rate(videos['like_count'], videos['view_count']),
+        })
+
+    def channel_performance(self):
+        channels = self.channels.sort_index()
+        return pd.DataFrame({
+            'channel_title': channels.index,
+            'total_views': channels['total_views'].to_numpy(),
+            'avg_views': channels['total_views'].to_numpy() / channels['videos'].to_numpy(),
+            'total_likes': channels['total_likes'].to_numpy(),
+            'total_comments': channels['total_comments'].to_numpy(),
+        })
+
+    def hashtags(self, n=None):
+        counts = self.heavy_hitters.most_common(n) if self.heavy_hitters is not None else \
+            self.hashtag_counts.sort_values(ascending=False, kind='stable').head(n)
+        return pd.DataFrame({'Hashtag': counts.index, 'Count': counts.to_numpy()})
+
+    def write(self, output_dir="data/processed", format=None):
+        """
+        Publish the three views next to the other processed tables.
+
+        Returns:
+            list[str]: Paths written.
+        """
+        return [
+            write_table(self.engagement_metrics(), os.path.join(output_dir, "engagement_metrics.csv"), format=format),
+            write_table(self.channel_performance(), os.path.join(output_dir, "channel_performance.csv"), format=format),
+            write_table(self.hashtags(), os.path.join(output_dir, "hashtags.csv"), format=format),
+        ]
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.videos.reset_index().to_parquet(os.path.join(self.state_dir, "videos.parquet"), index=False)
+        self.channels.reset_index().to_parquet(os.path.join(self.state_dir, "channels.parquet"), index=False)
+        self.hashtag_counts.reset_index().to_parquet(os.path.join(self.state_dir, "hashtags.parquet"), index=False)
+        state = {'watermark': self.watermark}
+        if self.heavy_hitters is not None:
+            state['heavy_hitters'] = {
+                'capacity': self.heavy_hitters.capacity,
+                'counts': {item: int(count) for item, count in self.heavy_hitters.counts.items()},
+                'error': {item: int(error) for item, error in self.heavy_hitters.error.items()},
+            }
+        with open(os.path.join(self.state_dir, "state.json"), "w") as f:
+            json.dump(state, f)
+
+    def load(self):
+        state_path = os.path.join(self.state_dir, "state.json")
+        if not os.path.exists(state_path):
+            return
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        self.watermark = state['watermark']
+        self.videos = pd.read_parquet(os.path.join(self.state_dir, "videos.parquet")).set_index('video_id')
+        self.channels = pd.read_parquet(os.path.join(self.state_dir, "channels.parquet")).set_index('channel_title')
+        self.hashtag_counts = pd.read_parquet(os.path.join(self.state_dir, "hashtags.parquet")).set_index(
+            'Hashtag')['Count']
+        if self.heavy_hitters is not None and 'heavy_hitters' in state:
+            saved = state['heavy_hitters']
+            self.heavy_hitters = SpaceSavingCounter(saved['capacity'])
+            self.heavy_hitters.counts = pd.Series(saved['counts'], dtype='int64')
+            self.heavy_hitters.error = pd.Series(saved['error'], dtype='int64')
@@ -0,0 +1,143 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.factor_model import FactorModel
+
+
+def build_confidence_matrix(user_codes, item_codes, values, alpha=40.0):
+    """
+    CSR user x item confidence matrix C = 1 + alpha * value for implicit feedback.
+
+    Duplicate (user, item) pairs are summed before the confidence transform. Rows and
+    columns are dense positions of the distinct user and item codes.
+
+    Returns:
+        tuple[sp.csr_matrix, np.ndarray, np.ndarray]: Confidence matrix, user codes per row,
+        item codes per column.
+    """
+    user_codes = np.asarray(user_codes)
+    item_codes = np.asarray(item_codes)
+    values = np.asarray(values, dtype=np.float64)
+    keep = (user_codes >= 0) & (item_codes >= 0) & np.isfinite(values) & (values > 0)
+    unique_users, user_rows = np.unique(user_codes[keep], return_inverse=True)
+    unique_items, item_rows = np.unique(item_codes[keep], return_inverse=True)
+    preferences = sp.csr_matrix(
+        (values[keep], (user_rows, item_rows)), shape=(len(unique_users), len(unique_items))
+    )
+    preferences.sum_duplicates()
+    preferences.data = (1.0 + alpha * preferences.data).astype(np.float32)
+    return preferences, unique_users.astype(np.int32), unique_items.astype(np.int32)
+
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren & Volinsky, 2008).
+
+    Each half-iteration solves (YtY + Yt(Cu - I)Y + reg*I) x_u = Yt Cu p_u for every user
+    (then every item) with a few warm-started conjugate-gradient steps. The solves are
+    vectorized over blocks of rows with BLAS dense products and sparse-dense products over
+    the CSR structure; NumPy and SciPy release the GIL in those kernels, so blocks run in a
+    thread pool across all cores.
+    """
+
+    def __init__(self, factors=64, regularization=0.01, alpha=40.0, iterations=15, cg_steps=3,
+                 n_jobs=None, block_size=4096, seed=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.block_size = block_size
+        self.seed = seed
+
+    def fit(self, user_codes, item_codes, values):
+        """
+        Fit on an interaction table and return a FactorModel usable by the artifact and serving code.
+
+        Args:
+            user_codes (array-like): int32 user codes from the id dictionaries.
+            item_codes (array-like): int32 video codes from the id dictionaries.
+            values (array-like): Implicit signal strength (e.g. watch_time or rating).
+        """
+        confidence, users, items = build_confidence_matrix(user_codes, item_codes, values, self.alpha)
+        user_factors, item_factors = self.fit_matrix(confidence)
+        return FactorModel(
+            user_factors=user_factors,
+            item_factors=item_factors,
+            user_bias=np.zeros(len(users)),
+            item_bias=np.zeros(len(items)),
+            global_mean=0.0,
+            user_codes=users,
+            item_codes=items,
+            rating_scale=(float('-inf'), float('inf')),
+        )
+
+    def fit_matrix(self, confidence, user_factors=None, item_factors=None):
+        """
+        Run ALS on a CSR confidence matrix, optionally warm-starting from existing factors.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_users, n_items = confidence.shape
+        if user_factors is None:
+            user_factors = rng.normal(scale=0.01, size=(n_users, self.factors)).astype(np.float32)
+        if item_factors is None:
+            item_factors = rng.normal(scale=0.01, size=(n_items, self.factors)).astype(np.float32)
+        confidence_t = confidence.T.tocsr()
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            for _ in range(self.iterations):
+                user_factors = self.solve(confidence, item_factors, user_factors, executor)
+                item_factors = self.solve(confidence_t, user_factors, item_factors, executor)
+        return user_factors, item_factors
+
+    def solve(self, confidence, fixed, current, executor=None, rows=None):
+        """
+        One least-squares half-step: update the factors of `rows` (all rows by default)
+        of `confidence` against the `fixed` factors of the other side.
+        """
+        fixed = np.ascontiguousarray(fixed, dtype=np.float32)
+        gram = fixed.T @ fixed + self.regularization * np.eye(fixed.shape[1], dtype=np.float32)
+        updated = np.array(current, dtype=np.float32, copy=True)
+        rows = np.arange(confidence.shape[0]) if rows is None else np.asarray(rows)
+        blocks = [rows[start:start + self.block_size] for start in range(0, len(rows), self.block_size)]
+
+        def solve_block(block):
+            updated[block] = self._cg_block(confidence[block], fixed, gram, updated[block])
+
+        if executor is None:
+            for block in blocks:
+                solve_block(block)
+        else:
+            list(executor.map(solve_block, blocks))
+        return updated
+
+    def _cg_block(self, block_confidence, fixed, gram, x):
+        indptr, indices = block_confidence.indptr, block_confidence.indices
+        owner = np.repeat(np.arange(block_confidence.shape[0]), np.diff(indptr))
+        neighbours = fixed[indices]
+        weights = block_confidence.data - 1.0
+
+        def matvec(p):
+            # Yt (Cu - I) Y p as a sparse-dense product sharing the block's CSR structure
+            dots = np.einsum('nf,nf->n', neighbours, p[owner])
+            weighted = sp.csr_matrix((weights * dots, indices, indptr), shape=block_confidence.shape)
+            return p @ gram + weighted @ fixed
+
+        b = block_confidence @ fixed
+        r = b - matvec(x)
+        p = r.copy()
+        rs_old = np.einsum('ij,ij->i', r, r)
+        for _ in range(self.cg_steps):
+            ap = matvec(p)
+            denominator = np.einsum('ij,ij->i', p, ap)
+            step = np.divide(rs_old, denominator, out=np.zeros_like(rs_old), where=denominator > 0)
+            x = x + step[:, None] * p
+            r = r - step[:, None] * ap
+            rs_new = np.einsum('ij,ij->i', r, r)
+            beta = np.divide(rs_new, rs_old, out=np.zeros_like(rs_new), where=rs_old > 0)
+            p = r + beta[:, None] * p
+            rs_old = rs_new
+        return x
@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import traceback
+
+
+def _peak_rss_mb():
+    # On Linux ru_maxrss survives execve, so a spawned child would report the parent's
+    # high-water mark; VmHWM belongs to the child's own address space
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+class BenchmarkCase:
+    """
+    One measured stage.
+
+    Args:
+        name (str): Stage name used in the results.
+        run (callable): Called with the value returned by `setup` (or without arguments).
+            Returns the number of rows it processed, or None to use `rows`.
+        setup (callable, optional): Untimed preparation, e.g. loading the inputs of a
+            stage that works on in-memory DataFrames.
+        rows (int, optional): Rows processed, for the rows/s figure.
+    """
+
+    def __init__(self, name, run, setup=None, rows=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.rows = rows
+
+
+def _measure_in_child(case, conn):
+    try:
+        args = (case.setup(),) if case.setup is not None else ()
+        setup_rss = _peak_rss_mb()
+        start = time.perf_counter()
+        rows = case.run(*args)
+        wall = time.perf_counter() - start
+        peak_rss = _peak_rss_mb()
+        rows = rows if rows is not None else case.rows
+        conn.send({
+            'status': 'ok',
+            'wall_s': round(wall, 4),
+            'peak_rss_mb': round(peak_rss, 1),
+            'setup_rss_mb': round(setup_rss, 1),
+            'rows': rows,
+            'rows_per_s': round(rows / wall, 1) if rows and wall > 0 else None,
+        })
+    except ImportError as e:
+        conn.send({'status': 'skipped', 'error': str(e)})
+    except Exception as e:
+        conn.send({'status': 'failed', 'error': f"{e}\n{traceback.format_exc()}"})
+    finally:
+        conn.close()
+
+
+def measure(case):
+    """
+    Run a case in a fresh process and measure its wall time, peak RSS and throughput.
+
+    Each case gets its own spawned process, so the peak RSS is not inflated by earlier
+    cases and imports or caches of one stage do not speed up the next. `peak_rss_mb` is
+    the process high-water mark including the untimed setup; `setup_rss_mb` is the mark
+    after setup.
+
+    Returns:
+        dict: status ('ok', 'skipped' when an optional dependency is missing, or 'failed'),
+        wall_s, peak_rss_mb, setup_rss_mb, rows and rows_per_s.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_in_child, args=(case, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {'status': 'failed', 'error': 'Benchmark process died (out of memory?)'}
+    process.join()
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(cases, dataset=None):
+    """
+    Measure every case in order.
+
+    Returns:
+        dict: Results with the dataset description, environment and one entry per stage.
+    """
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'dataset': dataset or {},
+        'stages': {},
+    }
+    for case in cases:
+        print(f"Running {case.name}...")
+        stage = measure(case)
+        results['stages'][case.name] = stage
+        if stage['status'] == 'ok':
+            rate = f", {stage['rows_per_s']:,.0f} rows/s" if stage['rows_per_s'] else ""
+            print(f"  {stage['wall_s']:.2f}s, peak RSS {stage['peak_rss_mb']:.0f} MB{rate}")
+        else:
+            print(f"  {stage['status']}: {stage['error'].splitlines()[0]}")
+    return results
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_results(results, baseline, tolerance=0.2, metrics=('wall_s', 'peak_rss_mb')):
+    """
+    Stages whose metrics got worse than the baseline by more than `tolerance` (relative).
+
+    Only stages measured successfully in both runs are compared. Baselines recorded on a
+    different dataset are not comparable and raise ValueError.
+
+    Returns:
+        list[dict]: One entry per regression with stage, metric, baseline, current and change.
+    """
+    if baseline.get('dataset') != results.get('dataset'):
+        raise ValueError("The baseline was recorded on a different dataset; regenerate it with the same "
+                         "--rows/--seed.")
+    regressions = []
+    for name, stage in results['stages'].items():
+        previous = baseline['stages'].get(name)
+        if stage['status'] != 'ok' or not previous or previous['status'] != 'ok':
+            continue
+        for metric in metrics:
+            if previous[metric] and stage[metric] > previous[metric] * (1 + tolerance):
+                regressions.append({
+                    'stage': name,
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': stage[metric],
+                    'change': round(stage[metric] / previous[metric] - 1, 3),
+                })
+    return regressions
@@ -0,0 +1,253 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.retrieval import _top_k_rows
+
+TEXT_COLUMNS = ('title', 'description', 'channel_title')
+
+_URL = re.compile(r"https?://\S+")
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text, ngram_max=2):
+    """
+    Lower-cased word unigrams (and bigrams up to `ngram_max`) of a text, with links removed.
+    """
+    words = _TOKEN.findall(_URL.sub(" ", text.lower()))
+    terms = list(words)
+    for n in range(2, ngram_max + 1):
+        terms.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return terms
+
+
+class ContentIndex:
+    """
+    Incremental TF-IDF index over the title, description and channel title of videos.
+
+    Raw term counts are kept per video and the vocabulary only grows, so new videos are
+    appended without touching existing rows; IDF weights are applied when the matrix is
+    next needed. Item-to-item cosine top-K is answered with blocked sparse products, and
+    precomputed neighbour lists are cached on disk next to the index.
+    """
+
+    def __init__(self, directory="data/content_index", ngram_max=2, max_df=0.5):
+        self.directory = directory
+        self.ngram_max = ngram_max
+        self.max_df = max_df
+        self.terms = []
+        self.term_index = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.counts = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.video_ids = []
+        self.titles = []
+        self.video_index = {}
+        self._matrix = None
+        self.load()
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def add_videos(self, df):
+        """
+        Add the videos of `df` that are not indexed yet.
+
+        Args:
+            df (pd.DataFrame): Must have video_id; any of title, description and channel_title are used.
+
+        Returns:
+            int: Number of videos added.
+        """
+        df = df.drop_duplicates('video_id')
+        df = df[~df['video_id'].astype(str).isin(self.video_index)]
+        if df.empty:
+            return 0
+        text = pd.Series("", index=df.index)
+        for column in TEXT_COLUMNS:
+            if column in df.columns:
+                text = text + " " + df[column].fillna("").astype(str)
+
+        indptr, indices = [0], []
+        for document in text:
+            for term in tokenize(document, self.ngram_max):
+                column = self.term_index.get(term)
+                if column is None:
+                    column = self.term_index[term] = len(self.terms)
+                    self.terms.append(term)
+                indices.append(column)
+            indptr.append(len(indices))
+
+        n_terms = len(self.terms)
+        new_counts = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), indptr),
+            shape=(len(df), n_terms),
+        )
+        new_counts.sum_duplicates()
+        self.doc_freq = np.concatenate([self.doc_freq, np.zeros(n_terms - len(self.doc_freq), dtype=np.int64)])
+        self.doc_freq += np.bincount(new_counts.indices, minlength=n_terms)
+        self.counts.resize((self.counts.shape[0], n_terms))
+        self.counts = sp.vstack([self.counts, new_counts], format='csr')
+
+        for video_id, title in zip(df['video_id'].astype(str), df.get('title', pd.Series("", index=df.index))):
+            self.video_index[video_id] = len(self.video_ids)
+            self.video_ids.append(video_id)
+            self.titles.append("" if pd.isna(title) else str(title))
+        self._matrix = None
+        return len(df)
+
+    def matrix(self):
+        """
+        L2-normalized TF-IDF matrix (videos x terms) with sublinear term frequency.
+
+        Terms occurring in more than `max_df` of the videos are dropped: they carry little
+        signal and would make the similarity products nearly dense.
+        """
+        if self._matrix is None:
+            n_docs = len(self.video_ids)
+            idf = (np.log((1.0 + n_docs) / (1.0 + self.doc_freq)) + 1.0).astype(np.float32)
+            if n_docs > 1:
+                idf[self.doc_freq > self.max_df * n_docs] = 0.0
+            weighted = self.counts.copy()
+            weighted.data = (1.0 + np.log(weighted.data)) * idf[weighted.indices]
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            weighted = sp.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ weighted
+            weighted.eliminate_zeros()
+            self._matrix = weighted.tocsr().astype(np.float32)
+        return self._matrix
+
+    def top_k(self, rows, k=10, candidates=None, max_block_cells=2 ** 24, exclude_self=True):
+        """
+        Cosine top-K neighbours of the given rows, computed block by block.
+
+        Each block of query rows is one sparse x sparse product against the transposed
+        candidates; the result is densified into a (block, candidates) slab, whose size
+        `max_block_cells` bounds, and its top K are selected with argpartition.
+
+        Args:
+            rows (array-like): Query rows (positions in video_ids).
+            candidates (array-like, optional): Rows allowed as neighbours; all videos by default.
+            max_block_cells (int): Upper bound on block rows x candidates per product.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (len(rows), k) neighbour rows (-1 padded) and similarities.
+        """
+        matrix = self.matrix()
+        rows = np.asarray(rows, dtype=np.int64)
+        candidates = np.arange(matrix.shape[0]) if candidates is None else np.asarray(candidates, dtype=np.int64)
+        candidates_t = matrix[candidates].T.tocsr()
+        candidate_position = np.full(matrix.shape[0], -1, dtype=np.int64)
+        candidate_position[candidates] = np.arange(len(candidates))
+        block_size = max(1, max_block_cells // max(len(candidates), 1))
+        neighbours = np.full((len(rows), k), -1, dtype=np.int32)
+        scores = np.zeros((len(rows), k), dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            similarities = (matrix[block] @ candidates_t).toarray()
+            if exclude_self:
+                positions = candidate_position[block]
+                own = positions >= 0
+                similarities[np.flatnonzero(own), positions[own]] = -np.inf
+            top = _top_k_rows(similarities, k)
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            found = top_scores > 0
+            width = top.shape[1]
+            neighbours[start:start + len(block), :width] = np.where(found, candidates[top], -1)
+            scores[start:start + len(block), :width] = np.where(found, top_scores, 0.0)
+        return neighbours, scores
+
+    def neighbours(self, k=10, rebuild_growth=0.2):
+        """
+        Neighbour lists for every video, served from the on-disk cache when it is current.
+
+        When videos were added since the cache was written, only the new rows are queried
+        against everything and the old lists are merged with their best new candidates.
+        Once the index has grown by more than `rebuild_growth` since the last full build
+        (so IDF weights have drifted), all lists are recomputed.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (len(self), k) neighbour rows and similarities.
+        """
+        cache_path = os.path.join(self.directory, "neighbours.npz")
+        n_docs = len(self.video_ids)
+        cached = np.load(cache_path) if os.path.exists(cache_path) else None
+        if cached is not None and cached['neighbours'].shape[1] >= k:
+            n_cached, n_full = int(cached['n_docs']), int(cached['n_full_build'])
+            if n_cached == n_docs:
+                return cached['neighbours'][:, :k], cached['scores'][:, :k]
+            if n_cached < n_docs <= n_full * (1 + rebuild_growth):
+                neighbours, scores = self._extend_neighbours(cached['neighbours'], cached['scores'], n_cached)
+                self._save_neighbours(cache_path, neighbours, scores, n_full)
+                return neighbours[:, :k], scores[:, :k]
+
+        neighbours, scores = self.top_k(np.arange(n_docs), k)
+        self._save_neighbours(cache_path, neighbours, scores, n_docs)
+        return neighbours, scores
+
+    def _extend_neighbours(self, old_neighbours, old_scores, n_cached):
+        k = old_neighbours.shape[1]
+        new_rows = np.arange(n_cached, len(self.video_ids))
+        new_neighbours, new_scores = self.top_k(new_rows, k)
+        # Old videos only need to be compared with the new ones
+        candidate_neighbours, candidate_scores = self.top_k(np.arange(n_cached), k, candidates=new_rows)
+        merged_neighbours = np.hstack([old_neighbours, candidate_neighbours])
+        merged_scores = np.hstack([np.where(old_neighbours >= 0, old_scores, -np.inf),
+                                   np.where(candidate_neighbours >= 0, candidate_scores, -np.inf)])
+        order = np.argsort(-merged_scores, axis=1, kind='stable')[:, :k]
+        merged_neighbours = np.take_along_axis(merged_neighbours, order, axis=1)
+        merged_scores = np.take_along_axis(merged_scores, order, axis=1)
+        missing = ~np.isfinite(merged_scores)
+        merged_neighbours[missing], merged_scores[missing] = -1, 0.0
+        return np.vstack([merged_neighbours, new_neighbours]), np.vstack([merged_scores, new_scores])
+
+    def _save_neighbours(self, cache_path, neighbours, scores, n_full_build):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, neighbours=neighbours, scores=scores, n_docs=len(self.video_ids),
+                 n_full_build=n_full_build)
+        os.replace(tmp_path, cache_path)
+
+    def similar_videos(self, video_id, k=10):
+        """
+        The `k` videos most similar to `video_id`, using the cached neighbour lists.
+
+        Returns:
+            pd.DataFrame: video_id, title and similarity_score, most similar first.
+        """
+        row = self.video_index.get(str(video_id))
+        if row is None:
+            raise KeyError(f"Video {video_id} is not in the content index.")
+        neighbours, scores = self.neighbours(k)
+        found = neighbours[row] >= 0
+        return pd.DataFrame({
+            'video_id': [self.video_ids[i] for i in neighbours[row][found]],
+            'title': [self.titles[i] for i in neighbours[row][found]],
+            'similarity_score': scores[row][found].astype(float),
+        })
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "terms.txt"), "w", encoding="utf-8") as f:
+            f.writelines(term + "\n" for term in self.terms)
+        np.save(os.path.join(self.directory, "doc_freq.npy"), self.doc_freq)
+        sp.save_npz(os.path.join(self.directory, "counts.npz"), self.counts)
+        pd.DataFrame({'video_id': self.video_ids, 'title': self.titles}).to_parquet(
+            os.path.join(self.directory, "videos.parquet"), index=False
+        )
+
+    def load(self):
+        counts_path = os.path.join(self.directory, "counts.npz")
+        if not os.path.exists(counts_path):
+            return
+        with open(os.path.join(self.directory, "terms.txt"), "r", encoding="utf-8") as f:
+            self.terms = f.read().split("\n")[:-1]
+        self.term_index = {term: column for column, term in enumerate(self.terms)}
+        self.doc_freq = np.load(os.path.join(self.directory, "doc_freq.npy"))
+        self.counts = sp.load_npz(counts_path).tocsr()
+        videos = pd.read_parquet(os.path.join(self.directory, "videos.parquet"))
+        self.video_ids = videos['video_id'].tolist()
+        self.titles = videos['title'].tolist()
+        self.video_index = {video_id: row for row, video_id in enumerate(self.video_ids)}
+        self._matrix = None
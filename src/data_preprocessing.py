@@ -1,4 +0,0 @@
-def preprocess_data(data):
-    # Dummy function for demonstration
-    processed_data = data  # Replace with your preprocessing logic
-    return processed_data
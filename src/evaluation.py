@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from src.retrieval import RetrievalEngine, SeenItems
+
+
+def time_split(df, test_fraction=0.2, timestamp_column='timestamp', cutoff=None):
+    """
+    Split interactions at a point in time: everything before the cutoff trains, the rest tests.
+
+    Args:
+        df (pd.DataFrame): Interactions with a timestamp column (strings or datetimes).
+        test_fraction (float): Share of the interactions, by time, to hold out when no cutoff is given.
+        cutoff (str or pd.Timestamp, optional): Explicit split time.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Train and test interactions.
+    """
+    times = pd.to_datetime(df[timestamp_column], errors='coerce', utc=True)
+    if cutoff is None:
+        cutoff = times.quantile(1.0 - test_fraction)
+    else:
+        cutoff = pd.Timestamp(cutoff)
+        cutoff = cutoff.tz_localize('UTC') if cutoff.tzinfo is None else cutoff
+    test = (times >= cutoff).to_numpy()
+    valid = times.notna().to_numpy()
+    return df[valid & ~test], df[valid & test]
+
+
+def _ideal_dcg(n_relevant, k):
+    # Discounted gain of a perfect ranking for each possible number of relevant items up to k
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    cumulative = np.concatenate([[0.0], np.cumsum(discounts)])
+    return cumulative[np.minimum(n_relevant, k)]
+
+
+def ranking_metrics(model, train_user_codes, train_item_codes, test_user_codes, test_item_codes, k=10,
+                    test_ratings=None, min_rating=None, batch_size=1024):
+    """
+    precision@k, recall@k, NDCG@k and catalog coverage over all test users at once.
+
+    Recommendations come from RetrievalEngine with the training interactions masked out.
+    Hits are found by looking up (user, item) keys of the top-k lists in the sorted keys
+    of the test interactions, so no per-prediction objects are created.
+
+    Args:
+        model (FactorModel): Model trained on the training interactions.
+        train_user_codes, train_item_codes (array-like): Training interactions (masked from recommendations).
+        test_user_codes, test_item_codes (array-like): Held-out interactions.
+        k (int): Cut-off rank.
+        test_ratings (array-like, optional): Ratings of the test interactions, used with `min_rating`.
+        min_rating (float, optional): Only test interactions rated at least this much count as relevant.
+
+    Returns:
+        dict: Mean metrics over test users plus the number of users evaluated.
+    """
+    test_user_codes = np.asarray(test_user_codes, dtype=np.int64)
+    test_item_codes = np.asarray(test_item_codes, dtype=np.int64)
+    if min_rating is not None and test_ratings is not None:
+        relevant = np.asarray(test_ratings) >= min_rating
+        test_user_codes, test_item_codes = test_user_codes[relevant], test_item_codes[relevant]
+
+    known = (test_user_codes >= 0) & (test_item_codes >= 0)
+    test_user_codes, test_item_codes = test_user_codes[known], test_item_codes[known]
+    if not len(test_user_codes):
+        return {'users': 0, f'precision@{k}': np.nan, f'recall@{k}': np.nan, f'ndcg@{k}': np.nan,
+                'coverage': np.nan}
+
+    users, user_index = np.unique(test_user_codes, return_inverse=True)
+    n_item_keys = int(max(test_item_codes.max(), model.item_codes.max(initial=0))) + 1
+    test_keys = np.unique(user_index * n_item_keys + test_item_codes)
+    n_relevant = np.bincount(test_keys // n_item_keys, minlength=len(users))
+
+    seen = SeenItems.from_codes(model, np.asarray(train_user_codes), np.asarray(train_item_codes))
+    engine = RetrievalEngine(model, seen=seen, batch_size=batch_size)
+    recommended, _ = engine.top_k(users, k)
+    width = recommended.shape[1]
+
+    # A recommendation is a hit when its (user, item) key is among the test keys
+    keys = np.arange(len(users))[:, None] * n_item_keys + recommended
+    positions = np.clip(np.searchsorted(test_keys, keys), 0, len(test_keys) - 1)
+    hits = (test_keys[positions] == keys) & (recommended >= 0)
+
+    discounts = 1.0 / np.log2(np.arange(2, width + 2))
+    n_hits = hits.sum(axis=1)
+    ndcg = (hits * discounts).sum(axis=1) / _ideal_dcg(n_relevant, width)
+    valid = recommended[recommended >= 0]
+    return {
+        'users': int(len(users)),
+        f'precision@{k}': float(np.mean(n_hits / k)),
+        f'recall@{k}': float(np.mean(n_hits / n_relevant)),
+        f'ndcg@{k}': float(np.mean(ndcg)),
+        'coverage': float(len(np.unique(valid)) / len(model.item_codes)) if len(model.item_codes) else 0.0,
+    }
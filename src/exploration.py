@@ -0,0 +1,289 @@
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.storage import iter_table_chunks
+from src.streaming_preprocessing import QuantileSketch
+
+DESCRIBE_QUANTILES = [0.25, 0.5, 0.75]
+
+
+def _numeric(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+class LogHistogram:
+    """
+    Mergeable histogram with logarithmic bins, for long-tailed counts like views.
+
+    Bin i covers [10**(i / bins_per_decade), 10**((i + 1) / bins_per_decade)); zeros and
+    negative values are counted separately. Bins are fixed by `bins_per_decade` alone, so
+    histograms of separate chunks add up without knowing the value range in advance.
+    """
+
+    def __init__(self, bins_per_decade=10):
+        self.bins_per_decade = bins_per_decade
+        self.counts = {}
+        self.zeros = 0
+        self.negatives = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        self.zeros += int((values == 0).sum())
+        self.negatives += int((values < 0).sum())
+        positive = values[values > 0]
+        if positive.size:
+            bins, counts = np.unique(np.floor(np.log10(positive) * self.bins_per_decade).astype(np.int64),
+                                     return_counts=True)
+            for bin_index, count in zip(bins.tolist(), counts.tolist()):
+                self.counts[bin_index] = self.counts.get(bin_index, 0) + count
+        return self
+
+    def merge(self, other):
+        for bin_index, count in other.counts.items():
+            self.counts[bin_index] = self.counts.get(bin_index, 0) + count
+        self.zeros += other.zeros
+        self.negatives += other.negatives
+        return self
+
+    def to_frame(self):
+        """
+        Non-empty positive bins as a DataFrame with `lower`, `upper` and `count`.
+        """
+        bins = np.array(sorted(self.counts), dtype=np.int64)
+        return pd.DataFrame({
+            'lower': 10.0 ** (bins / self.bins_per_decade),
+            'upper': 10.0 ** ((bins + 1) / self.bins_per_decade),
+            'count': [self.counts[bin_index] for bin_index in bins.tolist()],
+        })
+
+
+class ColumnSummary:
+    """
+    Mergeable statistics behind DataFrame.describe() for one numeric column.
+
+    Mean and variance use Chan et al.'s pairwise update, so chunk order does not affect
+    accuracy; the quartiles come from a QuantileSketch and are approximate.
+    """
+
+    def __init__(self, k=256):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(k)
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if values.size:
+            chunk = ColumnSummary(self.sketch.k)
+            chunk.count = int(values.size)
+            chunk.mean = float(values.mean())
+            chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+            chunk.min = float(values.min())
+            chunk.max = float(values.max())
+            chunk.sketch.update(values)
+            self.merge(chunk)
+        return self
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def describe(self):
+        summary = {'count': float(self.count), 'mean': self.mean if self.count else float('nan'),
+                   'std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan'),
+                   'min': self.min if self.count else float('nan')}
+        for q in DESCRIBE_QUANTILES:
+            summary[f"{q:.0%}"] = self.sketch.quantile(q)
+        summary['max'] = self.max if self.count else float('nan')
+        return summary
+
+
+class CoMoments:
+    """
+    Mergeable means and co-moment matrix of a set of columns, for the correlation matrix.
+
+    Only rows where every column is present are used (listwise deletion), whereas
+    DataFrame.corr() drops missing values pair by pair.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.count = 0
+        self.mean = np.zeros(len(self.columns))
+        self.comoment = np.zeros((len(self.columns), len(self.columns)))
+
+    def update(self, matrix):
+        matrix = np.asarray(matrix, dtype='float64')
+        matrix = matrix[~np.isnan(matrix).any(axis=1)]
+        if len(matrix):
+            chunk = CoMoments(self.columns)
+            chunk.count = len(matrix)
+            chunk.mean = matrix.mean(axis=0)
+            centered = matrix - chunk.mean
+            chunk.comoment = centered.T @ centered
+            self.merge(chunk)
+        return self
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.count * other.count / count
+        self.mean = self.mean + delta * other.count / count
+        self.count = count
+        return self
+
+    def correlation(self):
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(std, std)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class TopN:
+    """
+    The `n` entities with the largest `key`, kept in a bounded min-heap.
+
+    Rows repeating the same entity (e.g. one video per interaction in the merged data)
+    count once, with their largest value.
+    """
+
+    def __init__(self, n, key, id_column='video_id', label_columns=('title',)):
+        self.n = n
+        self.key = key
+        self.id_column = id_column
+        self.label_columns = list(label_columns)
+        self.heap = []
+        self.members = {}
+
+    def _push(self, value, entity_id, labels):
+        current = self.members.get(entity_id)
+        if current is not None:
+            if value > current[0]:
+                # Rare: a later row of a tracked entity has a larger value
+                self.heap = [entry for entry in self.heap if entry[1] != entity_id]
+                heapq.heapify(self.heap)
+                self._add(value, entity_id, labels)
+            return
+        if len(self.heap) < self.n:
+            self._add(value, entity_id, labels)
+        elif (value, entity_id) > self.heap[0][:2]:
+            del self.members[heapq.heappop(self.heap)[1]]
+            self._add(value, entity_id, labels)
+
+    def _add(self, value, entity_id, labels):
+        entry = (value, entity_id, labels)
+        heapq.heappush(self.heap, entry)
+        self.members[entity_id] = entry
+
+    def update(self, df):
+        values = pd.Series(_numeric(df[self.key]), index=df.index)
+        values = values.dropna()
+        if values.empty:
+            return self
+        # Only the chunk's own top n can enter the heap: one row per entity, then the largest
+        best = values.groupby(df.loc[values.index, self.id_column], sort=False, observed=True).idxmax()
+        candidates = values.loc[best.to_numpy()].nlargest(self.n)
+        for row, value in candidates.items():
+            self._push(float(value), str(df.at[row, self.id_column]),
+                       tuple(df.at[row, label] if label in df.columns else None for label in self.label_columns))
+        return self
+
+    def merge(self, other):
+        for value, entity_id, labels in other.heap:
+            self._push(value, entity_id, labels)
+        return self
+
+    def to_frame(self):
+        rows = [(entity_id, *labels, value) for value, entity_id, labels in sorted(self.heap, reverse=True)]
+        return pd.DataFrame(rows, columns=[self.id_column] + self.label_columns + [self.key])
+
+
+class TableProfile:
+    """
+    Everything the exploration report shows, computed in one pass over a table's chunks.
+
+    Args:
+        histogram_columns (list): Columns with a log-binned histogram.
+        correlation_columns (list): Columns of the correlation matrix.
+        top_key (str): Column ranking the top entities (e.g. like_count).
+        top_n (int): Entities kept for the top list.
+    """
+
+    def __init__(self, histogram_columns=('view_count',), correlation_columns=('view_count', 'like_count',
+                 'comment_count'), top_key='like_count', top_n=10, id_column='video_id', label_columns=('title',)):
+        self.rows = 0
+        self.dtypes = None
+        self.head = None
+        self.non_null = {}
+        self.summaries = {}
+        self.histograms = {column: LogHistogram() for column in histogram_columns}
+        self.comoments = CoMoments(correlation_columns)
+        self.top = TopN(top_n, top_key, id_column=id_column, label_columns=label_columns)
+
+    def update(self, df):
+        if self.dtypes is None:
+            # Column types and numeric columns are taken from the first chunk
+            self.dtypes = df.dtypes.astype(str).to_dict()
+            self.head = df.head()
+            self.summaries = {column: ColumnSummary() for column in df.columns
+                              if pd.api.types.is_numeric_dtype(df[column])}
+        self.rows += len(df)
+        for column, count in df.notna().sum().items():
+            self.non_null[column] = self.non_null.get(column, 0) + int(count)
+        for column, summary in self.summaries.items():
+            if column in df.columns:
+                summary.update(_numeric(df[column]))
+        for column, histogram in self.histograms.items():
+            if column in df.columns:
+                histogram.update(_numeric(df[column]))
+        if all(column in df.columns for column in self.comoments.columns):
+            self.comoments.update(np.column_stack([_numeric(df[column]) for column in self.comoments.columns]))
+        if self.top.key in df.columns and self.top.id_column in df.columns:
+            self.top.update(df)
+        return self
+
+    def info(self):
+        """
+        DataFrame.info() as a table: dtype and non-null count per column.
+        """
+        return pd.DataFrame({'dtype': pd.Series(self.dtypes),
+                             'non_null': pd.Series(self.non_null, dtype='int64')})
+
+    def describe(self):
+        return pd.DataFrame({column: summary.describe() for column, summary in self.summaries.items()})
+
+
+def profile_table(path, chunksize=100_000, columns=None, **profile_kwargs):
+    """
+    Profile a stage output (CSV file or Parquet dataset) in a single streaming pass.
+
+    Memory is bounded by one chunk plus the aggregates, independent of the table size.
+    Long text columns such as descriptions dominate the read time; leave them out of
+    `columns` when they are not needed.
+
+    Returns:
+        TableProfile: The row count, column info, describe() statistics, histograms,
+        correlation co-moments and top entities.
+    """
+    profile = TableProfile(**profile_kwargs)
+    for chunk in iter_table_chunks(path, chunksize=chunksize, columns=columns):
+        profile.update(chunk)
+    return profile
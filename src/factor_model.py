@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class FactorModel:
+    """
+    Matrix-factorization model held as contiguous NumPy arrays.
+
+    Scores follow surprise's SVD: global_mean + user_bias + item_bias + dot(user, item),
+    clipped to the rating scale. Users and items are addressed by the int32 codes of the
+    id dictionaries; `user_rows`/`item_rows` map a code to its row in the factor matrices
+    (-1 when the model has not seen it, in which case only the known terms are used).
+    """
+
+    def __init__(self, user_factors, item_factors, user_bias, item_bias, global_mean,
+                 user_codes, item_codes, rating_scale=(0, 1), user_rows=None, item_rows=None):
+        self.user_factors = np.ascontiguousarray(user_factors, dtype=np.float32)
+        self.item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+        self.user_bias = np.ascontiguousarray(user_bias, dtype=np.float32)
+        self.item_bias = np.ascontiguousarray(item_bias, dtype=np.float32)
+        self.global_mean = float(global_mean)
+        self.user_codes = np.asarray(user_codes, dtype=np.int32)
+        self.item_codes = np.asarray(item_codes, dtype=np.int32)
+        self.rating_scale = tuple(rating_scale)
+        self.user_rows = _row_lookup(self.user_codes) if user_rows is None else np.asarray(user_rows)
+        self.item_rows = _row_lookup(self.item_codes) if item_rows is None else np.asarray(item_rows)
+
+    @classmethod
+    def from_surprise(cls, algo):
+        """
+        Extract the factors of a fitted surprise SVD trained on integer id codes.
+        """
+        trainset = algo.trainset
+        user_codes = [int(trainset.to_raw_uid(inner)) for inner in range(trainset.n_users)]
+        item_codes = [int(trainset.to_raw_iid(inner)) for inner in range(trainset.n_items)]
+        biased = getattr(algo, 'biased', True)
+        n_users, n_items = trainset.n_users, trainset.n_items
+        return cls(
+            user_factors=algo.pu,
+            item_factors=algo.qi,
+            user_bias=algo.bu if biased else np.zeros(n_users),
+            item_bias=algo.bi if biased else np.zeros(n_items),
+            global_mean=trainset.global_mean if biased else 0.0,
+            user_codes=user_codes,
+            item_codes=item_codes,
+            rating_scale=trainset.rating_scale,
+        )
+
+    @property
+    def n_factors(self):
+        return self.user_factors.shape[1]
+
+    def rows(self, codes, lookup):
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.full(codes.shape, -1, dtype=np.int64)
+        valid = (codes >= 0) & (codes < len(lookup))
+        rows[valid] = lookup[codes[valid]]
+        return rows
+
+    def score(self, user_codes, item_codes):
+        """
+        Predicted ratings for aligned arrays of user and item codes, computed in one pass.
+        """
+        user_rows = self.rows(user_codes, self.user_rows)
+        item_rows = self.rows(item_codes, self.item_rows)
+        known_user = user_rows >= 0
+        known_item = item_rows >= 0
+        scores = np.full(user_rows.shape, self.global_mean, dtype=np.float32)
+        scores[known_user] += self.user_bias[user_rows[known_user]]
+        scores[known_item] += self.item_bias[item_rows[known_item]]
+        both = known_user & known_item
+        scores[both] += np.einsum(
+            'ij,ij->i', self.user_factors[user_rows[both]], self.item_factors[item_rows[both]]
+        )
+        return np.clip(scores, *self.rating_scale)
+
+
+def _row_lookup(codes):
+    lookup = np.full(int(codes.max()) + 1 if len(codes) else 0, -1, dtype=np.int32)
+    lookup[codes] = np.arange(len(codes))
+    return lookup
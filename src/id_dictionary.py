@@ -0,0 +1,220 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_CODE = -1
+
+
+def normalize_video_ids(values):
+    """
+    Vectorized form of the video_id standardization used by load_and_merge_data:
+    drop every non-alphanumeric character and lowercase. Missing values stay missing.
+    """
+    series = pd.Series(values, copy=False)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Normalize each distinct id once instead of once per row
+        categories = normalize_video_ids(pd.Series(series.cat.categories))
+        codes = series.cat.codes.to_numpy()
+        normalized = categories.to_numpy(dtype=object, na_value=None)[codes]
+        normalized[codes == -1] = None
+        return pd.Series(normalized, index=series.index, dtype='string')
+    return series.astype('string').str.replace(r'[^a-zA-Z0-9]', '', regex=True).str.lower()
+
+
+def normalize_user_ids(values):
+    """
+    Normalize user ids to trimmed strings. Missing values stay missing.
+    """
+    return pd.Series(values, copy=False).astype('string').str.strip()
+
+
+NORMALIZERS = {
+    'video_id': normalize_video_ids,
+    'user_id': normalize_user_ids,
+}
+
+
+class IdDictionary:
+    """
+    Append-only mapping between normalized id strings and dense int32 codes.
+
+    Codes are assigned in order of first appearance and never change, so codes
+    stored by earlier runs stay valid as new ids arrive. The dictionary is
+    persisted as a text file with one id per line (line number == code) and new
+    ids are appended to it instead of rewriting the whole file.
+
+    Several processes (cron jobs, search and benchmark workers) may share the file. A
+    dictionary with a path therefore assigns new codes under an exclusive lock on it,
+    after reading the ids other processes appended in the meantime, and appends them
+    before releasing the lock: every process hands out the same code for the same id.
+    """
+
+    def __init__(self, ids=(), path=None):
+        self.path = path
+        self._ids = pd.Index(pd.Series(list(ids), dtype=object))
+        self._persisted = 0
+        self._offset = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def ids(self):
+        return self._ids.to_numpy()
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "rb") as f:
+            # Shared lock: never read a line another process is still appending
+            fcntl.flock(f, fcntl.LOCK_SH)
+            data = f.read()
+        ids = data.decode("utf-8").splitlines()
+        dictionary = cls(ids, path=path)
+        dictionary._persisted = len(ids)
+        dictionary._offset = len(data)
+        return dictionary
+
+    @contextmanager
+    def _locked_file(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self, f):
+        # Pick up the ids other processes appended since this dictionary last read or wrote the file
+        f.seek(self._offset)
+        data = f.read()
+        self._offset += len(data)
+        tail = data.decode("utf-8").splitlines()
+        if not tail:
+            return
+        unpersisted = self._ids[self._persisted:].tolist()
+        if unpersisted and tail[:len(unpersisted)] != unpersisted:
+            # Codes of ids only held in memory were already handed out; moving them behind
+            # the new tail would silently change them
+            raise RuntimeError(f"{self.path} changed on disk while {len(unpersisted)} ids were not saved; "
+                               "encode with the path set so new codes are assigned under the file lock.")
+        self._ids = self._ids[:self._persisted].append(pd.Index(tail, dtype=object))
+        self._persisted = len(self._ids)
+
+    def _append(self, f):
+        pending = self._ids[self._persisted:]
+        if len(pending):
+            data = "".join(f"{value}\n" for value in pending).encode("utf-8")
+            f.write(data)
+            f.flush()
+            self._offset += len(data)
+            self._persisted = len(self._ids)
+
+    def save(self, path=None):
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path given for the id dictionary.")
+        if path != self.path:
+            # A copy under a new path starts a new file; an existing one may be a dictionary
+            # other processes append to, so it is never overwritten
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            try:
+                f = open(path, "xb")
+            except FileExistsError:
+                raise FileExistsError(f"Id dictionary {path} already exists; load it instead of saving over it.")
+            with f:
+                f.write("".join(f"{value}\n" for value in self._ids).encode("utf-8"))
+            self.path = path
+            self._persisted = len(self._ids)
+            self._offset = os.path.getsize(path)
+            return
+        with self._locked_file() as f:
+            self._sync(f)
+            self._append(f)
+
+    def encode(self, values, add=True):
+        """
+        Map normalized ids to int32 codes.
+
+        Args:
+            values (array-like): Normalized ids; missing values map to UNKNOWN_CODE.
+            add (bool): Assign codes to ids not seen before. When False, unseen ids map to UNKNOWN_CODE.
+                With a path, new codes are written to the file before they are returned.
+
+        Returns:
+            np.ndarray: int32 codes aligned with `values`.
+        """
+        series = pd.Series(values, copy=False).astype(object)
+        missing = series.isna().to_numpy()
+        codes = self._ids.get_indexer(series)
+        if add:
+            new = (codes == UNKNOWN_CODE) & ~missing
+            if new.any():
+                if self.path is None:
+                    self._ids = self._ids.append(pd.Index(pd.unique(series[new]), dtype=object))
+                else:
+                    with self._locked_file() as f:
+                        self._sync(f)
+                        known = self._ids.get_indexer(series[new]) != UNKNOWN_CODE
+                        new_ids = pd.unique(series[new][~known])
+                        self._ids = self._ids.append(pd.Index(new_ids, dtype=object))
+                        self._append(f)
+                codes[new] = self._ids.get_indexer(series[new])
+        codes[missing] = UNKNOWN_CODE
+        return codes.astype(np.int32)
+
+    def decode(self, codes):
+        """
+        Map int32 codes back to id strings; UNKNOWN_CODE decodes to None.
+        """
+        codes = np.asarray(codes)
+        ids = self._ids.to_numpy()[np.clip(codes, 0, None)] if len(self._ids) else np.full(codes.shape, None)
+        return np.where(codes == UNKNOWN_CODE, None, ids)
+
+
+class IdDictionaries:
+    """
+    The user_id and video_id dictionaries stored together under one directory.
+    """
+
+    COLUMNS = ('user_id', 'video_id')
+
+    def __init__(self, directory="data/id_dictionaries"):
+        self.directory = directory
+        self.dictionaries = {
+            column: IdDictionary.load(os.path.join(directory, f"{column}.txt"))
+            for column in self.COLUMNS
+        }
+
+    def __getitem__(self, column):
+        return self.dictionaries[column]
+
+    def save(self):
+        for dictionary in self.dictionaries.values():
+            dictionary.save()
+
+    def encode_values(self, column, values, add=True):
+        """
+        Normalize raw ids of one column and map them to int32 codes.
+        """
+        return self.dictionaries[column].encode(NORMALIZERS[column](values), add=add)
+
+    def encode_frame(self, df, add=True):
+        """
+        Normalize the id columns present in df in place and add int32 `<column>_code` columns
+        (e.g. video_id -> video_code).
+        """
+        for column in self.COLUMNS:
+            if column in df.columns:
+                df[column] = NORMALIZERS[column](df[column])
+                df[code_column(column)] = self.dictionaries[column].encode(df[column], add=add)
+        return df
+
+
+def code_column(column):
+    return column.replace('_id', '_code')
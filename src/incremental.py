@@ -0,0 +1,260 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.als import ImplicitALS
+from src.factor_model import FactorModel
+from src.model_artifact import load_factor_model, load_ids, load_seen_items, read_header, save_factor_model
+from src.retrieval import SeenItems
+
+
+def grow_model(model, user_codes, item_codes):
+    """
+    Copy of `model` with zero-initialized rows appended for user and item codes it has not seen.
+
+    Returns:
+        tuple[FactorModel, np.ndarray, np.ndarray]: The grown model and the codes that were added.
+    """
+    new_users = np.setdiff1d(np.unique(user_codes[user_codes >= 0]), model.user_codes)
+    new_items = np.setdiff1d(np.unique(item_codes[item_codes >= 0]), model.item_codes)
+    n_factors = model.n_factors
+    grown = FactorModel(
+        user_factors=np.vstack([model.user_factors, np.zeros((len(new_users), n_factors))]),
+        item_factors=np.vstack([model.item_factors, np.zeros((len(new_items), n_factors))]),
+        user_bias=np.concatenate([model.user_bias, np.zeros(len(new_users))]),
+        item_bias=np.concatenate([model.item_bias, np.zeros(len(new_items))]),
+        global_mean=model.global_mean,
+        user_codes=np.concatenate([model.user_codes, new_users]),
+        item_codes=np.concatenate([model.item_codes, new_items]),
+        rating_scale=model.rating_scale,
+    )
+    return grown, new_users, new_items
+
+
+class IncrementalUpdater:
+    """
+    Folds a batch of new interactions into an existing FactorModel without a full retrain.
+
+    Unseen users and videos get rows solved by regularized least squares against the
+    fixed factors of the other side, then a few refinement steps update only the rows
+    touched by the batch:
+
+    - "svd" (explicit ratings): `refine_steps` vectorized gradient steps on the batch
+      errors, with the same learning rate and regularization defaults as surprise's SVD.
+    - "als" (implicit feedback): `als_sweeps` warm-started conjugate-gradient
+      least-squares solves for the affected users and items, as in ImplicitALS. The
+      solves need every interaction of those rows, so they only run when the history
+      is passed to update(); otherwise only brand-new users and videos are folded in.
+    """
+
+    def __init__(self, kind="svd", refine_steps=10, lr=0.005, regularization=0.02,
+                 als_sweeps=2, als_regularization=0.01, alpha=40.0):
+        if kind not in ("svd", "als"):
+            raise ValueError(f"Unsupported model kind: {kind}")
+        self.kind = kind
+        self.refine_steps = refine_steps
+        self.lr = lr
+        self.regularization = regularization
+        self.als_sweeps = als_sweeps
+        self.als = ImplicitALS(regularization=als_regularization, alpha=alpha, iterations=1)
+
+    def update(self, model, user_codes, item_codes, values, history=None):
+        """
+        Args:
+            model (FactorModel): Current model. It is not modified.
+            user_codes (array-like): User codes of the new interactions.
+            item_codes (array-like): Video codes of the new interactions.
+            values (array-like): Ratings (svd) or implicit signal strength (als).
+            history (tuple, optional): (user_codes, item_codes, values) of the interactions
+                already in the model (als only). Returning users and videos in the batch are
+                re-solved against their history plus the batch. Without it they keep their
+                factors: solving them against the batch alone would treat everything they
+                interacted with before as a negative.
+
+        Returns:
+            FactorModel: The updated model, including rows for new users and videos.
+        """
+        user_codes = np.asarray(user_codes, dtype=np.int64)
+        item_codes = np.asarray(item_codes, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        keep = (user_codes >= 0) & (item_codes >= 0) & np.isfinite(values)
+        if self.kind == "als":
+            keep &= values > 0
+        user_codes, item_codes, values = user_codes[keep], item_codes[keep], values[keep]
+
+        model, new_users, new_items = grow_model(model, user_codes, item_codes)
+        user_rows = model.rows(user_codes, model.user_rows)
+        item_rows = model.rows(item_codes, model.item_rows)
+        if self.kind == "als":
+            self._update_als(model, user_rows, item_rows, values, new_users, new_items, history)
+        else:
+            self._update_svd(model, user_rows, item_rows, values, new_users, new_items)
+        return model
+
+    def _update_als(self, model, user_rows, item_rows, values, new_users, new_items, history):
+        affected_users = np.unique(user_rows)
+        affected_items = np.unique(item_rows)
+        if history is None:
+            # Without the history only the rows whose whole history is in the batch are solved
+            affected_users = model.rows(new_users, model.user_rows)
+            affected_items = model.rows(new_items, model.item_rows)
+        else:
+            history_users, history_items, history_values = (np.asarray(array) for array in history)
+            history_user_rows = model.rows(history_users, model.user_rows)
+            history_item_rows = model.rows(history_items, model.item_rows)
+            keep = (history_user_rows >= 0) & (history_item_rows >= 0) & (history_values > 0)
+            user_rows = np.concatenate([history_user_rows[keep], user_rows])
+            item_rows = np.concatenate([history_item_rows[keep], item_rows])
+            values = np.concatenate([history_values[keep].astype(np.float32), values])
+
+        shape = (len(model.user_codes), len(model.item_codes))
+        confidence = sp.csr_matrix((values, (user_rows, item_rows)), shape=shape)
+        confidence.sum_duplicates()
+        confidence.data = (1.0 + self.als.alpha * confidence.data).astype(np.float32)
+        confidence_t = confidence.T.tocsr()
+        # Fold in new videos first from the existing users, then refine both sides
+        new_item_rows = model.rows(new_items, model.item_rows)
+        model.item_factors = self.als.solve(confidence_t, model.user_factors, model.item_factors, rows=new_item_rows)
+        for _ in range(self.als_sweeps):
+            model.user_factors = self.als.solve(confidence, model.item_factors, model.user_factors, rows=affected_users)
+            model.item_factors = self.als.solve(confidence_t, model.user_factors, model.item_factors,
+                                                rows=affected_items)
+
+    def _update_svd(self, model, user_rows, item_rows, values, new_users, new_items):
+        reg = self.regularization
+        residual = values - model.global_mean
+        # Least-squares fold-in of the biases of new rows
+        new_user_rows = model.rows(new_users, model.user_rows)
+        new_item_rows = model.rows(new_items, model.item_rows)
+        item_counts = np.bincount(item_rows, minlength=len(model.item_codes))
+        item_sums = np.bincount(item_rows, weights=residual, minlength=len(model.item_codes))
+        model.item_bias[new_item_rows] = item_sums[new_item_rows] / (item_counts[new_item_rows] + reg)
+        residual_after_item = residual - model.item_bias[item_rows]
+        user_counts = np.bincount(user_rows, minlength=len(model.user_codes))
+        user_sums = np.bincount(user_rows, weights=residual_after_item, minlength=len(model.user_codes))
+        model.user_bias[new_user_rows] = user_sums[new_user_rows] / (user_counts[new_user_rows] + reg)
+
+        # Least-squares fold-in of new user factors against the fixed item factors, then new items
+        self._fold_in_rows(new_user_rows, user_rows, item_rows, model.user_factors, model.item_factors,
+                           residual_after_item - model.user_bias[user_rows])
+        self._fold_in_rows(new_item_rows, item_rows, user_rows, model.item_factors, model.user_factors,
+                           residual - model.item_bias[item_rows] - model.user_bias[user_rows])
+
+        # Refinement: full-batch gradient steps restricted to the rows in the batch
+        low, high = model.rating_scale
+        for _ in range(self.refine_steps):
+            predictions = (model.global_mean + model.user_bias[user_rows] + model.item_bias[item_rows]
+                           + np.einsum('ij,ij->i', model.user_factors[user_rows], model.item_factors[item_rows]))
+            errors = values - np.clip(predictions, low, high)
+            user_grad = np.zeros_like(model.user_factors)
+            item_grad = np.zeros_like(model.item_factors)
+            np.add.at(user_grad, user_rows, errors[:, None] * model.item_factors[item_rows])
+            np.add.at(item_grad, item_rows, errors[:, None] * model.user_factors[user_rows])
+            user_counts_f = np.maximum(user_counts, 1)[:, None]
+            item_counts_f = np.maximum(item_counts, 1)[:, None]
+            affected_users = user_counts > 0
+            affected_items = item_counts > 0
+            model.user_bias[affected_users] += self.lr * (
+                np.bincount(user_rows, weights=errors, minlength=len(user_counts))[affected_users]
+                - reg * user_counts[affected_users] * model.user_bias[affected_users])
+            model.item_bias[affected_items] += self.lr * (
+                np.bincount(item_rows, weights=errors, minlength=len(item_counts))[affected_items]
+                - reg * item_counts[affected_items] * model.item_bias[affected_items])
+            model.user_factors[affected_users] += self.lr * (
+                user_grad[affected_users] - reg * user_counts_f[affected_users] * model.user_factors[affected_users])
+            model.item_factors[affected_items] += self.lr * (
+                item_grad[affected_items] - reg * item_counts_f[affected_items] * model.item_factors[affected_items])
+
+    def _fold_in_rows(self, target_rows, owner_rows, other_rows, factors, other_factors, targets):
+        # Solve (Q_I^T Q_I + reg * n * I) p = Q_I^T r for each new row from its batch interactions
+        selected = np.isin(owner_rows, target_rows)
+        order = np.argsort(owner_rows[selected], kind='stable')
+        owners = owner_rows[selected][order]
+        neighbours = other_factors[other_rows[selected][order]]
+        targets = targets[selected][order]
+        rows, starts = np.unique(owners, return_index=True)
+        identity = np.eye(factors.shape[1])
+        for row, neighbour_block, target_block in zip(rows, np.split(neighbours, starts[1:]),
+                                                      np.split(targets, starts[1:])):
+            gram = neighbour_block.T @ neighbour_block + self.regularization * len(neighbour_block) * identity
+            factors[row] = np.linalg.solve(gram, neighbour_block.T @ target_block)
+
+
+def publish_model(model, artifact_path, metadata=None, full_retrain=False, seen=None, id_dictionaries=None):
+    """
+    Write a new model version atomically; a running server picks it up on its next poll.
+
+    The header carries over the previous version's metadata and records the version
+    number and when the last full training happened, which needs_full_retrain uses
+    for scheduling. `seen` (SeenItems) and the ids of `id_dictionaries` are stored with
+    the model for serving.
+
+    Returns:
+        str: The path written.
+    """
+    try:
+        previous = read_header(artifact_path).get('metadata', {})
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    now = time.time()
+    merged = dict(previous)
+    merged.update(metadata or {})
+    merged.update({
+        'version': int(previous.get('version', 0)) + 1,
+        'updated_at': now,
+        'trained_at': now if full_retrain else previous.get('trained_at', now),
+    })
+    return save_factor_model(model, artifact_path, metadata=merged, seen=seen, id_dictionaries=id_dictionaries)
+
+
+def needs_full_retrain(artifact_path, max_age_hours=24.0):
+    """
+    True when no artifact exists or its last full training is older than `max_age_hours`.
+    """
+    try:
+        metadata = read_header(artifact_path).get('metadata', {})
+    except FileNotFoundError:
+        return True
+    trained_at = metadata.get('trained_at')
+    return trained_at is None or time.time() - trained_at > max_age_hours * 3600
+
+
+def update_artifact(artifact_path, user_codes, item_codes, values, kind=None, history=None, id_dictionaries=None,
+                    **updater_kwargs):
+    """
+    Load the artifact, fold in a batch of interactions and publish the next version.
+
+    Args:
+        artifact_path (str): Existing `.fmodel` artifact.
+        kind (str, optional): 'svd' or 'als'; read from the artifact metadata when omitted.
+        history (tuple, optional): (user_codes, item_codes, values) the model already
+            contains; see IncrementalUpdater.update. Defaults to the seen items stored
+            with the artifact, which include every batch folded in before.
+        id_dictionaries (IdDictionaries, optional): Dictionaries the batch codes come from.
+            Defaults to the ids stored with the artifact, which only know its current rows.
+
+    Returns:
+        FactorModel: The published model.
+    """
+    if kind is None:
+        algorithm = read_header(artifact_path).get('metadata', {}).get('algorithm')
+        kind = 'als' if algorithm == 'implicit_als' else 'svd'
+    model = load_factor_model(artifact_path, mmap=False)
+    seen = load_seen_items(artifact_path, mmap=False)
+    seen_users, seen_items = seen.codes(model) if seen is not None else (np.empty(0, np.int64),) * 2
+    seen_values = seen.values if seen is not None else np.empty(0, np.float32)
+    if history is None and kind == 'als' and seen_values is not None and len(seen_values):
+        history = (seen_users, seen_items, seen_values)
+    updated = IncrementalUpdater(kind=kind, **updater_kwargs).update(model, user_codes, item_codes, values,
+                                                                     history=history)
+    # The stored seen items gain the batch, re-indexed for the rows of the grown model, so
+    # the next update sees this batch as history too
+    if seen_values is not None:
+        seen_values = np.concatenate([seen_values, np.asarray(values, dtype=np.float32)])
+    seen = SeenItems.from_codes(updated, np.concatenate([seen_users, np.asarray(user_codes, dtype=np.int64)]),
+                                np.concatenate([seen_items, np.asarray(item_codes, dtype=np.int64)]), seen_values)
+    if id_dictionaries is None:
+        id_dictionaries = load_ids(artifact_path, model)
+    publish_model(updated, artifact_path, seen=seen, id_dictionaries=id_dictionaries)
+    return updated
@@ -0,0 +1,363 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import yaml
+
+METRIC_PREFIX = "youtube_pipeline_"
+
+# Prometheus type and help text of every metric the pipeline records
+METRICS = {
+    'stage_runs_total': ('counter', 'Stage executions by outcome.'),
+    'stage_duration_seconds_total': ('counter', 'Wall time spent in each stage.'),
+    'stage_last_duration_seconds': ('gauge', 'Wall time of the latest execution of each stage.'),
+    'stage_rows_in_total': ('counter', 'Rows read by each stage.'),
+    'stage_rows_out_total': ('counter', 'Rows written or returned by each stage.'),
+    'stage_bytes_read_total': ('counter', 'Bytes read by each stage.'),
+    'stage_bytes_written_total': ('counter', 'Bytes written by each stage.'),
+    'stage_peak_rss_bytes': ('gauge', 'Process peak resident memory when each stage finished.'),
+    'storage_rows_read_total': ('counter', 'Rows read through read_table per table.'),
+    'storage_bytes_read_total': ('counter', 'On-disk bytes of the tables read through read_table.'),
+    'storage_rows_written_total': ('counter', 'Rows written through write_table per table.'),
+    'storage_bytes_written_total': ('counter', 'Bytes written through write_table per table.'),
+    'api_requests_total': ('counter', 'Requests sent to external APIs.'),
+    'youtube_quota_units_total': ('counter', 'YouTube Data API quota units spent.'),
+    's3_bytes_uploaded_total': ('counter', 'Bytes uploaded to S3.'),
+    's3_bytes_downloaded_total': ('counter', 'Bytes downloaded from S3.'),
+    'cache_requests_total': ('counter', 'Cache lookups by result (hit or miss).'),
+    'cache_hit_ratio': ('gauge', 'Share of cache lookups answered from the cache.'),
+    'process_peak_rss_bytes': ('gauge', 'Peak resident memory of the process.'),
+}
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process counters and gauges keyed by metric name and labels.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+
+    def _with_derived(self):
+        # Hit ratios are derived from the hit/miss counters when exporting
+        with self._lock:
+            values = dict(self.values)
+        lookups = {}
+        for (name, labels), value in values.items():
+            if name == 'cache_requests_total':
+                labels = dict(labels)
+                totals = lookups.setdefault(labels['cache'], [0, 0])
+                totals[0] += value if labels.get('result') == 'hit' else 0
+                totals[1] += value
+        for cache, (hits, total) in lookups.items():
+            values[('cache_hit_ratio', (('cache', cache),))] = hits / total if total else 0.0
+        values[('process_peak_rss_bytes', ())] = peak_rss_bytes()
+        return values
+
+    def to_prometheus(self):
+        """
+        The metrics in the Prometheus text exposition format, e.g. for the node_exporter
+        textfile collector.
+        """
+        lines = []
+        by_name = {}
+        for (name, labels), value in sorted(self._with_derived().items()):
+            by_name.setdefault(name, []).append((labels, value))
+        for name, samples in by_name.items():
+            metric_type, help_text = METRICS.get(name, ('untyped', name))
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f"{METRIC_PREFIX}{name}{{{label_text}}} {value}" if label_text
+                             else f"{METRIC_PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return [{'metric': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._with_derived().items())]
+
+
+registry = MetricsRegistry()
+
+_settings = None
+_settings_lock = threading.Lock()
+_job = None
+
+
+def configure(metrics_path=None, events_path=None, debug=None, config_path="config/config.yaml"):
+    """
+    Set where metrics go. Unset arguments come from the `instrumentation` section of
+    config.yaml: `metrics_path` (Prometheus textfile written by flush(), one per job; see
+    export_metrics), `events_path` (one JSON line per finished span) and `debug` (compute
+    debug previews).
+    """
+    global _settings
+    try:
+        with open(config_path, "r") as f:
+            section = (yaml.safe_load(f) or {}).get('instrumentation') or {}
+    except FileNotFoundError:
+        section = {}
+    with _settings_lock:
+        _settings = {
+            'metrics_path': metrics_path if metrics_path is not None else section.get('metrics_path'),
+            'events_path': events_path if events_path is not None else section.get('events_path'),
+            'debug': debug if debug is not None else bool(section.get('debug', False)),
+        }
+    return _settings
+
+
+def settings():
+    if _settings is None:
+        configure()
+    return _settings
+
+
+def export_metrics(job):
+    """
+    Opt an entry point in to exporting its metrics. Its spans are appended to `events_path`
+    and its counters written to a textfile of its own, e.g. logs/metrics.pipeline.prom for
+    the job 'pipeline', after each pipeline run and on exit. Processes that never call this
+    (library use, tests, benchmarks) keep their metrics in memory and write no files.
+
+    Returns:
+        str: The job's metrics textfile, or None when no metrics path is configured.
+    """
+    global _job
+    with _settings_lock:
+        first = _job is None
+        _job = re.sub(r"[^A-Za-z0-9_-]", "_", job)
+    if first:
+        # The textfile is refreshed once more on exit with the final values
+        atexit.register(flush)
+    return metrics_file()
+
+
+def metrics_file():
+    """
+    Prometheus textfile of the job that opted in with export_metrics, or None.
+    """
+    metrics_path = settings()['metrics_path']
+    if _job is None or not metrics_path:
+        return None
+    root, ext = os.path.splitext(metrics_path)
+    return f"{root}.{_job}{ext or '.prom'}"
+
+
+def debug_enabled():
+    return settings()['debug']
+
+
+def debug_preview(message, preview):
+    """
+    Print a debug preview only when debugging is enabled. `preview` is a callable, so the
+    expensive part (head(), unique(), column lists of wide frames) is not evaluated on the
+    hot path.
+    """
+    if debug_enabled():
+        print(message)
+        print(preview())
+
+
+class Span:
+    """
+    Counters of one timed operation; see span().
+    """
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.started = time.time()
+
+    def add(self, rows_in=0, rows_out=0, bytes_read=0, bytes_written=0):
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Time a stage or call and record its row counts, bytes and peak memory.
+
+    Storage reads and writes made inside the span (in the same thread) are added to it
+    automatically; other counts can be added with `span.add(...)`. Spans nest: the
+    counts of an inner span are also added to the enclosing one.
+
+    Example:
+        with span('preprocess_user_behavior') as s:
+            df = read_table(path)  # counted as rows_in / bytes_read
+            s.add(rows_out=len(df))
+    """
+    current = Span(name, labels)
+    parent = _current_span.get()
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    status, error = 'ok', None
+    try:
+        yield current
+    except BaseException as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        if parent is not None:
+            parent.add(current.rows_in, current.rows_out, current.bytes_read, current.bytes_written)
+        _record_span(current, duration, status, error)
+
+
+def instrumented(name=None, **labels):
+    """
+    Decorator running every call of the function in a span named after it.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record_span(current, duration, status, error):
+    labels = dict(current.labels, stage=current.name)
+    peak = peak_rss_bytes()
+    registry.inc('stage_runs_total', status=status, **labels)
+    registry.inc('stage_duration_seconds_total', duration, **labels)
+    registry.set('stage_last_duration_seconds', round(duration, 6), **labels)
+    registry.inc('stage_rows_in_total', current.rows_in, **labels)
+    registry.inc('stage_rows_out_total', current.rows_out, **labels)
+    registry.inc('stage_bytes_read_total', current.bytes_read, **labels)
+    registry.inc('stage_bytes_written_total', current.bytes_written, **labels)
+    registry.set('stage_peak_rss_bytes', peak, **labels)
+
+    events_path = settings()['events_path'] if _job is not None else None
+    if events_path:
+        event = {
+            'ts': current.started, 'job': _job, 'span': current.name, 'labels': current.labels, 'status': status,
+            'duration_s': round(duration, 6), 'rows_in': current.rows_in, 'rows_out': current.rows_out,
+            'bytes_read': current.bytes_read, 'bytes_written': current.bytes_written, 'peak_rss_bytes': peak,
+        }
+        if error:
+            event['error'] = error
+        _append_event(events_path, event)
+
+
+_events_lock = threading.Lock()
+
+
+def _append_event(path, event):
+    line = json.dumps(event, default=str) + "\n"
+    with _events_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line)
+
+
+def record_io(direction, path, rows=0, nbytes=0):
+    """
+    Count a table read ('read') or write ('written') in the per-table metrics and in the
+    current span.
+    """
+    table = os.path.basename(os.path.normpath(path))
+    registry.inc(f'storage_rows_{direction}_total', rows, table=table)
+    registry.inc(f'storage_bytes_{direction}_total', nbytes, table=table)
+    current = _current_span.get()
+    if current is not None:
+        if direction == 'read':
+            current.add(rows_in=rows, bytes_read=nbytes)
+        else:
+            current.add(rows_out=rows, bytes_written=nbytes)
+
+
+def record_cache(cache, hit, count=1):
+    registry.inc('cache_requests_total', count, cache=cache, result='hit' if hit else 'miss')
+
+
+def count(name, value=1, **labels):
+    """
+    Add to one of the counters in METRICS, e.g. count('youtube_quota_units_total', 1, region='SG').
+    """
+    registry.inc(name, value, **labels)
+
+
+def path_size(path):
+    """
+    Bytes on disk of a file or of every file under a directory.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def flush(metrics_path=None):
+    """
+    Write the current metrics to the Prometheus textfile (atomically, so the collector
+    never reads a partial file).
+
+    Args:
+        metrics_path (str, optional): Defaults to the textfile of the job that opted in
+            with export_metrics.
+
+    Returns:
+        str: The path written, or None when no job opted in or no metrics path is configured.
+    """
+    metrics_path = metrics_path or metrics_file()
+    if not metrics_path:
+        return None
+    directory = os.path.dirname(metrics_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # A staging file of its own, so concurrent flushes never interleave; the dot keeps it
+    # out of the collector's *.prom glob
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(metrics_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(registry.to_prometheus())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, metrics_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return metrics_path
@@ -0,0 +1,269 @@
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+from src.factor_model import FactorModel
+from src.instrumentation import record_io
+from src.retrieval import SeenItems
+
+MAGIC = b"YTFM"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARTIFACT_EXTENSION = ".fmodel"
+
+# Arrays stored in the artifact, in file order
+_ARRAYS = {
+    'user_factors': np.float32,
+    'item_factors': np.float32,
+    'user_bias': np.float32,
+    'item_bias': np.float32,
+    'user_codes': np.int32,
+    'item_codes': np.int32,
+    'user_rows': np.int32,
+    'item_rows': np.int32,
+}
+
+# Optional CSR of the items each user row has seen, used to mask already-watched videos
+# when serving; seen_values (the interaction strengths) is present when they were given
+_SEEN_ARRAYS = {
+    'seen_indptr': np.int64,
+    'seen_indices': np.int32,
+    'seen_values': np.float32,
+}
+
+# Optional utf-8 id strings of the user and video rows (offsets into the byte blob), so
+# serving maps ids to codes without the id dictionaries
+_ID_ARRAYS = {
+    'user_id_offsets': np.int64,
+    'user_id_bytes': np.uint8,
+    'video_id_offsets': np.int64,
+    'video_id_bytes': np.uint8,
+}
+
+# The id normalization of id_dictionary.NORMALIZERS for single strings, without pandas
+_NORMALIZERS = {
+    'user_id': lambda value: str(value).strip(),
+    'video_id': lambda value: re.sub(r'[^a-zA-Z0-9]', '', str(value)).lower(),
+}
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_ids(ids):
+    # utf-8 blob plus int64 offsets of a sequence of id strings
+    encoded = [id_.encode('utf-8') for id_ in ids]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(id_) for id_ in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _decode_ids(offsets, blob):
+    blob = blob.tobytes()
+    return [blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def save_factor_model(model, path, metadata=None, seen=None, id_dictionaries=None):
+    """
+    Write a FactorModel as a compact artifact: a small JSON header followed by 64-byte
+    aligned float32/int32 arrays (factors, biases, code <-> row maps and, optionally,
+    the items each user has seen and the id strings of the rows).
+
+    The file is written next to `path` and renamed into place, so readers never see a
+    partial artifact.
+
+    Args:
+        model (FactorModel): Model to export.
+        path (str): Target file, conventionally ending in `.fmodel`.
+        metadata (dict, optional): Extra JSON-serializable information stored in the header.
+        seen (SeenItems, optional): Items each user row interacted with; see load_seen_items.
+        id_dictionaries (IdDictionaries, optional): Dictionaries the model's codes come from.
+            The user and video id strings of the rows are stored with the model; see load_ids.
+
+    Returns:
+        str: The path written.
+
+    Raises:
+        ValueError: If a code of the model is missing from `id_dictionaries`.
+    """
+    arrays = {name: np.ascontiguousarray(getattr(model, name), dtype=dtype) for name, dtype in _ARRAYS.items()}
+    if seen is not None:
+        arrays['seen_indptr'] = np.ascontiguousarray(seen.indptr, dtype=_SEEN_ARRAYS['seen_indptr'])
+        arrays['seen_indices'] = np.ascontiguousarray(seen.indices, dtype=_SEEN_ARRAYS['seen_indices'])
+        if seen.values is not None:
+            arrays['seen_values'] = np.ascontiguousarray(seen.values, dtype=_SEEN_ARRAYS['seen_values'])
+    if id_dictionaries is not None:
+        for column, codes in (('user_id', model.user_codes), ('video_id', model.item_codes)):
+            try:
+                ids = id_dictionaries[column].decode(codes)
+            except IndexError:
+                ids = [None]
+            if any(id_ is None for id_ in ids):
+                raise ValueError(f"Some {column} codes of the model are not in the id dictionaries.")
+            arrays[f'{column}_offsets'], arrays[f'{column}_bytes'] = _encode_ids(ids)
+    header = {
+        'format_version': FORMAT_VERSION,
+        'global_mean': model.global_mean,
+        'rating_scale': list(model.rating_scale),
+        'metadata': metadata or {},
+        'arrays': {},
+    }
+    # The header size depends on the offsets, so lay the arrays out after a generous header slot
+    header_slot = _aligned(len(json.dumps(header)) + 128 * len(arrays) + 64)
+    offset = header_slot
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': np.dtype(array.dtype).str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix = MAGIC + struct.pack('<II', FORMAT_VERSION, len(header_bytes))
+    if len(prefix) + len(header_bytes) > header_slot:
+        raise ValueError("Artifact header does not fit in its slot; metadata is too large.")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix + header_bytes)
+        for name, array in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+    record_io('written', path, nbytes=offset)
+    return path
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        magic, = struct.unpack('<4s', f.read(4))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a factor model artifact.")
+        version, header_length = struct.unpack('<II', f.read(8))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format version {version}.")
+        return json.loads(f.read(header_length))
+
+
+def _load_arrays(path, header, names, mmap):
+    arrays = {}
+    for name in names:
+        spec = header['arrays'][name]
+        dtype, shape, offset = np.dtype(spec['dtype']), tuple(spec['shape']), spec['offset']
+        if mmap:
+            count = int(np.prod(shape))
+            arrays[name] = (np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+                            if count else np.empty(shape, dtype=dtype))
+        else:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return arrays
+
+
+def load_factor_model(path, mmap=True):
+    """
+    Load an artifact written by save_factor_model.
+
+    With mmap=True the arrays are read-only np.memmap views of the file: loading costs
+    only the header parse, pages are read on first use, and processes serving the same
+    artifact share them through the page cache.
+    """
+    header = read_header(path)
+    arrays = _load_arrays(path, header, list(_ARRAYS), mmap)
+    return FactorModel(
+        global_mean=header['global_mean'],
+        rating_scale=tuple(header['rating_scale']),
+        **arrays,
+    )
+
+
+def load_seen_items(path, mmap=True):
+    """
+    The seen items stored with an artifact, or None for artifacts saved without them.
+    """
+    header = read_header(path)
+    if 'seen_indptr' not in header['arrays']:
+        return None
+    arrays = _load_arrays(path, header, [name for name in _SEEN_ARRAYS if name in header['arrays']], mmap)
+    return SeenItems(arrays['seen_indptr'], arrays['seen_indices'], arrays.get('seen_values'))
+
+
+class ArtifactIdColumn:
+    """
+    Id strings of the rows of one side of a model (users or videos), with the
+    encode/decode methods of IdDictionary for the ids the model knows.
+    """
+
+    def __init__(self, ids, codes, rows):
+        self._ids = np.array(ids, dtype=object)
+        self._codes = dict(zip(ids, np.asarray(codes).tolist()))
+        self._rows = rows
+
+    def encode(self, values, add=False):
+        if add:
+            raise ValueError("Ids stored with an artifact are read-only.")
+        return np.array([self._codes.get(value, -1) for value in values], dtype=np.int32)
+
+    def decode(self, codes):
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.full(codes.shape, -1, dtype=np.int64)
+        valid = (codes >= 0) & (codes < len(self._rows))
+        rows[valid] = self._rows[codes[valid]]
+        ids = self._ids[np.clip(rows, 0, None)] if len(self._ids) else np.full(codes.shape, None)
+        return np.where(rows < 0, None, ids)
+
+
+class ArtifactIds:
+    """
+    The user and video ids stored with an artifact. Serving uses it in place of
+    IdDictionaries: encode_values maps raw ids to codes, unknown ids to -1.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def encode_values(self, column, values, add=False):
+        normalize = _NORMALIZERS[column]
+        return self.columns[column].encode([None if value is None else normalize(value) for value in values],
+                                           add=add)
+
+
+def load_ids(path, model=None):
+    """
+    The ids stored with an artifact (ArtifactIds), or None for artifacts saved without them.
+    """
+    header = read_header(path)
+    if not all(name in header['arrays'] for name in _ID_ARRAYS):
+        return None
+    model = model or load_factor_model(path)
+    arrays = _load_arrays(path, header, list(_ID_ARRAYS), mmap=False)
+    if (len(arrays['user_id_offsets']) != len(model.user_codes) + 1
+            or len(arrays['video_id_offsets']) != len(model.item_codes) + 1):
+        raise ValueError(f"The ids stored in {path} do not match the model's rows.")
+    return ArtifactIds({
+        column: ArtifactIdColumn(_decode_ids(arrays[f'{column}_offsets'], arrays[f'{column}_bytes']),
+                                 codes, rows)
+        for column, codes, rows in (('user_id', model.user_codes, model.user_rows),
+                                    ('video_id', model.item_codes, model.item_rows))
+    })
+
+
+def artifact_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ARTIFACT_EXTENSION
+
+
+def load_model(model_path):
+    """
+    Load any model artifact as a FactorModel: compact `.fmodel` artifacts are memory-mapped,
+    pickled surprise models (.pkl) are unpickled and converted.
+    """
+    if model_path.endswith(ARTIFACT_EXTENSION):
+        return load_factor_model(model_path)
+    import joblib
+    return FactorModel.from_surprise(joblib.load(model_path))
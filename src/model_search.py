@@ -0,0 +1,208 @@
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.factor_model import FactorModel
+from src.incremental import publish_model
+
+# Hyperparameters of surprise's SVD searched by default
+DEFAULT_PARAM_GRID = {
+    'n_factors': [50, 100, 150],
+    'n_epochs': [10, 20, 30],
+    'lr_all': [0.002, 0.005, 0.01],
+    'reg_all': [0.02, 0.05, 0.1],
+}
+
+_FIELDS = (('user_codes', np.int32), ('item_codes', np.int32), ('ratings', np.float32), ('folds', np.int8))
+
+
+class SharedInteractions:
+    """
+    Interaction arrays (user codes, video codes, ratings, fold ids) in one shared-memory block.
+
+    The parent creates the block once; pool workers attach to it by name through `spec`,
+    so every worker reads the same physical pages instead of unpickling its own copy.
+    """
+
+    def __init__(self, block, n_rows, owner):
+        self._block = block
+        self.n_rows = n_rows
+        self._owner = owner
+        offset = 0
+        for name, dtype in _FIELDS:
+            array = np.ndarray((n_rows,), dtype=dtype, buffer=block.buf, offset=offset)
+            if not owner:
+                array.flags.writeable = False
+            setattr(self, name, array)
+            offset += n_rows * np.dtype(dtype).itemsize
+
+    @classmethod
+    def create(cls, user_codes, item_codes, ratings, n_folds=5, seed=0):
+        n_rows = len(ratings)
+        size = sum(n_rows * np.dtype(dtype).itemsize for _, dtype in _FIELDS)
+        shared = cls(shared_memory.SharedMemory(create=True, size=max(size, 1)), n_rows, owner=True)
+        shared.user_codes[:] = user_codes
+        shared.item_codes[:] = item_codes
+        shared.ratings[:] = ratings
+        shared.folds[:] = np.random.default_rng(seed).permutation(n_rows) % n_folds
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        name, n_rows = spec
+        return cls(shared_memory.SharedMemory(name=name), n_rows, owner=False)
+
+    @property
+    def spec(self):
+        return (self._block.name, self.n_rows)
+
+    def close(self):
+        # Drop the array views before closing; the buffer cannot be released while they exist
+        for name, _ in _FIELDS:
+            setattr(self, name, None)
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+
+
+# Per-worker attachment, set up once by the pool initializer
+_worker_data = None
+
+
+def _attach_worker(spec):
+    global _worker_data
+    _worker_data = SharedInteractions.attach(spec)
+
+
+def fit_svd(user_codes, item_codes, ratings, params, rating_scale=(0, 1), seed=0):
+    """
+    Fit surprise's SVD on aligned code/rating arrays and return it as a FactorModel.
+    """
+    from surprise import Dataset, Reader, SVD
+    frame = pd.DataFrame({'user_code': user_codes, 'video_code': item_codes, 'rating': ratings})
+    trainset = Dataset.load_from_df(frame, Reader(rating_scale=rating_scale)).build_full_trainset()
+    algo = SVD(random_state=seed, **params)
+    algo.fit(trainset)
+    return FactorModel.from_surprise(algo)
+
+
+def _evaluate_fold(params, fold, rating_scale, seed):
+    data = _worker_data
+    test = data.folds == fold
+    model = fit_svd(data.user_codes[~test], data.item_codes[~test], data.ratings[~test], params,
+                    rating_scale, seed)
+    # Vectorized scoring of the whole held-out fold
+    errors = model.score(data.user_codes[test], data.item_codes[test]) - data.ratings[test]
+    return float(np.sqrt(np.mean(errors ** 2)))
+
+
+def parameter_candidates(param_grid=None, n_iter=None, seed=0):
+    """
+    All combinations of `param_grid`, or `n_iter` of them sampled without replacement.
+    """
+    param_grid = param_grid or DEFAULT_PARAM_GRID
+    names = sorted(param_grid)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+    if n_iter is not None and n_iter < len(candidates):
+        picks = np.random.default_rng(seed).choice(len(candidates), size=n_iter, replace=False)
+        candidates = [candidates[i] for i in sorted(picks)]
+    return candidates
+
+
+def search(user_codes, item_codes, ratings, param_grid=None, n_iter=None, n_folds=5, n_jobs=None,
+           prune_tolerance=0.02, rating_scale=(0, 1), seed=0):
+    """
+    k-fold cross-validated search over SVD hyperparameters in a process pool.
+
+    Folds are evaluated in rounds: every surviving configuration is scored on fold r in
+    parallel, then configurations whose mean RMSE so far is more than `prune_tolerance`
+    (relative) worse than the best are dropped before the next fold is scheduled.
+
+    Returns:
+        pd.DataFrame: One row per configuration with mean/std RMSE, folds completed and
+        whether it was pruned, sorted best first.
+    """
+    candidates = parameter_candidates(param_grid, n_iter, seed)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    scores = {index: [] for index in range(len(candidates))}
+    alive = list(scores)
+    shared = SharedInteractions.create(user_codes, item_codes, ratings, n_folds, seed)
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach_worker,
+                                 initargs=(shared.spec,)) as executor:
+            for fold in range(n_folds):
+                futures = {index: executor.submit(_evaluate_fold, candidates[index], fold, rating_scale, seed)
+                           for index in alive}
+                for index, future in futures.items():
+                    scores[index].append(future.result())
+                best = min(np.mean(scores[index]) for index in alive)
+                alive = [index for index in alive if np.mean(scores[index]) <= best * (1 + prune_tolerance)]
+                print(f"Fold {fold + 1}/{n_folds}: best RMSE {best:.4f}, {len(alive)} configurations kept")
+    finally:
+        shared.close()
+
+    rows = []
+    for index, params in enumerate(candidates):
+        rows.append({
+            **params,
+            'mean_rmse': float(np.mean(scores[index])),
+            'std_rmse': float(np.std(scores[index])),
+            'folds_completed': len(scores[index]),
+            'pruned': index not in alive,
+        })
+    # Survivors first (they completed every fold), then by RMSE
+    return pd.DataFrame(rows).sort_values(['pruned', 'mean_rmse']).reset_index(drop=True)
+
+
+def best_params(results, param_grid=None):
+    names = sorted(param_grid or DEFAULT_PARAM_GRID)
+    best = results.iloc[0]
+    return {name: best[name].item() if hasattr(best[name], 'item') else best[name] for name in names}
+
+
+def write_search_output(results, model, output_dir, metadata=None, seen=None, id_dictionaries=None):
+    """
+    Publish the results table and the best model's artifact together.
+
+    Each search writes a new versioned directory next to `output_dir` (e.g.
+    `search.v-<ns>`), and `output_dir` is a symlink that is atomically repointed to it, so
+    readers always find a complete output, the previous search's or the new one, never a
+    mix and never nothing. The previous version is kept for readers still using it; older
+    ones are removed.
+
+    Returns:
+        str: The output directory.
+
+    Raises:
+        FileExistsError: If `output_dir` exists and is not a symlink.
+    """
+    output_dir = os.path.normpath(output_dir)
+    if os.path.exists(output_dir) and not os.path.islink(output_dir):
+        raise FileExistsError(f"{output_dir} exists and is not a search output symlink.")
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    version = f"{output_dir}.v-{time.time_ns()}"
+    os.makedirs(version)
+    results.to_csv(os.path.join(version, "results.csv"), index=False)
+    publish_model(model, os.path.join(version, "best_model.fmodel"), metadata=metadata, full_retrain=True,
+                  seen=seen, id_dictionaries=id_dictionaries)
+    with open(os.path.join(version, "best_params.json"), "w") as f:
+        json.dump(metadata or {}, f, indent=2)
+
+    link = f"{output_dir}.link-{time.time_ns()}"
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, output_dir)
+
+    prefix = f"{os.path.basename(output_dir)}.v-"
+    versions = sorted((name for name in os.listdir(parent) if name.startswith(prefix)),
+                      key=lambda name: int(name[len(prefix):]) if name[len(prefix):].isdigit() else -1)
+    for name in versions[:-2]:
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+    return output_dir
@@ -0,0 +1,437 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import yaml
+
+from src.factor_model import FactorModel
+from src.instrumentation import count, flush, span
+from src.model_artifact import load_factor_model
+from src.storage import dataset_path, get_storage_format, read_table
+
+# In-memory type of each artifact kind and how a stage that did not produce the value in
+# this process loads it from the artifact's path
+ARTIFACT_KINDS = {
+    'table': (pd.DataFrame, read_table),
+    'model': (FactorModel, load_factor_model),
+    'file': (str, lambda path: path),
+}
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+class Artifact:
+    """
+    A typed stage input or output stored at `path`.
+
+    Args:
+        name (str): Name stages use to refer to the artifact (and the keyword argument
+            the consuming stage functions receive it as).
+        path (str): Where the artifact lives on disk. For tables this is the stage path
+            given to write_table; the artifact is the CSV file or Parquet dataset it writes.
+        kind (str): 'table' (pd.DataFrame), 'model' (FactorModel) or 'file' (the path itself).
+        format (str, optional): Storage format of a table. Defaults to the configured
+            storage format, which is what write_table uses.
+    """
+
+    def __init__(self, name, path, kind='table', format=None):
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unsupported artifact kind: {kind}")
+        self.name = name
+        self.path = path
+        self.kind = kind
+        self.format = format
+
+    @property
+    def type(self):
+        return ARTIFACT_KINDS[self.kind][0]
+
+    def location(self):
+        """
+        The file or directory the producer writes, or None when it does not exist.
+
+        Tables only ever resolve to the layout of their format, so a leftover file in the
+        other format is neither hashed nor loaded in place of the real output.
+        """
+        if self.kind == 'table':
+            target = dataset_path(self.path, self.format or get_storage_format())
+            return target if os.path.exists(target) else None
+        return self.path if os.path.exists(self.path) else None
+
+    def load(self):
+        return ARTIFACT_KINDS[self.kind][1](self.location() or self.path)
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    The stage function is called with one keyword argument per input artifact plus
+    `params`. It returns the value of its single output, a dict of values keyed by output
+    name when it has several, or None for outputs it only wrote to disk (they are loaded
+    from their path when a later stage needs them).
+
+    Args:
+        name (str): Stage name.
+        func (callable): The stage function.
+        inputs (list[str]): Names of the artifacts the stage reads.
+        outputs (list[Artifact]): Artifacts the stage writes.
+        params (dict, optional): Extra keyword arguments; part of the fingerprint.
+        config (list[str]): Sections of config.yaml the stage depends on; part of the fingerprint.
+        code (list[str]): Source files the stage runs besides the function itself
+            (e.g. the script it wraps); part of the fingerprint.
+        always_run (bool): Run even when the fingerprint is unchanged, for stages that read
+            external state such as the YouTube API. Their outputs are still hashed, so
+            downstream stages are skipped when the new outputs are identical.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, config=(), code=(), always_run=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+        self.config = list(config)
+        self.code = list(code)
+        self.always_run = always_run
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileHashCache:
+    """
+    Content hashes of files, reused while a file keeps the same size and mtime so unchanged
+    inputs are not read again on every run.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self._lock = threading.Lock()
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self.entries.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = _hash_file(path)
+        with self._lock:
+            self.entries[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def path_hash(self, path):
+        """
+        Content hash of a file or of every file under a directory. File names inside a
+        directory are left out (only their sub-directory, e.g. a hive partition, counts)
+        because write_table names Parquet parts after the write time: rewriting identical
+        data gives the same hash.
+        """
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                digest.update(os.path.relpath(root, path).encode("utf-8"))
+                digest.update(self.file_hash(file_path).encode("ascii"))
+        return digest.hexdigest()
+
+
+def _code_hash(stage):
+    digest = hashlib.sha256()
+    try:
+        digest.update(inspect.getsource(stage.func).encode("utf-8"))
+    except (OSError, TypeError):
+        digest.update(getattr(stage.func, "__qualname__", repr(stage.func)).encode("utf-8"))
+    for path in stage.code:
+        digest.update(_hash_file(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+class Pipeline:
+    """
+    Runs stages as a DAG, skipping the ones whose outputs are still valid.
+
+    A stage's fingerprint covers the content hashes of its inputs, its code (the function
+    source and the files in `Stage.code`), its params and the config sections it declares.
+    After a successful run the fingerprint and the content hashes of the outputs are saved
+    in `state_path`. On the next run the stage is skipped when the fingerprint matches and
+    its outputs are unchanged on disk, so a repeated run only executes the stages downstream
+    of what actually changed.
+
+    Stages whose inputs are ready run concurrently on a thread pool; data-heavy stages
+    spend most of their time in pandas/pyarrow/numpy or waiting on the network, which
+    release the GIL. Values returned by a stage are handed to the stages consuming them in
+    memory instead of being read back from disk, and dropped once all consumers finished.
+    Every executed stage runs in an instrumentation span, and the metrics textfile of the
+    entry point (see export_metrics) is refreshed at the end of each run.
+
+    Args:
+        stages (list[Stage]): The stages. Every input must be an output of exactly one stage
+            or one of `sources`.
+        sources (list[Artifact]): External inputs no stage produces.
+        state_path (str): JSON file keeping fingerprints between runs.
+        max_workers (int): Stages run at the same time.
+        config_path (str): config.yaml the stage config sections are read from.
+    """
+
+    def __init__(self, stages, sources=(), state_path="data/pipeline/state.json", max_workers=4,
+                 config_path="config/config.yaml"):
+        self.stages = {stage.name: stage for stage in stages}
+        self.sources = {artifact.name: artifact for artifact in sources}
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.config_path = config_path
+
+        self.producers = {}
+        self.artifacts = dict(self.sources)
+        for stage in stages:
+            for artifact in stage.outputs:
+                if artifact.name in self.artifacts:
+                    raise ValueError(f"Artifact {artifact.name} is produced more than once.")
+                self.producers[artifact.name] = stage.name
+                self.artifacts[artifact.name] = artifact
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.artifacts]
+            if missing:
+                raise ValueError(f"Stage {stage.name} reads unknown artifacts: {missing}")
+        self.order = self._topological_order()
+
+    def upstream(self, stage_name):
+        return {self.producers[name] for name in self.stages[stage_name].inputs if name in self.producers}
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"The pipeline has a cycle through stage {name}.")
+            visiting.add(name)
+            for parent in sorted(self.upstream(name)):
+                visit(parent)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _selected(self, targets):
+        if not targets:
+            return list(self.order)
+        selected, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.upstream(name))
+        return [name for name in self.order if name in selected]
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {'stages': {}, 'files': {}}
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def _save_state(self):
+        # Written after every stage so an interrupted run keeps the work already done
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'stages': self._state['stages'], 'files': self._hashes.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _config(self):
+        try:
+            with open(self.config_path, "r") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return {}
+
+    def fingerprint(self, stage, input_hashes):
+        payload = {
+            'code': _code_hash(stage),
+            'params': stage.params,
+            'config': {section: self._config_sections.get(section) for section in stage.config},
+            'inputs': {name: input_hashes[name] for name in stage.inputs},
+            'outputs': {artifact.name: [artifact.path, artifact.kind] for artifact in stage.outputs},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _artifact_hash(self, name):
+        location = self.artifacts[name].location()
+        return self._hashes.path_hash(location) if location else None
+
+    def _input_value(self, name):
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        # Stages sharing an input that is not in memory load it once
+        with load_lock:
+            with self._lock:
+                if name in self._values:
+                    return self._values[name]
+            value = self.artifacts[name].load()
+            with self._lock:
+                self._values[name] = value
+            return value
+
+    def _run_stage(self, stage, force):
+        with self._lock:
+            input_hashes = {name: self._hashes_by_artifact.get(name) for name in stage.inputs}
+        for name in stage.inputs:
+            if input_hashes[name] is None:
+                input_hashes[name] = self._artifact_hash(name)
+                if input_hashes[name] is None:
+                    raise FileNotFoundError(f"Input {name} of stage {stage.name} not found at "
+                                            f"{self.artifacts[name].path}")
+        fingerprint = self.fingerprint(stage, input_hashes)
+
+        previous = self._state['stages'].get(stage.name)
+        if previous and previous['fingerprint'] == fingerprint and not (force or stage.always_run):
+            output_hashes = {artifact.name: self._artifact_hash(artifact.name) for artifact in stage.outputs}
+            if output_hashes == previous['outputs']:
+                with self._lock:
+                    self._hashes_by_artifact.update(output_hashes)
+                count('stage_runs_total', status='skipped', stage=stage.name, runner='pipeline')
+                return 'skipped'
+
+        started = time.time()
+        with span(stage.name, runner='pipeline') as stage_span:
+            kwargs = {}
+            for name in stage.inputs:
+                with self._lock:
+                    in_memory = name in self._values
+                kwargs[name] = self._input_value(name)
+                if in_memory and isinstance(kwargs[name], pd.DataFrame):
+                    # Handed over in memory, so no read_table call counted these rows
+                    stage_span.add(rows_in=len(kwargs[name]))
+            result = stage.func(**kwargs, **stage.params)
+        if len(stage.outputs) == 1:
+            result = {stage.outputs[0].name: result}
+        elif not stage.outputs:
+            result = {}
+        elif not isinstance(result, dict):
+            raise TypeError(f"Stage {stage.name} must return a dict of its outputs.")
+
+        output_hashes = {}
+        for artifact in stage.outputs:
+            value = result.get(artifact.name)
+            if value is not None and not isinstance(value, artifact.type):
+                raise TypeError(f"Stage {stage.name} returned {type(value).__name__} for {artifact.name}, "
+                                f"expected {artifact.type.__name__}.")
+            output_hashes[artifact.name] = self._artifact_hash(artifact.name)
+            if output_hashes[artifact.name] is None:
+                raise FileNotFoundError(f"Stage {stage.name} did not write {artifact.name} to {artifact.path}")
+            if value is not None:
+                with self._lock:
+                    self._values[artifact.name] = value
+
+        with self._lock:
+            self._hashes_by_artifact.update(output_hashes)
+            self._state['stages'][stage.name] = {
+                'fingerprint': fingerprint,
+                'outputs': output_hashes,
+                'finished_at': time.time(),
+                'duration': round(time.time() - started, 3),
+            }
+            self._save_state()
+        return 'ran'
+
+    def _release_inputs(self, stage_name, remaining_consumers):
+        # Drop in-memory values no pending stage still needs
+        with self._lock:
+            for name in self.stages[stage_name].inputs:
+                remaining_consumers[name] -= 1
+                if remaining_consumers[name] == 0:
+                    self._values.pop(name, None)
+
+    def run(self, targets=None, force=False):
+        """
+        Run the pipeline.
+
+        Args:
+            targets (list[str], optional): Stages to bring up to date together with everything
+                upstream of them. Defaults to every stage.
+            force (bool): Run the targets (every stage without targets) even when their
+                outputs are valid. Their upstream stages are still skipped when up to date.
+
+        Returns:
+            dict: Status of each selected stage: 'ran', 'skipped', 'failed' or 'blocked'
+            (an upstream stage failed).
+
+        Raises:
+            FileNotFoundError: A source artifact the selected stages read does not exist.
+        """
+        selected = self._selected(targets)
+        forced = set(targets or selected) if force else set()
+        # Fail before anything runs when an external input of the selected stages is missing
+        for name in sorted({name for stage in selected for name in self.stages[stage].inputs}):
+            if name in self.sources and self.sources[name].location() is None:
+                raise FileNotFoundError(f"Source {name} not found at {self.sources[name].path}; "
+                                        f"provide it or select stages that do not read it.")
+        self._state = self._load_state()
+        self._hashes = FileHashCache(self._state.get('files'))
+        self._config_sections = self._config()
+        self._hashes_by_artifact = {}
+        self._values = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+        remaining_consumers = {}
+        for name in selected:
+            for artifact_name in self.stages[name].inputs:
+                remaining_consumers[artifact_name] = remaining_consumers.get(artifact_name, 0) + 1
+
+        statuses = {}
+        pending = list(selected)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    parents = self.upstream(name) & set(selected)
+                    if any(statuses.get(parent) in ('failed', 'blocked') for parent in parents):
+                        statuses[name] = 'blocked'
+                        pending.remove(name)
+                        print(f"[{name}] blocked by a failed upstream stage")
+                    elif all(parent in statuses for parent in parents):
+                        pending.remove(name)
+                        print(f"[{name}] started")
+                        running[executor.submit(self._run_stage, self.stages[name], name in forced)] = name
+                if not running:
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        statuses[name] = future.result()
+                        print(f"[{name}] {statuses[name]}")
+                    except Exception as e:
+                        statuses[name] = 'failed'
+                        print(f"[{name}] failed: {e}")
+                    self._release_inputs(name, remaining_consumers)
+
+        self._values = {}
+        self._save_state()
+        flush()
+        return {name: statuses[name] for name in selected}
@@ -1,11 +1,41 @@
-def train_model(data):
-    # Dummy function for demonstration
-    print("Training model with the data")
-    model = "trained_model"  # Replace with your model logic
+import numpy as np
+import pandas as pd
+
+from src.content_similarity import ContentIndex
+from src.storage import write_table
+
+
+def train_model(data, index_dir="data/content_index"):
+    # Index the title/description/channel text of the videos; an existing index only gains the new ones
+    model = ContentIndex(index_dir)
+    added = model.add_videos(data)
+    model.save()
+    print(f"Indexed {added} new videos ({len(model)} in the content index)")
     return model
 
-def recommend(model, input_data):
-    # Dummy function for demonstration
-    print("Making recommendations based on the model")
-    recommendations = ["Recommendation 1", "Recommendation 2"]  # Replace with your recommendation logic
+def recommend(model, input_data, k=10, output_path=None):
+    # Videos most similar to the input video id by TF-IDF cosine similarity
+    recommendations = model.similar_videos(input_data, k)
+    if output_path is not None:
+        write_table(recommendations, output_path)
+        print(f"Recommendations saved to {output_path}")
+    return recommendations
+
+def recommend_all(model, video_ids, k=10, output_path=None):
+    # The k most similar videos of each given video as one long table, from the cached neighbour lists
+    neighbours, scores = model.neighbours(k)
+    rows = np.array([model.video_index[video_id] for video_id in pd.unique(pd.Series(video_ids).astype(str))
+                     if video_id in model.video_index], dtype=np.int64)
+    query_rows, ranks = np.nonzero(neighbours[rows] >= 0)
+    similar = neighbours[rows][query_rows, ranks]
+    recommendations = pd.DataFrame({
+        'video_id': [model.video_ids[i] for i in rows[query_rows]],
+        'rank': ranks + 1,
+        'similar_video_id': [model.video_ids[i] for i in similar],
+        'title': [model.titles[i] for i in similar],
+        'similarity_score': scores[rows][query_rows, ranks].astype(float),
+    })
+    if output_path is not None:
+        written_path = write_table(recommendations, output_path)
+        print(f"Recommendations saved to {written_path}")
     return recommendations
@@ -0,0 +1,314 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from src.model_artifact import ARTIFACT_EXTENSION, load_ids, load_model, load_seen_items
+from src.retrieval import RetrievalEngine
+
+# Largest n accepted by /top; one request's n sizes the whole batch's score matrix
+MAX_TOP_N = 1000
+
+
+class ModelHolder:
+    """
+    Holds the current model and id dictionaries and hot-swaps them when the artifact changes.
+    Artifacts that store their ids are served with those; the dictionaries under
+    `id_dictionary_dir` are only read for models without them.
+
+    A background thread polls the artifact's modification time. The replacement is fully
+    loaded before a single reference assignment publishes it, so in-flight batches keep
+    using the model they started with and never see a half-loaded one.
+    """
+
+    def __init__(self, model_path, id_dictionary_dir="data/id_dictionaries", loader=load_model,
+                 poll_interval=5.0, ann_lists=None):
+        self.model_path = model_path
+        self.ann_lists = ann_lists
+        self.id_dictionary_dir = id_dictionary_dir
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._mtime = None
+        self._current = None
+        self._stop = threading.Event()
+        self.reload()
+
+    @property
+    def current(self):
+        # (model, engine, id_dictionaries, version), swapped as one tuple
+        return self._current
+
+    def reload(self):
+        mtime = os.path.getmtime(self.model_path)
+        model = self.loader(self.model_path)
+        # Videos a user already watched are masked from /top with the seen items stored in the artifact
+        is_artifact = self.model_path.endswith(ARTIFACT_EXTENSION)
+        seen = load_seen_items(self.model_path) if is_artifact else None
+        engine = RetrievalEngine(model, seen=seen)
+        if self.ann_lists:
+            engine.build_ann_index(n_lists=self.ann_lists)
+        id_dictionaries = load_ids(self.model_path, model) if is_artifact else None
+        if id_dictionaries is None:
+            # The dictionaries need pandas; serving artifacts with their ids stays numpy-only
+            from src.id_dictionary import IdDictionaries
+            id_dictionaries = IdDictionaries(self.id_dictionary_dir)
+        self.version += 1
+        self._current = (model, engine, id_dictionaries, self.version)
+        self._mtime = mtime
+        print(f"Loaded model version {self.version} from {self.model_path}")
+
+    def start_watching(self):
+        thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if os.path.getmtime(self.model_path) != self._mtime:
+                    self.reload()
+            except Exception as e:
+                # Keep serving the previous model if the new artifact is missing or incomplete
+                print(f"Error reloading model: {e}")
+
+
+class LatencyStats:
+    """
+    Rolling request latency percentiles and throughput.
+    """
+
+    def __init__(self, window=10000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+
+    def record_request(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.requests += 1
+
+    def record_batch(self, size):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            elapsed = time.monotonic() - self._started
+            return {
+                "requests": self.requests,
+                "throughput_rps": self.requests / elapsed if elapsed > 0 else 0.0,
+                "p50_ms": float(np.percentile(latencies, 50)) if latencies.size else None,
+                "p99_ms": float(np.percentile(latencies, 99)) if latencies.size else None,
+                "mean_batch_size": self.batched_requests / self.batches if self.batches else None,
+            }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `max_wait_ms` (or `max_batch` requests) and
+    scores each batch with one vectorized call per request type.
+    """
+
+    def __init__(self, holder, stats, max_batch=256, max_wait_ms=2.0, nprobe=None):
+        self.holder = holder
+        self.nprobe = nprobe
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, payload):
+        future = Future()
+        self._queue.put((kind, payload, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.stats.record_batch(len(batch))
+            try:
+                self._process(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        model, engine, id_dictionaries, version = self.holder.current
+        scores = [item for item in batch if item[0] == "score"]
+        tops = [item for item in batch if item[0] == "top"]
+
+        if scores:
+            user_ids = [payload["user_id"] for _, payload, _ in scores]
+            video_ids = [payload["video_id"] for _, payload, _ in scores]
+            user_codes = id_dictionaries.encode_values('user_id', user_ids, add=False)
+            video_codes = id_dictionaries.encode_values('video_id', video_ids, add=False)
+            predictions = model.score(user_codes, video_codes)
+            for (_, payload, future), prediction in zip(scores, predictions):
+                future.set_result({**payload, "score": float(prediction), "model_version": version})
+
+        if tops:
+            n = max(payload["n"] for _, payload, _ in tops)
+            user_ids = [payload["user_id"] for _, payload, _ in tops]
+            user_codes = id_dictionaries.encode_values('user_id', user_ids, add=False)
+            item_codes, item_scores = engine.top_k(user_codes, n, nprobe=self.nprobe)
+            for row, (_, payload, future) in enumerate(tops):
+                k = payload["n"]
+                found = item_codes[row, :k] >= 0
+                video_ids = id_dictionaries['video_id'].decode(item_codes[row, :k][found])
+                future.set_result({
+                    "user_id": payload["user_id"],
+                    "recommendations": [
+                        {"video_id": video_id, "score": float(score)}
+                        for video_id, score in zip(video_ids, item_scores[row, :k][found])
+                    ],
+                    "model_version": version,
+                })
+
+
+def _parse_n(value):
+    # The requested number of videos, or None unless it is a whole number in [1, MAX_TOP_N]
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        n = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return n if 1 <= n <= MAX_TOP_N else None
+
+
+def make_handler(batcher, stats, timeout=5.0):
+    class RecommendationHandler(BaseHTTPRequestHandler):
+        """
+        GET /score?user_id=..&video_id=..   predicted rating for one pair
+        GET /top?user_id=..&n=10            top-N videos for a user
+        POST /score {"pairs": [[user_id, video_id], ...]}
+        POST /top {"user_ids": [user_id, ...], "n": 10}
+        GET /metrics                        latency percentiles and throughput
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path == "/metrics":
+                return self._reply(200, stats.snapshot())
+            if url.path == "/score" and {"user_id", "video_id"} <= params.keys():
+                return self._serve([("score", {"user_id": params["user_id"], "video_id": params["video_id"]})])
+            if url.path == "/top" and "user_id" in params:
+                n = _parse_n(params.get("n", 10))
+                if n is None:
+                    return self._reply(400, {"error": f"n must be an integer between 1 and {MAX_TOP_N}"})
+                return self._serve([("top", {"user_id": params["user_id"], "n": n})])
+            self._reply(404, {"error": "unknown endpoint or missing parameters"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": "invalid JSON body"})
+            if not isinstance(body, dict):
+                return self._reply(400, {"error": "the JSON body must be an object"})
+            if url.path == "/score" and "pairs" in body:
+                pairs = body["pairs"]
+                if not isinstance(pairs, list) or not all(isinstance(p, list) and len(p) == 2 for p in pairs):
+                    return self._reply(400, {"error": "pairs must be a list of [user_id, video_id] pairs"})
+                return self._serve([("score", {"user_id": u, "video_id": v}) for u, v in pairs], many=True)
+            if url.path == "/top" and "user_ids" in body:
+                user_ids = body["user_ids"]
+                if not isinstance(user_ids, list) or not all(isinstance(u, str) for u in user_ids):
+                    return self._reply(400, {"error": "user_ids must be a list of strings"})
+                n = _parse_n(body.get("n", 10))
+                if n is None:
+                    return self._reply(400, {"error": f"n must be an integer between 1 and {MAX_TOP_N}"})
+                return self._serve([("top", {"user_id": u, "n": n}) for u in user_ids], many=True)
+            self._reply(404, {"error": "unknown endpoint or missing parameters"})
+
+        def _serve(self, requests, many=False):
+            start = time.perf_counter()
+            futures = [batcher.submit(kind, payload) for kind, payload in requests]
+            try:
+                results = [future.result(timeout=timeout) for future in futures]
+            except Exception as e:
+                return self._reply(500, {"error": str(e)})
+            stats.record_request(time.perf_counter() - start)
+            self._reply(200, {"results": results} if many else results[0])
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Per-request access logging would dominate latency at high request rates
+            pass
+
+    return RecommendationHandler
+
+
+def create_server(model_path, host="127.0.0.1", port=8000, id_dictionary_dir="data/id_dictionaries",
+                  loader=load_model, max_batch=256, max_wait_ms=2.0, poll_interval=5.0,
+                  ann_lists=None, nprobe=None):
+    """
+    Build a recommendation HTTP server that keeps the model resident and hot-swaps new artifacts.
+
+    Top-N requests use exact retrieval unless `ann_lists` is set, in which case an IVF index
+    with that many lists is built per model version and searched with `nprobe` lists.
+
+    Returns:
+        ThreadingHTTPServer: Call serve_forever() to start serving.
+    """
+    holder = ModelHolder(model_path, id_dictionary_dir, loader=loader, poll_interval=poll_interval,
+                         ann_lists=ann_lists)
+    holder.start_watching()
+    stats = LatencyStats()
+    batcher = MicroBatcher(holder, stats, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                           nprobe=nprobe if ann_lists else None)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, stats))
+    server.daemon_threads = True
+    server.model_holder = holder
+    server.stats = stats
+    return server
+
+
+def serve(model_path, host="127.0.0.1", port=8000, **kwargs):
+    server = create_server(model_path, host, port, **kwargs)
+    print(f"Serving recommendations on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.model_holder.stop()
+        server.server_close()
@@ -0,0 +1,196 @@
+import numpy as np
+
+
+class SeenItems:
+    """
+    Items each user already interacted with, stored CSR-style by model user row
+    (indptr/indices arrays) so a whole batch can be masked without Python loops.
+    The optional `values` hold the interaction strengths, which incremental ALS
+    updates use as the history of the model.
+    """
+
+    def __init__(self, indptr, indices, values=None):
+        # Arrays are kept as given, so memory-mapped artifact arrays stay shared
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.values = None if values is None else np.asarray(values)
+
+    @classmethod
+    def from_codes(cls, model, user_codes, item_codes, values=None):
+        user_rows = model.rows(user_codes, model.user_rows)
+        item_rows = model.rows(item_codes, model.item_rows)
+        keep = (user_rows >= 0) & (item_rows >= 0)
+        user_rows, item_rows = user_rows[keep], item_rows[keep]
+        order = np.lexsort((item_rows, user_rows))
+        counts = np.bincount(user_rows, minlength=len(model.user_codes))
+        if values is not None:
+            values = np.asarray(values, dtype=np.float32)[keep][order]
+        return cls(np.concatenate([[0], np.cumsum(counts)]), item_rows[order], values)
+
+    @classmethod
+    def from_surprise_trainset(cls, model, trainset):
+        """
+        Seen items of a surprise trainset; its inner ids are the rows of FactorModel.from_surprise.
+        """
+        inner = np.array([(u, i) for u, i, _ in trainset.all_ratings()], dtype=np.int64).reshape(-1, 2)
+        return cls.from_codes(model, model.user_codes[inner[:, 0]], model.item_codes[inner[:, 1]])
+
+    def codes(self, model):
+        """
+        (user_codes, item_codes) of every seen pair, e.g. to rebuild the CSR for a grown model.
+        """
+        user_rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return model.user_codes[user_rows], model.item_codes[self.indices]
+
+    def batch(self, user_rows):
+        """
+        (batch_position, item_row) pairs of the seen items of a batch of user rows.
+        """
+        user_rows = np.asarray(user_rows)
+        valid = user_rows >= 0
+        starts = np.where(valid, self.indptr[np.clip(user_rows, 0, None)], 0)
+        counts = np.where(valid, self.indptr[np.clip(user_rows, 0, None) + 1] - starts, 0)
+        positions = np.repeat(np.arange(len(user_rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return positions, self.indices[np.repeat(starts, counts) + offsets]
+
+    def of(self, user_row):
+        if user_row < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.indices[self.indptr[user_row]:self.indptr[user_row + 1]]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate maximum-inner-product index built with k-means on the item vectors.
+
+    A query scores the `n_lists` centroids and only searches the items of the best `nprobe`
+    lists: a larger nprobe raises recall and latency, nprobe == n_lists is an exact search.
+    """
+
+    def __init__(self, item_vectors, n_lists=None, n_iter=10, seed=0):
+        n_items = len(item_vectors)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n_items)))
+        rng = np.random.default_rng(seed)
+        centroids = item_vectors[rng.choice(n_items, size=min(self.n_lists, n_items), replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self._assign(item_vectors, centroids)
+            for list_id in range(len(centroids)):
+                members = item_vectors[assignment == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        assignment = self._assign(item_vectors, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=len(self.centroids))
+        self.list_indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.list_items = order
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        # Nearest centroid by Euclidean distance, computed blockwise to bound memory
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        centroid_norms = (centroids ** 2).sum(axis=1)
+        for start in range(0, len(vectors), 65536):
+            block = vectors[start:start + 65536]
+            distances = centroid_norms[None, :] - 2.0 * block @ centroids.T
+            assignment[start:start + 65536] = distances.argmin(axis=1)
+        return assignment
+
+    def candidates(self, query, nprobe):
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.list_items[self.list_indptr[l]:self.list_indptr[l + 1]] for l in lists])
+
+
+class RetrievalEngine:
+    """
+    Batched top-K retrieval over the factors of a FactorModel.
+
+    Ranking only depends on item_bias + dot(user, item) (the global mean and user bias are
+    constant per user). A batch of users is scored with one matrix multiply against the
+    model's float32 item factors plus the item biases, already-seen items are masked, and
+    np.argpartition selects the top K without sorting the whole catalog. The factors are
+    used as they are, so a memory-mapped artifact stays shared between server processes
+    instead of being copied into each of them. For large catalogs an IVFIndex can answer instead.
+    """
+
+    def __init__(self, model, seen=None, batch_size=1024):
+        self.model = model
+        self.seen = seen
+        self.batch_size = batch_size
+        self.ann_index = None
+
+    def build_ann_index(self, n_lists=None, n_iter=10, seed=0):
+        # Inner-product search over [item_factors | item_bias] with queries [user_factors | 1];
+        # the augmented matrix only lives while the index is built
+        item_vectors = np.hstack([self.model.item_factors, self.model.item_bias[:, None]])
+        self.ann_index = IVFIndex(item_vectors, n_lists=n_lists, n_iter=n_iter, seed=seed)
+        return self.ann_index
+
+    def _user_vectors(self, user_rows):
+        known = user_rows >= 0
+        vectors = np.zeros((len(user_rows), self.model.item_factors.shape[1]), dtype=np.float32)
+        vectors[known] = self.model.user_factors[user_rows[known]]
+        offsets = np.full(len(user_rows), self.model.global_mean, dtype=np.float32)
+        offsets[known] += self.model.user_bias[user_rows[known]]
+        return vectors, offsets
+
+    def top_k(self, user_codes, k=10, exclude_seen=True, nprobe=None):
+        """
+        Top-k item codes and predicted scores for each user.
+
+        Args:
+            user_codes (array-like): User codes; unknown users get the most popular items by bias.
+            k (int): Number of items per user.
+            exclude_seen (bool): Drop items the user already interacted with (needs `seen`).
+            nprobe (int, optional): Use the ANN index and search this many lists. None means exact search.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (len(users), k) item codes and scores, best first.
+                Rows with fewer than k candidates are padded with code -1 and score NaN.
+        """
+        user_rows = self.model.rows(user_codes, self.model.user_rows)
+        k = min(k, len(self.model.item_factors))
+        codes = np.full((len(user_rows), k), -1, dtype=np.int32)
+        scores = np.full((len(user_rows), k), np.nan, dtype=np.float32)
+        mask_seen = exclude_seen and self.seen is not None
+
+        for start in range(0, len(user_rows), self.batch_size):
+            rows = user_rows[start:start + self.batch_size]
+            vectors, offsets = self._user_vectors(rows)
+            if nprobe is not None and self.ann_index is not None:
+                for i, (vector, row) in enumerate(zip(vectors, rows)):
+                    candidates = self.ann_index.candidates(np.append(vector, np.float32(1.0)), nprobe)
+                    if mask_seen:
+                        candidates = candidates[~np.isin(candidates, self.seen.of(row))]
+                    candidate_scores = self.model.item_factors[candidates] @ vector + self.model.item_bias[candidates]
+                    top = _top_k_rows(candidate_scores[None, :], k)[0]
+                    top = top[:len(candidates)]
+                    codes[start + i, :len(top)] = self.model.item_codes[candidates[top]]
+                    scores[start + i, :len(top)] = candidate_scores[top] + offsets[i]
+                continue
+
+            batch_scores = vectors @ self.model.item_factors.T
+            batch_scores += self.model.item_bias
+            if mask_seen:
+                positions, items = self.seen.batch(rows)
+                batch_scores[positions, items] = -np.inf
+            top = _top_k_rows(batch_scores, k)
+            top_scores = np.take_along_axis(batch_scores, top, axis=1)
+            valid = np.isfinite(top_scores)
+            codes[start:start + len(rows)] = np.where(valid, self.model.item_codes[top], -1)
+            scores[start:start + len(rows)] = np.where(valid, top_scores + offsets[:, None], np.nan)
+
+        low, high = self.model.rating_scale
+        return codes, np.clip(scores, low, high)
+
+
+def _top_k_rows(scores, k):
+    # argpartition selects each row's k best in O(items), then only those k are sorted
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
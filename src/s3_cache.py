@@ -0,0 +1,199 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from src.instrumentation import count, record_cache
+from src.s3_sink import get_s3_client
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_RANGE_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_RANGE_SIZE = 16 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class S3ReadCache:
+    """
+    Read-through local disk cache for S3 objects keyed by bucket, key and ETag.
+
+    A cached object is revalidated with a conditional GET (If-None-Match) and is only
+    downloaded again when its ETag changed. Objects above `range_threshold` bytes are
+    fetched as parallel ranged GETs. The cache is bounded to `max_bytes` on disk and
+    evicts the least recently used objects first.
+    """
+
+    def __init__(self, cache_dir="data/cache/s3", max_bytes=DEFAULT_MAX_BYTES, client=None,
+                 range_threshold=DEFAULT_RANGE_THRESHOLD, range_size=DEFAULT_RANGE_SIZE, max_workers=8):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.client = client or get_s3_client()
+        self.range_threshold = range_threshold
+        self.range_size = range_size
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "bucket TEXT NOT NULL, key TEXT NOT NULL, etag TEXT NOT NULL, "
+                "path TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (bucket, key))"
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def _entry(self, bucket_name, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, path FROM entries WHERE bucket = ? AND key = ?", (bucket_name, key)
+            ).fetchone()
+        if row is not None and not os.path.exists(row[1]):
+            return None
+        return row
+
+    def _local_path(self, bucket_name, key, etag):
+        digest = hashlib.sha1(f"{bucket_name}/{key}/{etag}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + os.path.splitext(key)[1])
+
+    def get_path(self, bucket_name, key):
+        """
+        Local path of an up-to-date copy of s3://bucket_name/key, downloading it only if needed.
+        """
+        entry = self._entry(bucket_name, key)
+        if entry is not None:
+            etag, path = entry
+            try:
+                response = self.client.get_object(Bucket=bucket_name, Key=key, IfNoneMatch=etag)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("304", "NotModified"):
+                    raise
+                self.hits += 1
+                record_cache('s3', hit=True)
+                self._touch(bucket_name, key)
+                return path
+            self.misses += 1
+            record_cache('s3', hit=False)
+            return self._store(bucket_name, key, response)
+
+        self.misses += 1
+        record_cache('s3', hit=False)
+        head = self.client.head_object(Bucket=bucket_name, Key=key)
+        if head["ContentLength"] > self.range_threshold:
+            return self._store_ranged(bucket_name, key, head["ETag"], head["ContentLength"])
+        return self._store(bucket_name, key, self.client.get_object(Bucket=bucket_name, Key=key))
+
+    def _store(self, bucket_name, key, response):
+        etag, size = response["ETag"], response["ContentLength"]
+        if size > self.range_threshold:
+            response["Body"].close()
+            return self._store_ranged(bucket_name, key, etag, size)
+        path = self._local_path(bucket_name, key, etag)
+        fd, tmp_path = self._temp_file()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response["Body"].iter_chunks(COPY_BUFFER_SIZE):
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit(bucket_name, key, etag, tmp_path, path, size)
+
+    def _store_ranged(self, bucket_name, key, etag, size):
+        path = self._local_path(bucket_name, key, etag)
+        fd, tmp_path = self._temp_file()
+        with os.fdopen(fd, "wb") as f:
+            f.truncate(size)
+
+        def fetch_range(start):
+            end = min(start + self.range_size, size) - 1
+            # IfMatch makes every range fail if the object changes mid-download
+            response = self.client.get_object(Bucket=bucket_name, Key=key, IfMatch=etag, Range=f"bytes={start}-{end}")
+            with open(tmp_path, "r+b") as f:
+                f.seek(start)
+                for chunk in response["Body"].iter_chunks(COPY_BUFFER_SIZE):
+                    f.write(chunk)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(fetch_range, range(0, size, self.range_size)))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit(bucket_name, key, etag, tmp_path, path, size)
+
+    def _temp_file(self):
+        # A unique file in the cache directory, so concurrent downloads of the same object
+        # (from threads or processes) never write to the same file and os.replace stays atomic
+        return tempfile.mkstemp(dir=self.cache_dir, prefix=".download-", suffix=".tmp")
+
+    def _commit(self, bucket_name, key, etag, tmp_path, path, size):
+        os.replace(tmp_path, path)
+        count('s3_bytes_downloaded_total', size, bucket=bucket_name)
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                "SELECT path FROM entries WHERE bucket = ? AND key = ?", (bucket_name, key)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (bucket, key, etag, path, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket_name, key, etag, path, size, time.time())
+            )
+        if previous is not None and previous[0] != path and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        self._evict(keep=path)
+        return path
+
+    def _touch(self, bucket_name, key):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE bucket = ? AND key = ?", (time.time(), bucket_name, key)
+            )
+
+    def _evict(self, keep=None):
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute(
+                "SELECT bucket, key, path, size FROM entries ORDER BY last_access"
+            ).fetchall()
+            for bucket_name, key, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._conn.execute("DELETE FROM entries WHERE bucket = ? AND key = ?", (bucket_name, key))
+                if os.path.exists(path):
+                    os.remove(path)
+                total -= size
+
+    def read_dataframe(self, bucket_name, key, columns=None, format=None, **read_kwargs):
+        """
+        Read a cached CSV or Parquet object into a DataFrame.
+
+        Args:
+            bucket_name (str): Source bucket.
+            key (str): Object key.
+            columns (list, optional): Columns to load. For Parquet only these column chunks are read.
+            format (str, optional): 'csv' or 'parquet'. Inferred from the key extension by default.
+            **read_kwargs: Extra arguments passed to pd.read_csv.
+
+        Returns:
+            pd.DataFrame: The object contents.
+        """
+        path = self.get_path(bucket_name, key)
+        if format is None:
+            format = 'parquet' if key.endswith(('.parquet', '.pq')) else 'csv'
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.read_table(path, columns=columns).to_pandas()
+        return pd.read_csv(path, usecols=columns, **read_kwargs)
@@ -0,0 +1,234 @@
+import gzip
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from src.instrumentation import count, current_span, instrumented
+
+# S3 requires every part except the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 8
+
+_client_lock = threading.Lock()
+_shared_clients = {}
+
+
+def get_s3_client(max_pool_connections=32, **client_kwargs):
+    """
+    Shared, thread-safe S3 client with a connection pool large enough for parallel part uploads.
+
+    Clients are cached per set of arguments so every uploader in the process reuses
+    the same HTTP connection pool.
+    """
+    cache_key = (max_pool_connections, tuple(sorted(client_kwargs.items())))
+    with _client_lock:
+        client = _shared_clients.get(cache_key)
+        if client is None:
+            config = Config(max_pool_connections=max_pool_connections, retries={'max_attempts': 5, 'mode': 'adaptive'})
+            client = boto3.client('s3', config=config, **client_kwargs)
+            _shared_clients[cache_key] = client
+        return client
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only file object that streams bytes into an S3 multipart upload.
+
+    Data is buffered until `part_size` bytes are available, then uploaded as one part
+    in a background thread. At most `max_workers` parts are in flight, so memory stays
+    bounded by roughly (max_workers + 1) * part_size regardless of the object size.
+    Objects smaller than one part are sent with a single put_object call. On error the
+    multipart upload is aborted so no orphaned parts are left behind.
+    """
+
+    def __init__(self, bucket_name, key, client=None, part_size=DEFAULT_PART_SIZE,
+                 max_workers=DEFAULT_MAX_WORKERS, content_type=None, content_encoding=None):
+        super().__init__()
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.bucket_name = bucket_name
+        self.key = key
+        self.client = client or get_s3_client()
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._extra_args = {}
+        if content_type:
+            self._extra_args['ContentType'] = content_type
+        if content_encoding:
+            self._extra_args['ContentEncoding'] = content_encoding
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed S3MultipartWriter")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def _submit_part(self, body):
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=self.key, **self._extra_args)
+            self._upload_id = response['UploadId']
+        part_number = len(self._futures) + 1
+        # Block the producer while max_workers parts are already in flight
+        self._slots.acquire()
+        future = self._executor.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        self._raise_failed_parts()
+
+    def _upload_part(self, part_number, body):
+        response = self.client.upload_part(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def _raise_failed_parts(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.client.put_object(Bucket=self.bucket_name, Key=self.key, Body=bytes(self._buffer),
+                                       **self._extra_args)
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                parts = [future.result() for future in self._futures]
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+            self._buffer = bytearray()
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self):
+        """
+        Drop the upload: queued parts are cancelled and the ones already sending are waited
+        for before the multipart upload is aborted, so no part lands after the abort and
+        lingers in the bucket. The writer is closed without writing anything.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
+        self._buffer = bytearray()
+        # Closing now keeps close() (also called on garbage collection) from uploading the rest
+        super().close()
+
+
+@instrumented('s3_upload')
+def upload_dataframe(df, bucket_name, key, format='csv', compression=None, chunksize=100_000,
+                     client=None, part_size=DEFAULT_PART_SIZE, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Serialize a DataFrame chunk by chunk straight into an S3 multipart upload.
+
+    Args:
+        df (pd.DataFrame): Data to upload.
+        bucket_name (str): Target bucket.
+        key (str): Target object key.
+        format (str): 'csv' or 'parquet'.
+        compression (str, optional): 'gzip' for CSV; for Parquet the column codec (e.g. 'snappy', 'zstd').
+        chunksize (int): Rows serialized at a time (one row group per chunk for Parquet).
+        client: boto3 S3 client. Defaults to the shared pooled client.
+        part_size (int): Multipart part size in bytes.
+        max_workers (int): Parts uploaded in parallel.
+
+    Returns:
+        int: Number of bytes uploaded.
+    """
+    content_encoding = 'gzip' if format == 'csv' and compression == 'gzip' else None
+    content_type = 'text/csv' if format == 'csv' else 'application/vnd.apache.parquet'
+    writer = S3MultipartWriter(bucket_name, key, client=client, part_size=part_size, max_workers=max_workers,
+                               content_type=content_type, content_encoding=content_encoding)
+    try:
+        if format == 'csv':
+            stream = gzip.GzipFile(fileobj=writer, mode='wb') if content_encoding else writer
+            stream.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+            for start in range(0, len(df), chunksize):
+                stream.write(df.iloc[start:start + chunksize].to_csv(index=False, header=False).encode('utf-8'))
+            if stream is not writer:
+                stream.close()
+        elif format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(writer, schema, compression=compression or 'snappy') as parquet_writer:
+                for start in range(0, len(df), chunksize):
+                    table = pa.Table.from_pandas(df.iloc[start:start + chunksize], schema=schema, preserve_index=False)
+                    parquet_writer.write_table(table)
+        else:
+            raise ValueError(f"Unsupported upload format: {format}")
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    count('s3_bytes_uploaded_total', writer.bytes_written, bucket=bucket_name)
+    current_span().add(rows_in=len(df), bytes_written=writer.bytes_written)
+    return writer.bytes_written
+
+
+@instrumented('s3_upload')
+def upload_files(file_paths, bucket_name, object_names=None, client=None, max_workers=4,
+                 part_size=DEFAULT_PART_SIZE, max_concurrency=DEFAULT_MAX_WORKERS):
+    """
+    Upload several local files in parallel over one pooled client; large files use
+    parallel multipart transfers.
+
+    Args:
+        file_paths (list): Local files to upload.
+        bucket_name (str): Target bucket.
+        object_names (list, optional): Object keys, defaulting to the file paths.
+        client: boto3 S3 client. Defaults to the shared pooled client.
+        max_workers (int): Files uploaded at the same time.
+        part_size (int): Multipart threshold and part size in bytes.
+        max_concurrency (int): Parts uploaded in parallel per file.
+
+    Returns:
+        dict: {file_path: None on success or the exception raised}.
+    """
+    client = client or get_s3_client(max_pool_connections=max_workers * max_concurrency)
+    object_names = object_names or list(file_paths)
+    transfer_config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                     max_concurrency=max_concurrency, use_threads=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(client.upload_file, path, bucket_name, name, Config=transfer_config): path
+            for path, name in zip(file_paths, object_names)
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            results[path] = future.exception()
+            if results[path] is None:
+                size = os.path.getsize(path)
+                count('s3_bytes_uploaded_total', size, bucket=bucket_name)
+                current_span().add(bytes_written=size)
+    return results
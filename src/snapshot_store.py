@@ -0,0 +1,258 @@
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+METADATA_COLUMNS = ['title', 'channel_title', 'category_id', 'published_at', 'description']
+STAT_COLUMNS = ['view_count', 'like_count', 'comment_count']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    region_code TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chart_entries (
+    snapshot_id INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, video_id)
+);
+CREATE TABLE IF NOT EXISTS video_versions (
+    video_id TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    title TEXT,
+    channel_title TEXT,
+    category_id TEXT,
+    published_at TEXT,
+    description TEXT,
+    PRIMARY KEY (video_id, snapshot_id)
+);
+CREATE TABLE IF NOT EXISTS video_stats (
+    video_id TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    view_count INTEGER,
+    like_count INTEGER,
+    comment_count INTEGER,
+    PRIMARY KEY (video_id, snapshot_id)
+);
+CREATE INDEX IF NOT EXISTS idx_video_stats_snapshot ON video_stats (snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_video_versions_snapshot ON video_versions (snapshot_id);
+"""
+
+
+def _advance(watermark, changes):
+    # Taking the store's current watermark after the query would skip rows committed in between
+    return max(watermark, int(changes['snapshot_id'].max())) if not changes.empty else watermark
+
+
+def _content_hash(row):
+    text = "\x1f".join("" if pd.isnull(row[col]) else str(row[col]) for col in METADATA_COLUMNS)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TrendingSnapshotStore:
+    """
+    Append-only store of trending chart snapshots of (region_code, fetched_at).
+
+    Video metadata is only written when its content changes and statistics are only
+    written when view/like/comment counts move since the region's previous snapshot of
+    the video, so each snapshot costs roughly the size of what changed since the
+    previous one. Snapshot ids increase monotonically and serve as watermarks for
+    downstream incremental consumers.
+    """
+
+    def __init__(self, db_path="data/snapshots/trending.sqlite"):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, videos_df, region_code, fetched_at=None):
+        """
+        Append one fetched chart for a region.
+
+        Args:
+            videos_df (pd.DataFrame): Trending videos as returned by fetch_trending_videos, in chart order.
+            region_code (str): Region the chart was fetched for.
+            fetched_at (str, optional): ISO-8601 UTC fetch timestamp. Defaults to now, to the microsecond.
+
+        Returns:
+            int: The snapshot id, usable as a watermark.
+        """
+        if fetched_at is None:
+            fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        df = videos_df.drop_duplicates(subset=['video_id']).reset_index(drop=True)
+
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO snapshots (region_code, fetched_at) VALUES (?, ?)",
+                (region_code, fetched_at)
+            )
+            snapshot_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO chart_entries (snapshot_id, video_id, rank) VALUES (?, ?, ?)",
+                [(snapshot_id, video_id, rank) for rank, video_id in enumerate(df['video_id'], start=1)]
+            )
+            if df.empty:
+                return snapshot_id
+
+            current = self._latest_state(df['video_id'].tolist(), region_code)
+
+            # Metadata rows: only new videos or videos whose title/description/... changed
+            df = df.assign(content_hash=df.apply(_content_hash, axis=1))
+            known_hash = df['video_id'].map(current['content_hash']) if not current.empty else None
+            changed_meta = df if known_hash is None else df[known_hash != df['content_hash']]
+            self._conn.executemany(
+                "INSERT INTO video_versions (video_id, snapshot_id, content_hash, title, channel_title, "
+                "category_id, published_at, description) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (row.video_id, snapshot_id, row.content_hash,
+                     *(None if pd.isnull(getattr(row, col)) else str(getattr(row, col)) for col in METADATA_COLUMNS))
+                    for row in changed_meta.itertuples(index=False)
+                ]
+            )
+
+            # Statistics rows: only when a count moved since the last value stored for this region,
+            # so each region's stats_changes_since series is complete on its own
+            stats = df[['video_id'] + STAT_COLUMNS].copy()
+            for col in STAT_COLUMNS:
+                stats[col] = pd.to_numeric(stats[col], errors='coerce').fillna(0).astype('int64')
+            if not current.empty:
+                previous = current.reindex(stats['video_id'])[STAT_COLUMNS].to_numpy()
+                unchanged = (previous == stats[STAT_COLUMNS].to_numpy()).all(axis=1)
+                stats = stats[~unchanged]
+            self._conn.executemany(
+                "INSERT INTO video_stats (video_id, snapshot_id, view_count, like_count, comment_count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(row[0], snapshot_id, *map(int, row[1:])) for row in stats.itertuples(index=False)]
+            )
+        return snapshot_id
+
+    def _latest_state(self, video_ids, region_code):
+        # Latest content hash and latest statistics in the region's snapshots per video, indexed by video_id
+        if not video_ids:
+            return pd.DataFrame()
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_ids (video_id TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM lookup_ids")
+        self._conn.executemany("INSERT OR IGNORE INTO lookup_ids VALUES (?)", [(v,) for v in video_ids])
+        hashes = pd.read_sql_query(
+            "SELECT v.video_id, v.content_hash FROM video_versions v JOIN lookup_ids l USING (video_id) "
+            "WHERE v.snapshot_id = (SELECT MAX(snapshot_id) FROM video_versions WHERE video_id = v.video_id)",
+            self._conn
+        ).set_index('video_id')
+        stats = pd.read_sql_query(
+            "SELECT s.video_id, s.view_count, s.like_count, s.comment_count FROM video_stats s "
+            "JOIN lookup_ids l USING (video_id) "
+            "WHERE s.snapshot_id = (SELECT MAX(t.snapshot_id) FROM video_stats t JOIN snapshots n USING (snapshot_id) "
+            "WHERE t.video_id = s.video_id AND n.region_code = ?)",
+            self._conn, params=[region_code]
+        ).set_index('video_id')
+        return hashes.join(stats, how='outer')
+
+    def watermark(self):
+        """
+        Returns:
+            int: Id of the most recent snapshot, or 0 if the store is empty.
+        """
+        row = self._conn.execute("SELECT COALESCE(MAX(snapshot_id), 0) FROM snapshots").fetchone()
+        return row[0]
+
+    @contextmanager
+    def read_transaction(self):
+        """
+        Run several reads against one consistent state of the store, so snapshots
+        committed by another process meanwhile are seen by all of them or by none.
+        """
+        self._conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            self._conn.execute("COMMIT")
+
+    def stats_changes_since(self, watermark=0, region_code=None):
+        """
+        Statistics time series rows written after a watermark.
+
+        Args:
+            watermark (int): Snapshot id already processed by the caller.
+            region_code (str, optional): Restrict to snapshots of one region.
+
+        Returns:
+            tuple[pd.DataFrame, int]: Changed statistics (video_id, snapshot_id, region_code,
+            fetched_at, view_count, like_count, comment_count) and the new watermark, the
+            highest snapshot id among the returned rows.
+        """
+        query = (
+            "SELECT s.video_id, s.snapshot_id, n.region_code, n.fetched_at, "
+            "s.view_count, s.like_count, s.comment_count "
+            "FROM video_stats s JOIN snapshots n USING (snapshot_id) WHERE s.snapshot_id > ?"
+        )
+        params = [watermark]
+        if region_code is not None:
+            query += " AND n.region_code = ?"
+            params.append(region_code)
+        changes = pd.read_sql_query(query + " ORDER BY s.snapshot_id, s.video_id", self._conn, params=params)
+        return changes, _advance(watermark, changes)
+
+    def metadata_changes_since(self, watermark=0):
+        """
+        New or changed video metadata written after a watermark.
+
+        Returns:
+            tuple[pd.DataFrame, int]: Latest metadata version per changed video and the new watermark,
+            the highest snapshot id among the returned rows.
+        """
+        changes = pd.read_sql_query(
+            "SELECT v.video_id, v.snapshot_id, " + ", ".join(f"v.{c}" for c in METADATA_COLUMNS) + " "
+            "FROM video_versions v WHERE v.snapshot_id > ? AND v.snapshot_id = "
+            "(SELECT MAX(snapshot_id) FROM video_versions WHERE video_id = v.video_id)",
+            self._conn, params=[watermark]
+        )
+        return changes, _advance(watermark, changes)
+
+    def latest_chart(self, region_code):
+        """
+        Rebuild the most recent chart of a region in the fetch_trending_videos layout.
+
+        Returns:
+            pd.DataFrame: One row per charted video with its latest metadata and statistics.
+        """
+        row = self._conn.execute(
+            "SELECT MAX(snapshot_id) FROM snapshots WHERE region_code = ?", (region_code,)
+        ).fetchone()
+        if row[0] is None:
+            return pd.DataFrame(columns=['video_id'] + METADATA_COLUMNS + STAT_COLUMNS)
+        entries = pd.read_sql_query(
+            "SELECT video_id, rank FROM chart_entries WHERE snapshot_id = ? ORDER BY rank",
+            self._conn, params=[row[0]]
+        )
+        meta = pd.read_sql_query(
+            "SELECT v.video_id, " + ", ".join(f"v.{c}" for c in METADATA_COLUMNS) + " "
+            "FROM video_versions v JOIN chart_entries c ON c.video_id = v.video_id AND c.snapshot_id = ? "
+            "WHERE v.snapshot_id = (SELECT MAX(snapshot_id) FROM video_versions WHERE video_id = v.video_id)",
+            self._conn, params=[row[0]]
+        )
+        stats = pd.read_sql_query(
+            "SELECT s.video_id, s.view_count, s.like_count, s.comment_count "
+            "FROM video_stats s JOIN chart_entries c ON c.video_id = s.video_id AND c.snapshot_id = ? "
+            "WHERE s.snapshot_id = (SELECT MAX(t.snapshot_id) FROM video_stats t JOIN snapshots n USING (snapshot_id) "
+            "WHERE t.video_id = s.video_id AND n.region_code = ?)",
+            self._conn, params=[row[0], region_code]
+        )
+        chart = entries.merge(meta, on='video_id', how='left').merge(stats, on='video_id', how='left')
+        return chart.drop(columns=['rank'])[['video_id'] + METADATA_COLUMNS + STAT_COLUMNS]
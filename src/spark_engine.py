@@ -0,0 +1,263 @@
+import glob
+import os
+import shutil
+
+from src.aggregates import COUNT_COLUMNS, HASHTAG_PATTERN
+from src.id_dictionary import IdDictionaries, code_column
+from src.star_schema import VIDEO_KEY, _base_path, _with_key
+from src.storage import _resolve_existing, dataset_path, get_config_option, get_storage_format
+from src.streaming_preprocessing import NUMERIC_COLUMNS, PERCENTAGE_COLUMNS
+
+ENGINES = ('pandas', 'spark')
+
+
+def get_processing_engine(config_path="config/config.yaml"):
+    """
+    Engine selected in config.yaml (`processing.engine`) for the preprocess, merge and
+    aggregation stages, defaulting to pandas.
+    """
+    engine = get_config_option("processing", "engine", "pandas", config_path)
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported processing engine: {engine}")
+    return engine
+
+
+_spark = None
+
+
+def get_spark_session(master=None, app_name="youtube_awsproject"):
+    """
+    Shared SparkSession. The master comes from `processing.spark_master` (local[*] by
+    default, spark://spark-master:7077 for the compose cluster).
+    """
+    global _spark
+    if _spark is None:
+        try:
+            from pyspark.sql import SparkSession
+        except ImportError as e:
+            raise ImportError("The spark processing engine requires pyspark (pip install pyspark).") from e
+        master = master or get_config_option("processing", "spark_master", "local[*]")
+        _spark = SparkSession.builder.master(master).appName(app_name).getOrCreate()
+    return _spark
+
+
+def spark_path(path):
+    """
+    Location of a project path as seen by the Spark executors: paths under data/ are
+    rewritten to `processing.spark_data_root` when the cluster mounts the directory elsewhere.
+    """
+    data_root = get_config_option("processing", "spark_data_root")
+    normalized = os.path.normpath(path)
+    if data_root and (normalized == "data" or normalized.startswith("data" + os.sep)):
+        return os.path.join(data_root, os.path.relpath(normalized, "data"))
+    return os.path.abspath(path) if not data_root else path
+
+
+def read_spark_table(path, columns=None, spark=None):
+    """
+    Read a stage output written by write_table (CSV file or Parquet dataset) as a Spark DataFrame.
+    """
+    spark = spark or get_spark_session()
+    target, format = _resolve_existing(path)
+    if format == 'parquet':
+        df = spark.read.parquet(spark_path(target))
+    else:
+        df = spark.read.csv(spark_path(target), header=True, inferSchema=True, multiLine=True, escape='"')
+    return df.select(*columns) if columns else df
+
+
+def write_spark_table(df, path, format=None, partition_cols=None):
+    """
+    Write a Spark DataFrame to the same location and format write_table would use.
+
+    Parquet datasets are written in parallel by the executors. The CSV export is
+    coalesced to one file so it matches the single-file pandas output.
+
+    Returns:
+        str: The path written.
+    """
+    format = format or get_storage_format()
+    target = dataset_path(path, format)
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    if format == 'parquet':
+        writer = df.write.mode('overwrite')
+        if partition_cols:
+            writer = writer.partitionBy(*partition_cols)
+        writer.parquet(spark_path(target))
+        return target
+
+    staging = f"{target}.spark-tmp"
+    df.coalesce(1).write.mode('overwrite').csv(spark_path(staging), header=True, escape='"')
+    part, = glob.glob(os.path.join(staging, "part-*.csv"))
+    os.replace(part, target)
+    shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def preprocess_user_behavior_spark(data_path, output_path, output_format=None, spark=None):
+    """
+    Spark version of preprocess_user_behavior: strip '%' from percentage columns, fill
+    missing values with the column median and min-max scale the numeric columns.
+
+    Medians use approxQuantile with a 1e-4 relative error, computed in one pass for all
+    columns, like the sketches of the chunked pandas path.
+    """
+    spark = spark or get_spark_session()
+    from pyspark.sql import functions as F
+
+    df = read_spark_table(data_path, spark=spark)
+    for column in PERCENTAGE_COLUMNS:
+        if column in df.columns:
+            df = df.withColumn(column, F.regexp_replace(F.col(column).cast('string'), '%', '').cast('double'))
+    numeric = [column for column in NUMERIC_COLUMNS if column in df.columns]
+    for column in numeric:
+        df = df.withColumn(column, F.col(column).cast('double'))
+
+    medians = df.approxQuantile(numeric, [0.5], 1e-4)
+    df = df.fillna({column: median[0] for column, median in zip(numeric, medians) if median})
+    bounds = df.agg(*[F.min(c).alias(f"{c}_min") for c in numeric], *[F.max(c).alias(f"{c}_max") for c in numeric])
+    bounds = bounds.collect()[0]
+    for column in numeric:
+        low, high = bounds[f"{column}_min"], bounds[f"{column}_max"]
+        span = (high - low) if low is not None and high is not None and high > low else None
+        # MinMaxScaler maps constant columns to 0
+        scaled = (F.col(column) - F.lit(low)) / F.lit(span) if span else F.lit(0.0)
+        df = df.withColumn(column, scaled)
+
+    written_path = write_spark_table(df, output_path, format=output_format)
+    print(f"Preprocessed data saved to {written_path}")
+    return written_path
+
+
+def encode_ids_spark(df, id_dictionaries=None):
+    """
+    Normalize the id columns like IdDictionaries.encode_frame and add the int32 code columns.
+
+    Only the distinct ids are collected to the driver to extend the append-only
+    dictionaries; the (id, code) mapping is then broadcast-joined back onto the data.
+    """
+    from pyspark.sql import functions as F
+
+    spark = df.sparkSession
+    id_dictionaries = id_dictionaries or IdDictionaries()
+    normalizers = {
+        'video_id': lambda c: F.lower(F.regexp_replace(c.cast('string'), '[^a-zA-Z0-9]', '')),
+        'user_id': lambda c: F.trim(c.cast('string')),
+    }
+    for column, normalize in normalizers.items():
+        if column not in df.columns:
+            continue
+        df = df.withColumn(column, normalize(F.col(column)))
+        distinct = [row[0] for row in df.select(column).distinct().dropna().collect()]
+        codes = id_dictionaries.encode_values(column, distinct, add=True)
+        mapping = spark.createDataFrame(
+            [(value, int(code)) for value, code in zip(distinct, codes)],
+            schema=f"{column} string, {code_column(column)} int",
+        )
+        df = df.join(F.broadcast(mapping), on=column, how='left')
+    id_dictionaries.save()
+    return df
+
+
+def merge_data_spark(video_metadata_path, user_behavior_path, output_path, layout="wide", id_dictionaries=None,
+                     output_format=None, spark=None):
+    """
+    Spark version of load_and_merge_data / merge_user_video_data.
+
+    Both sides get the shared id dictionary codes and are joined on video_code, with the
+    (much smaller) video metadata broadcast to the executors. layout="star" writes the
+    `<base>_interactions` and `<base>_videos` tables StarView.load reads instead.
+
+    Returns:
+        str: The path written (the base path for the star layout).
+    """
+    spark = spark or get_spark_session()
+    from pyspark.sql import functions as F
+
+    id_dictionaries = id_dictionaries or IdDictionaries()
+    videos = encode_ids_spark(read_spark_table(video_metadata_path, spark=spark), id_dictionaries)
+    interactions = encode_ids_spark(read_spark_table(user_behavior_path, spark=spark), id_dictionaries)
+    interactions = interactions.filter(F.col(VIDEO_KEY).isNotNull())
+
+    if layout == "star":
+        base = _base_path(output_path)
+        videos = videos.filter(F.col(VIDEO_KEY).isNotNull()).dropDuplicates([VIDEO_KEY])
+        facts = interactions.join(F.broadcast(videos.select(VIDEO_KEY)), on=VIDEO_KEY, how='left_semi')
+        write_spark_table(facts.drop('video_id'), f"{base}_interactions", format=output_format)
+        write_spark_table(videos.select(*_with_key(videos.columns)), f"{base}_videos", format=output_format)
+        print(f"Merged data saved to {base}_interactions and {base}_videos")
+        return base
+
+    interactions = interactions.drop('video_id')
+    behavior_columns = [c for c in interactions.columns if c not in videos.columns]
+    merged = interactions.join(F.broadcast(videos), on=VIDEO_KEY, how='inner') \
+        .select(*videos.columns, *behavior_columns)
+    written_path = write_spark_table(merged, output_path, format=output_format)
+    print(f"Merged data saved to {written_path}")
+    return written_path
+
+
+def _snapshot_history_spark(snapshot_store_path, spark):
+    # Statistics history and latest metadata of every video in the snapshot store. SQLite
+    # is a local file, so the driver reads it and hands the rows to Spark.
+    from src.snapshot_store import METADATA_COLUMNS, TrendingSnapshotStore
+    with TrendingSnapshotStore(snapshot_store_path) as store, store.read_transaction():
+        stats, _ = store.stats_changes_since(0)
+        metadata, _ = store.metadata_changes_since(0)
+    stats = spark.createDataFrame(
+        stats, "video_id string, snapshot_id long, region_code string, fetched_at string, "
+               "view_count long, like_count long, comment_count long")
+    metadata = spark.createDataFrame(
+        metadata.astype(object).where(metadata.notna(), None),
+        "video_id string, snapshot_id long, " + ", ".join(f"{column} string" for column in METADATA_COLUMNS))
+    return stats, metadata
+
+
+def build_aggregates_spark(snapshot_store_path, output_dir="data/processed", output_format=None, spark=None):
+    """
+    Spark version of the analytics views, recomputed from the whole trending snapshot
+    history: the latest statistics and metadata snapshot of each video (highest
+    snapshot_id) are kept, as AnalyticsViews.refresh_from_store does, then the engagement,
+    channel-performance and hashtag tables are written in their usual layouts.
+
+    Returns:
+        list[str]: Paths written.
+    """
+    spark = spark or get_spark_session()
+    from pyspark.sql import Window
+    from pyspark.sql import functions as F
+
+    stats, metadata = _snapshot_history_spark(snapshot_store_path, spark)
+    latest = Window.partitionBy('video_id').orderBy(F.col('snapshot_id').desc())
+    stats = stats.withColumn('_rank', F.row_number().over(latest)).filter(F.col('_rank') == 1)
+    metadata = metadata.withColumn('_rank', F.row_number().over(latest)).filter(F.col('_rank') == 1)
+    videos = metadata.select('video_id', 'title', 'channel_title', 'description') \
+        .join(stats.select('video_id', *COUNT_COLUMNS), on='video_id', how='outer')
+    for column in COUNT_COLUMNS:
+        videos = videos.withColumn(column, F.coalesce(F.col(column).cast('long'), F.lit(0)))
+    videos = videos.cache()
+
+    engagement = videos.select(
+        'video_id', 'title', *COUNT_COLUMNS,
+        F.when(F.col('view_count') > 0, F.col('like_count') / F.col('view_count')).otherwise(0.0)
+        .alias('engagement_rate'),
+    )
+    channels = videos.filter(F.col('channel_title').isNotNull()).groupBy('channel_title').agg(
+        F.sum('view_count').alias('total_views'),
+        F.avg('view_count').alias('avg_views'),
+        F.sum('like_count').alias('total_likes'),
+        F.sum('comment_count').alias('total_comments'),
+    ).orderBy('channel_title')
+    # (?U) makes \w match Unicode letters, as Python's re does
+    pattern = "(?U)" + HASHTAG_PATTERN.replace("\\", "\\\\")
+    hashtags = videos.select(
+        F.explode(F.expr(f"regexp_extract_all(coalesce(description, ''), '{pattern}', 1)")).alias('Hashtag')
+    ).groupBy('Hashtag').agg(F.count(F.lit(1)).alias('Count')).orderBy(F.col('Count').desc())
+
+    written = [
+        write_spark_table(engagement, os.path.join(output_dir, "engagement_metrics.csv"), format=output_format),
+        write_spark_table(channels, os.path.join(output_dir, "channel_performance.csv"), format=output_format),
+        write_spark_table(hashtags, os.path.join(output_dir, "hashtags.csv"), format=output_format),
+    ]
+    videos.unpersist()
+    return written
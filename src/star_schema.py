@@ -0,0 +1,122 @@
+import numpy as np
+
+from src.id_dictionary import IdDictionaries
+from src.storage import read_table, write_table
+
+VIDEO_KEY = 'video_code'
+
+
+class StarView:
+    """
+    Interactions (fact table) and videos (dimension table) joined by the integer video_code.
+
+    Each video row is stored once instead of once per interaction. Tables can live in
+    memory or on disk; video columns are only read and joined when a consumer asks for them.
+    """
+
+    def __init__(self, facts=None, videos=None, facts_path=None, videos_path=None):
+        self._facts = facts
+        self._videos = videos
+        self.facts_path = facts_path
+        self.videos_path = videos_path
+
+    @property
+    def fact_columns(self):
+        return list(self.facts().columns)
+
+    @property
+    def video_columns(self):
+        return list(self.videos().columns)
+
+    def facts(self, columns=None):
+        if self._facts is None:
+            if columns is not None:
+                return read_table(self.facts_path, columns=columns)
+            self._facts = read_table(self.facts_path)
+        return self._facts if columns is None else self._facts[columns]
+
+    def videos(self, columns=None):
+        if self._videos is None:
+            if columns is not None:
+                # Read just the requested dimension columns from disk
+                return read_table(self.videos_path, columns=_with_key(columns))
+            self._videos = read_table(self.videos_path)
+        return self._videos if columns is None else self._videos[_with_key(columns)]
+
+    def to_frame(self, video_columns=(), fact_columns=None):
+        """
+        Materialize interactions with only the requested video columns attached.
+
+        Args:
+            video_columns (list): Video dimension columns to join (e.g. ['title']).
+            fact_columns (list, optional): Interaction columns to keep. Defaults to all of them.
+
+        Returns:
+            pd.DataFrame: One row per interaction.
+        """
+        if fact_columns is not None:
+            fact_columns = _with_key(fact_columns)
+        facts = self.facts(fact_columns).reset_index(drop=True)
+        video_columns = [col for col in video_columns if col != VIDEO_KEY]
+        if not video_columns:
+            return facts.copy()
+
+        videos = self.videos(video_columns)
+        codes = videos[VIDEO_KEY].to_numpy()
+        # Dense codes allow a positional lookup instead of a hash join
+        position = np.full(int(codes.max()) + 1 if len(codes) else 0, -1, dtype=np.int64)
+        position[codes] = np.arange(len(codes))
+        rows = position[facts[VIDEO_KEY].to_numpy()]
+        frame = facts.copy()
+        for col in video_columns:
+            frame[col] = videos[col].take(rows).to_numpy()
+        return frame
+
+    def save(self, path, format=None):
+        """
+        Write the two tables next to each other as `<path>_interactions` and `<path>_videos`.
+        """
+        base = _base_path(path)
+        self.facts_path = write_table(self.facts(), base + '_interactions', format=format)
+        self.videos_path = write_table(self.videos(), base + '_videos', format=format)
+        return self.facts_path, self.videos_path
+
+    @classmethod
+    def load(cls, path):
+        base = _base_path(path)
+        return cls(facts_path=base + '_interactions', videos_path=base + '_videos')
+
+
+def _with_key(columns):
+    return [VIDEO_KEY] + [col for col in columns if col != VIDEO_KEY]
+
+
+def _base_path(path):
+    return path[:-len('.csv')] if path.endswith('.csv') else path
+
+
+def build_star(interactions, videos, id_dictionaries=None):
+    """
+    Split an interaction/video inner join into a fact table and a video dimension table.
+
+    Args:
+        interactions (pd.DataFrame): User interactions with a video_id (or video_code) column.
+        videos (pd.DataFrame): Video metadata with a video_id (or video_code) column.
+        id_dictionaries (IdDictionaries, optional): Dictionaries used to assign video codes.
+
+    Returns:
+        StarView: The in-memory star view, holding only interactions with known videos.
+    """
+    if VIDEO_KEY not in interactions.columns or VIDEO_KEY not in videos.columns:
+        if id_dictionaries is None:
+            id_dictionaries = IdDictionaries()
+        videos = id_dictionaries.encode_frame(videos.copy())
+        interactions = id_dictionaries.encode_frame(interactions.copy())
+        id_dictionaries.save()
+
+    videos = videos[videos[VIDEO_KEY] >= 0].drop_duplicates(subset=[VIDEO_KEY])
+    facts = interactions[interactions[VIDEO_KEY].isin(videos[VIDEO_KEY])]
+    # video_id lives in the dimension table only
+    facts = facts.drop(columns=['video_id'], errors='ignore').reset_index(drop=True)
+    videos = videos[_with_key(videos.columns)].reset_index(drop=True)
+    return StarView(facts=facts, videos=videos)
@@ -0,0 +1,250 @@
+import functools
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import yaml
+
+from src.instrumentation import path_size, record_io
+
+# Explicit column types shared by every stage. Ids and low-cardinality labels are
+# dictionary encoded so they are stored once per row group and load as pandas
+# categoricals; columns not listed here keep the type pyarrow infers.
+_DICT = pa.dictionary(pa.int32(), pa.string())
+COLUMN_TYPES = {
+    'video_id': _DICT,
+    'user_id': _DICT,
+    'region_code': _DICT,
+    'channel_title': _DICT,
+    'category_id': _DICT,
+    'interaction_type': _DICT,
+    'device_type': _DICT,
+    'traffic_source': _DICT,
+    'title': pa.string(),
+    'description': pa.string(),
+    'published_at': pa.string(),
+    'timestamp': pa.string(),
+    'view_count': pa.int64(),
+    'like_count': pa.int64(),
+    'comment_count': pa.int64(),
+    'watch_time': pa.float64(),
+    'average_view_duration': pa.float64(),
+    'likes': pa.float64(),
+    'dislikes': pa.float64(),
+    'comments': pa.float64(),
+    'CTR': pa.float64(),
+    'shares': pa.float64(),
+    'audience_retention': pa.float64(),
+}
+
+FORMATS = ('parquet', 'csv')
+
+
+@functools.lru_cache(maxsize=8)
+def _load_config(config_path, mtime_ns):
+    # Parsed once per version of the file: every read_table/write_table asks for the format
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def get_config_option(section, key, default=None, config_path="config/config.yaml"):
+    """
+    Value of `<section>.<key>` in config.yaml, or `default` when it is not set.
+
+    The file is parsed again only when its modification time changes.
+    """
+    config_path = os.path.abspath(config_path)
+    try:
+        config = _load_config(config_path, os.stat(config_path).st_mtime_ns)
+    except FileNotFoundError:
+        config = {}
+    return (config.get(section) or {}).get(key, default)
+
+
+def get_storage_option(key, default=None, config_path="config/config.yaml"):
+    """
+    Value of `storage.<key>` in config.yaml, or `default` when it is not set.
+    """
+    return get_config_option("storage", key, default, config_path)
+
+
+def get_storage_format(config_path="config/config.yaml"):
+    """
+    Storage format selected in config.yaml (`storage.format`), defaulting to parquet.
+    """
+    return get_storage_option("format", "parquet", config_path)
+
+
+def dataset_path(path, format):
+    """
+    Map a stage path to the location used for a format: CSV files keep their `.csv`
+    name, Parquet datasets are directories named without the extension.
+    """
+    root, ext = os.path.splitext(path)
+    if format == 'csv':
+        return path if ext == '.csv' else root + '.csv'
+    return root if ext in ('.csv', '.parquet') else path
+
+
+def _resolve_existing(path, format=None):
+    # The configured layout wins: a leftover file in the other format (e.g. a committed
+    # CSV next to the Parquet dataset a stage now writes) is only read when the configured
+    # one does not exist
+    format = format or get_storage_format()
+    for candidate_format in (format, 'csv' if format == 'parquet' else 'parquet'):
+        candidate = dataset_path(path, candidate_format)
+        if os.path.exists(candidate):
+            is_csv = os.path.isfile(candidate) and candidate.endswith('.csv')
+            return candidate, 'csv' if is_csv else 'parquet'
+    if os.path.exists(path):
+        return path, 'csv' if os.path.isfile(path) and path.endswith('.csv') else 'parquet'
+    raise FileNotFoundError(f"No CSV file or Parquet dataset found for {path}")
+
+
+def schema_for(df):
+    """
+    Build the explicit Arrow schema for a DataFrame from COLUMN_TYPES.
+    """
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, COLUMN_TYPES.get(field.name, field.type))
+        for field in inferred
+    ])
+
+
+def _to_arrow(df):
+    df = df.copy()
+    schema = schema_for(df)
+    for field in schema:
+        col = df[field.name]
+        if pa.types.is_dictionary(field.type):
+            df[field.name] = col.astype('string').astype('category')
+        elif pa.types.is_integer(field.type):
+            df[field.name] = pd.to_numeric(col, errors='coerce').astype('Int64')
+        elif pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(col, errors='coerce').astype('float64')
+        elif pa.types.is_string(field.type):
+            df[field.name] = col.astype('string')
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_table(df, path, format=None, partition_cols=None, mode='overwrite'):
+    """
+    Write a stage output as a partitioned Parquet dataset or, as an export option, a CSV file.
+
+    Args:
+        df (pd.DataFrame): Data to write.
+        path (str): Stage path; a `.csv` suffix is dropped for Parquet datasets.
+        format (str, optional): 'parquet' or 'csv'. Defaults to the configured storage format.
+        partition_cols (list, optional): Columns to partition the Parquet dataset by (hive layout).
+        mode (str): 'overwrite' replaces the dataset, 'append' adds new files to it.
+
+    Returns:
+        str: The path actually written.
+    """
+    format = format or get_storage_format()
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported storage format: {format}")
+    target = dataset_path(path, format)
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+
+    if format == 'csv':
+        header = mode == 'overwrite' or not os.path.exists(target)
+        size_before = os.path.getsize(target) if mode != 'overwrite' and os.path.exists(target) else 0
+        df.to_csv(target, index=False, mode='w' if mode == 'overwrite' else 'a', header=header)
+        record_io('written', target, rows=len(df), nbytes=os.path.getsize(target) - size_before)
+        return target
+
+    if mode == 'overwrite' and os.path.isdir(target):
+        shutil.rmtree(target)
+    written_files = []
+    ds.write_dataset(
+        _to_arrow(df),
+        target,
+        format='parquet',
+        partitioning=partition_cols,
+        partitioning_flavor='hive' if partition_cols else None,
+        # Time-ordered file names keep appended chunks in write order when read back
+        basename_template=f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        file_visitor=lambda written: written_files.append(written.path),
+    )
+    record_io('written', target, rows=len(df), nbytes=sum(os.path.getsize(path) for path in written_files))
+    return target
+
+
+_OPS = {
+    '=': lambda s, v: s == v,
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(v),
+    'not in': lambda s, v: ~s.isin(v),
+}
+
+
+def read_table(path, columns=None, filters=None):
+    """
+    Read a stage output written by write_table, or any plain CSV file.
+
+    Args:
+        path (str): Stage path; the CSV file or the Parquet dataset directory is found automatically.
+        columns (list, optional): Columns to load. Parquet only reads these column chunks.
+        filters (list, optional): Predicates as (column, op, value) tuples, AND-ed together.
+            For Parquet they are pushed down to partitions and row-group statistics.
+
+    Returns:
+        pd.DataFrame: The requested columns and rows.
+    """
+    target, format = _resolve_existing(path)
+
+    if format == 'parquet':
+        df = pq.read_table(target, columns=columns, filters=filters or None).to_pandas()
+        record_io('read', target, rows=len(df), nbytes=path_size(target))
+        return df
+
+    filter_cols = [col for col, _, _ in (filters or [])]
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + filter_cols))
+    df = pd.read_csv(target, usecols=usecols)
+    for col, op, value in filters or []:
+        df = df[_OPS[op](df[col], value)]
+    if columns is not None:
+        df = df[list(columns)]
+    record_io('read', target, rows=len(df), nbytes=path_size(target))
+    return df.reset_index(drop=True)
+
+
+def iter_table_chunks(path, chunksize=100_000, columns=None):
+    """
+    Stream a stage output as DataFrame chunks of at most `chunksize` rows without loading it whole.
+
+    Args:
+        path (str): Stage path; the CSV file or the Parquet dataset directory is found automatically.
+        chunksize (int): Maximum rows per chunk.
+        columns (list, optional): Columns to load.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of the table.
+    """
+    target, format = _resolve_existing(path)
+    record_io('read', target, nbytes=path_size(target))
+
+    if format == 'parquet':
+        dataset = ds.dataset(target, format='parquet', partitioning='hive')
+        for batch in dataset.to_batches(columns=columns, batch_size=chunksize):
+            if batch.num_rows:
+                record_io('read', target, rows=batch.num_rows)
+                yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(target, usecols=columns, chunksize=chunksize):
+        record_io('read', target, rows=len(chunk))
+        yield chunk
@@ -0,0 +1,283 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.storage import iter_table_chunks, write_table
+
+PERCENTAGE_COLUMNS = ['watch_time', 'average_view_duration', 'CTR', 'audience_retention']
+NUMERIC_COLUMNS = ['watch_time', 'average_view_duration', 'likes', 'dislikes',
+                   'comments', 'CTR', 'shares', 'audience_retention']
+
+
+class QuantileSketch:
+    """
+    Mergeable KLL-style quantile sketch.
+
+    Items on level i stand for 2**i original values. When the sketch grows past
+    its capacity the lowest level is sorted and every other item is promoted, so
+    memory stays O(k log n) and the rank error is roughly 1/k. Sketches built on
+    separate chunks merge into the sketch of their union.
+    """
+
+    def __init__(self, k=256):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += values.size
+            self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if sum(items.size for items in self.levels) <= self.k * 2:
+                return
+            items = self.levels[level]
+            if items.size > self.k:
+                items = np.sort(items)
+                # Keep an odd trailing item at this level so no weight is lost
+                carry, items = (items[-1:], items[:-1]) if items.size % 2 else (np.empty(0), items)
+                promoted = items[np.random.randint(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = carry
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(items.size, 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='mergesort')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(values[order][min(position, values.size - 1)])
+
+
+class ColumnStats:
+    """
+    Mergeable per-column statistics: count, min, max and a quantile sketch for the median.
+    """
+
+    def __init__(self, k=256):
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(k)
+
+    def update(self, series):
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.count += values.size
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+
+class UserBehaviorStats:
+    """
+    Fitted imputation and scaling parameters: {column: {'median', 'min', 'max'}}.
+
+    The transform is shared by the in-memory and streaming paths: '%' is stripped from
+    percentage columns, missing values are filled with the median, then values are
+    min-max scaled to [0, 1] (a constant column maps to 0).
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Exact statistics of an in-memory table (the streaming path estimates the medians).
+        """
+        df = _strip_percentages(df)
+        columns = {}
+        for col in NUMERIC_COLUMNS:
+            if col not in df.columns:
+                continue
+            values = pd.to_numeric(df[col], errors='coerce').dropna()
+            if len(values):
+                columns[col] = {'median': float(values.median()), 'min': float(values.min()),
+                                'max': float(values.max())}
+        return cls(columns)
+
+    @classmethod
+    def from_column_stats(cls, column_stats):
+        columns = {}
+        for col, stats in column_stats.items():
+            if stats.count == 0:
+                continue
+            columns[col] = {'median': stats.sketch.quantile(0.5), 'min': stats.min, 'max': stats.max}
+        return cls(columns)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.columns, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def transform(self, df):
+        df = _strip_percentages(df)
+        for col, params in self.columns.items():
+            if col not in df.columns:
+                continue
+            values = pd.to_numeric(df[col], errors='coerce').fillna(params['median'])
+            value_range = params['max'] - params['min']
+            df[col] = (values - params['min']) / value_range if value_range else values * 0.0
+        return df
+
+
+def _strip_percentages(df):
+    df = df.copy()
+    for col in PERCENTAGE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace('%', ''), errors='coerce')
+    return df
+
+
+def _chunk_stats(df):
+    df = _strip_percentages(df)
+    return {col: ColumnStats().update(df[col]) for col in NUMERIC_COLUMNS if col in df.columns}
+
+
+def preprocess_user_behavior_frame(df):
+    """
+    In-memory cleaning of user behavior data, the same as the streaming path applies chunk by chunk.
+
+    Args:
+        df (pd.DataFrame): Raw user behavior data.
+
+    Returns:
+        tuple[pd.DataFrame, UserBehaviorStats]: The preprocessed data and the fitted statistics.
+
+    Raises:
+        ValueError: If df is empty.
+    """
+    if df.empty:
+        raise ValueError("User behavior data file is empty.")
+    stats = UserBehaviorStats.from_frame(df)
+    return stats.transform(df), stats
+
+
+def _bounded_map(fn, iterable, n_jobs):
+    # Ordered map that keeps at most 2 * n_jobs chunks in flight, so memory stays
+    # bounded by the chunk size instead of the input size
+    if n_jobs <= 1:
+        for item in iterable:
+            yield fn(item)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def fit_user_behavior_stats(data_path, chunksize=100_000, n_jobs=1):
+    """
+    First pass: build mergeable per-column statistics over the input chunk by chunk.
+
+    Args:
+        data_path (str): User behavior CSV file or Parquet dataset.
+        chunksize (int): Rows per chunk.
+        n_jobs (int): Number of worker processes for the chunk statistics.
+
+    Returns:
+        UserBehaviorStats: Fitted medians and min/max per numeric column.
+    """
+    merged = {}
+    for chunk_stats in _bounded_map(_chunk_stats, iter_table_chunks(data_path, chunksize), n_jobs):
+        for col, stats in chunk_stats.items():
+            if col in merged:
+                merged[col].merge(stats)
+            else:
+                merged[col] = stats
+    if not merged:
+        raise ValueError("User behavior data file is empty.")
+    return UserBehaviorStats.from_column_stats(merged)
+
+
+def transform_user_behavior(data_path, output_path, stats, chunksize=100_000, n_jobs=1, output_format=None):
+    """
+    Second pass: strip percentages, impute and scale each chunk and append it to the output.
+
+    Returns:
+        str: The path written.
+    """
+    written_path = None
+    mode = 'overwrite'
+    for chunk in _bounded_map(stats.transform, iter_table_chunks(data_path, chunksize), n_jobs):
+        written_path = write_table(chunk, output_path, format=output_format, mode=mode)
+        mode = 'append'
+    return written_path
+
+
+def preprocess_user_behavior_streaming(data_path, output_path, stats_path=None, chunksize=100_000,
+                                       n_jobs=1, output_format=None, refit=True):
+    """
+    Out-of-core version of preprocess_user_behavior for inputs larger than memory.
+
+    Args:
+        data_path (str): User behavior CSV file or Parquet dataset.
+        output_path (str): Where to write the preprocessed data.
+        stats_path (str, optional): JSON file for the fitted statistics. Saved after fitting;
+            with refit=False the statistics are loaded from it instead of being refitted.
+        chunksize (int): Rows per chunk.
+        n_jobs (int): Number of worker processes per pass.
+        output_format (str, optional): 'parquet' or 'csv'. Defaults to the configured storage format.
+        refit (bool): Fit new statistics on data_path (True) or reuse the saved ones (False).
+
+    Returns:
+        UserBehaviorStats: The statistics used for the transform.
+
+    Raises:
+        FileNotFoundError: With refit=False, when there are no saved statistics to reuse.
+    """
+    if refit:
+        stats = fit_user_behavior_stats(data_path, chunksize, n_jobs)
+        if stats_path is not None:
+            stats.save(stats_path)
+    else:
+        # Refitting here would silently scale new data differently from the data the model saw
+        if stats_path is None or not os.path.exists(stats_path):
+            raise FileNotFoundError(f"refit=False needs the saved statistics, but {stats_path} does not exist.")
+        stats = UserBehaviorStats.load(stats_path)
+    transform_user_behavior(data_path, output_path, stats, chunksize, n_jobs, output_format)
+    return stats
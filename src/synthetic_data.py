@@ -0,0 +1,162 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.storage import write_table
+
+INTERACTION_TYPES = ['view', 'like', 'comment', 'share']
+DEVICE_TYPES = ['Mobile', 'Desktop', 'Tablet', 'TV']
+TRAFFIC_SOURCES = ['Browse', 'Search', 'Suggested', 'Social Media', 'Direct', 'External']
+CATEGORY_IDS = ['1', '2', '10', '15', '17', '20', '22', '23', '24', '25', '26', '27', '28']
+
+_ID_ALPHABET = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"))
+_START = np.datetime64('2024-01-01T00:00:00', 's')
+
+
+def zipf_probabilities(n, exponent=1.1):
+    """
+    Probability of each rank 1..n under a (finite) Zipf law: p_k ~ 1 / k**exponent.
+    """
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+    return weights / weights.sum()
+
+
+def _sample_ranks(rng, cumulative, size):
+    # Inverse-CDF sampling; rng.choice(p=...) rebuilds the CDF on every call
+    return np.minimum(np.searchsorted(cumulative, rng.random(size), side='right'), len(cumulative) - 1)
+
+
+def _video_ids(n, seed):
+    # 11-character YouTube-style ids, unique for a given seed
+    rng = np.random.default_rng([seed, 1])
+    ids = set()
+    while len(ids) < n:
+        chars = _ID_ALPHABET[rng.integers(0, len(_ID_ALPHABET), size=(n - len(ids), 11))]
+        ids.update(chars.view('<U11').ravel())
+    return np.array(sorted(ids))[rng.permutation(n)]
+
+
+def _labels(codes, categories):
+    # Categorical straight from integer codes: much cheaper than one Python string per row,
+    # and write_table dictionary-encodes these columns anyway
+    return pd.Categorical.from_codes(codes, categories=pd.Index(categories))
+
+
+def _choice(rng, options, size, p=None):
+    cumulative = np.cumsum(p) if p is not None else np.arange(1, len(options) + 1) / len(options)
+    return _labels(_sample_ranks(rng, cumulative, size), options)
+
+
+def _words(rng, vocabulary, cumulative, lengths):
+    # One space-joined string per length, words drawn from a Zipfian vocabulary
+    words = vocabulary[_sample_ranks(rng, cumulative, int(lengths.sum()))]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(words[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def generate_videos(n_videos, seed=0, vocabulary_size=50_000, description_words=120, n_channels=None):
+    """
+    Synthetic trending videos with the columns fetch_trending writes.
+
+    Rank r of the returned frame is the r-th most popular video: view, like and comment
+    counts follow the same Zipf law generate_interactions samples from. Titles and
+    descriptions use a Zipfian vocabulary with hashtags mixed in, and description lengths
+    are log-normal around `description_words` words, so text-heavy stages see realistic
+    long-tailed documents.
+
+    Returns:
+        pd.DataFrame: One row per video.
+    """
+    rng = np.random.default_rng([seed, 2])
+    n_channels = n_channels or max(1, n_videos // 20)
+    vocabulary = np.array([f"w{i}" for i in range(vocabulary_size)], dtype=object)
+    vocabulary[rng.choice(vocabulary_size, size=vocabulary_size // 100, replace=False)] = \
+        [f"#tag{i}" for i in range(vocabulary_size // 100)]
+    cumulative = np.cumsum(zipf_probabilities(vocabulary_size))
+
+    popularity = zipf_probabilities(n_videos)
+    views = np.maximum(1, (popularity * n_videos * 1e5 * rng.lognormal(0, 0.3, n_videos))).astype(np.int64)
+    description_lengths = np.maximum(1, rng.lognormal(np.log(description_words), 0.6, n_videos).astype(np.int64))
+    channel_ranks = _sample_ranks(rng, np.cumsum(zipf_probabilities(n_channels)), n_videos)
+    published = _START + rng.integers(0, 365 * 24 * 3600, n_videos).astype('timedelta64[s]')
+
+    return pd.DataFrame({
+        'video_id': _video_ids(n_videos, seed),
+        'title': _words(rng, vocabulary, cumulative, rng.integers(3, 12, n_videos)),
+        'channel_title': np.char.add('channel_', channel_ranks.astype(str)),
+        'category_id': rng.choice(CATEGORY_IDS, n_videos),
+        'published_at': np.datetime_as_string(published, unit='s').astype(object) + 'Z',
+        'view_count': views,
+        'like_count': (views * rng.beta(2, 40, n_videos)).astype(np.int64),
+        'comment_count': (views * rng.beta(1, 400, n_videos)).astype(np.int64),
+        'description': _words(rng, vocabulary, cumulative, description_lengths),
+    })
+
+
+def generate_interactions(n_rows, video_ids, n_users, seed=0, exponent=1.1, start_row=0):
+    """
+    Synthetic user behavior log with the columns of the raw user behavior export plus a
+    0-1 `rating`.
+
+    Videos are drawn from a Zipf law over `video_ids` (the first id is the most popular)
+    and users from a milder one, so a few heavy users and hit videos dominate as in real
+    logs. Each (seed, start_row) pair gives a reproducible block, so large logs can be
+    generated chunk by chunk.
+
+    Returns:
+        pd.DataFrame: `n_rows` interactions.
+    """
+    rng = np.random.default_rng([seed, 3, start_row])
+    video_ids = np.asarray(video_ids)
+    video_ranks = _sample_ranks(rng, np.cumsum(zipf_probabilities(len(video_ids), exponent)), n_rows)
+    users = _sample_ranks(rng, np.cumsum(zipf_probabilities(n_users, 0.8)), n_rows)
+    user_numbers, user_codes = np.unique(users, return_inverse=True)
+    # Timestamps increase with the row number so time-based splits see a consistent history
+    seconds = (start_row + np.arange(n_rows)) * 30 + rng.integers(0, 30, n_rows)
+    watch_time = rng.gamma(2.0, 60.0, n_rows)
+
+    return pd.DataFrame({
+        'user_id': _labels(user_codes, np.char.add('user', user_numbers.astype(str))),
+        'video_id': _labels(video_ranks, video_ids),
+        'interaction_type': _choice(rng, INTERACTION_TYPES, n_rows, p=[0.85, 0.1, 0.03, 0.02]),
+        'timestamp': np.datetime_as_string(_START + seconds.astype('timedelta64[s]'), unit='s'),
+        'watch_time': watch_time,
+        'average_view_duration': watch_time * rng.uniform(0.3, 1.0, n_rows),
+        'likes': rng.poisson(2, n_rows),
+        'dislikes': rng.poisson(0.2, n_rows),
+        'comments': rng.poisson(0.5, n_rows),
+        'CTR': rng.beta(2, 20, n_rows),
+        'shares': rng.poisson(0.3, n_rows),
+        'device_type': _choice(rng, DEVICE_TYPES, n_rows, p=[0.6, 0.25, 0.1, 0.05]),
+        'traffic_source': _choice(rng, TRAFFIC_SOURCES, n_rows),
+        'audience_retention': rng.beta(5, 3, n_rows),
+        'rating': np.clip(rng.beta(5, 3, n_rows) + 0.1 * (video_ranks < len(video_ids) // 100), 0, 1),
+    })
+
+
+def write_synthetic_dataset(output_dir, n_rows, n_videos=None, n_users=None, seed=0, chunksize=1_000_000,
+                            format=None):
+    """
+    Write a trending videos table and an interaction log of `n_rows` rows under `output_dir`.
+
+    The log is generated and appended chunk by chunk, so 10^8-row datasets never have to
+    fit in memory. Video and user counts default to sizes that keep the log sparse.
+
+    Returns:
+        dict: Paths written ('videos', 'interactions') and the dataset sizes.
+    """
+    n_videos = n_videos or int(min(max(100, n_rows // 50), 2_000_000))
+    n_users = n_users or int(max(10, n_rows // 20))
+    videos = generate_videos(n_videos, seed=seed)
+    os.makedirs(output_dir, exist_ok=True)
+    videos_path = write_table(videos, os.path.join(output_dir, "trending_videos.csv"), format=format)
+
+    interactions_path = os.path.join(output_dir, "user_behavior_data.csv")
+    for start in range(0, n_rows, chunksize):
+        chunk = generate_interactions(min(chunksize, n_rows - start), videos['video_id'].to_numpy(), n_users,
+                                      seed=seed, start_row=start)
+        interactions_path = write_table(chunk, os.path.join(output_dir, "user_behavior_data.csv"), format=format,
+                                        mode='overwrite' if start == 0 else 'append')
+    return {'videos': videos_path, 'interactions': interactions_path,
+            'rows': n_rows, 'videos_count': n_videos, 'users': n_users}
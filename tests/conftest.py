@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the shared modules in src/ and the scripts importable from the tests
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
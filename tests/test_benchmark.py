@@ -0,0 +1,67 @@
+import pytest
+
+from src.benchmark import BenchmarkCase, compare_results, run_suite
+
+SIZE = 50_000_000
+
+
+def _buffer_size():
+    return SIZE
+
+
+def _allocate(n):
+    # Write every byte so the pages are really resident
+    buffer = b"x" * n
+    return len(buffer)
+
+
+def _no_rows():
+    return None
+
+
+def _missing_dependency():
+    import not_an_installed_module  # noqa: F401
+
+
+def _broken():
+    raise RuntimeError("stage failed")
+
+
+def test_each_stage_is_measured_in_its_own_process():
+    results = run_suite([
+        BenchmarkCase("allocate", _allocate, setup=_buffer_size),
+        BenchmarkCase("small", _no_rows, rows=10),
+        BenchmarkCase("optional", _missing_dependency),
+        BenchmarkCase("broken", _broken),
+    ], dataset={'rows': 10})
+
+    stages = results['stages']
+    assert stages['allocate']['status'] == 'ok'
+    assert stages['allocate']['rows'] == SIZE
+    assert stages['allocate']['peak_rss_mb'] >= SIZE / 2**20
+    # A fresh process does not inherit the previous stage's high-water mark
+    assert stages['small']['peak_rss_mb'] < stages['allocate']['peak_rss_mb']
+    assert stages['small']['rows'] == 10
+    assert stages['optional']['status'] == 'skipped'
+    assert stages['broken']['status'] == 'failed'
+    assert "stage failed" in stages['broken']['error']
+
+
+def _results(wall_s, peak_rss_mb, dataset=None):
+    return {'dataset': dataset or {'rows': 10},
+            'stages': {'load': {'status': 'ok', 'wall_s': wall_s, 'peak_rss_mb': peak_rss_mb},
+                       'spark': {'status': 'skipped', 'error': 'No module named pyspark'}}}
+
+
+def test_only_slowdowns_beyond_the_tolerance_are_regressions():
+    baseline = _results(1.0, 100.0)
+
+    assert compare_results(_results(1.1, 90.0), baseline) == []
+    regressions = compare_results(_results(1.5, 100.0), baseline)
+    assert regressions == [{'stage': 'load', 'metric': 'wall_s', 'baseline': 1.0, 'current': 1.5,
+                            'change': 0.5}]
+
+
+def test_baselines_from_another_dataset_are_rejected():
+    with pytest.raises(ValueError):
+        compare_results(_results(1.0, 100.0), _results(1.0, 100.0, dataset={'rows': 20}))
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from src.content_similarity import ContentIndex
+from src.recommendation import recommend_all
+
+TOPICS = ["football match goals league", "cooking recipe pasta sauce", "guitar song live concert",
+          "space rocket launch orbit", "stock market earnings report"]
+
+
+def _videos(start, count, seed):
+    # Each video mentions its topic's words plus a few random filler words
+    rng = np.random.default_rng(seed)
+    filler = ["today", "new", "best", "official", "video", "episode", "full", "highlights"]
+    return pd.DataFrame({
+        'video_id': [f"v{i}" for i in range(start, start + count)],
+        'title': [f"{TOPICS[i % len(TOPICS)]} {' '.join(rng.choice(filler, 3))}" for i in range(start, start + count)],
+        'description': [' '.join(rng.choice(TOPICS[i % len(TOPICS)].split(), 2)) for i in range(start, start + count)],
+        'channel_title': [f"channel {i % 7}" for i in range(start, start + count)],
+    })
+
+
+def _exact_top_k(index, k):
+    # Dense cosine similarities of the TF-IDF rows, without the blocked sparse products
+    matrix = index.matrix().toarray()
+    similarities = matrix @ matrix.T
+    np.fill_diagonal(similarities, -np.inf)
+    return np.sort(similarities, axis=1)[:, ::-1][:, :k]
+
+
+def test_top_k_matches_dense_cosine(tmp_path):
+    index = ContentIndex(str(tmp_path / "index"))
+    assert index.add_videos(_videos(0, 40, seed=0)) == 40
+    neighbours, scores = index.top_k(np.arange(40), k=5, max_block_cells=64)
+    np.testing.assert_allclose(scores, np.maximum(_exact_top_k(index, 5), 0), atol=1e-5)
+    assert (neighbours != np.arange(40)[:, None]).all()
+    # Videos on the same topic are the nearest neighbours
+    assert (neighbours[:, 0] % len(TOPICS) == np.arange(40) % len(TOPICS)).all()
+
+
+def test_index_round_trip_and_duplicates(tmp_path):
+    first, second = _videos(0, 10, seed=0), _videos(5, 10, seed=1)
+    index = ContentIndex(str(tmp_path / "index"))
+    index.add_videos(first)
+    index.save()
+    # Videos 5-9 are already indexed and keep their first text
+    reloaded = ContentIndex(str(tmp_path / "index"))
+    assert reloaded.add_videos(second) == 5
+    assert len(reloaded) == 15
+    fresh = ContentIndex(str(tmp_path / "fresh"))
+    fresh.add_videos(pd.concat([first, second]))
+    assert reloaded.video_ids == fresh.video_ids
+    assert abs(reloaded.matrix() - fresh.matrix()).max() < 1e-6
+
+
+def test_neighbour_cache_is_extended_then_rebuilt(tmp_path):
+    index = ContentIndex(str(tmp_path / "index"))
+    index.add_videos(_videos(0, 50, seed=0))
+    index.neighbours(k=5)
+
+    # 10% growth: new rows are queried against everything, old rows gain new candidates
+    index.add_videos(_videos(50, 5, seed=1))
+    neighbours, scores = index.neighbours(k=5)
+    exact_new, exact_new_scores = index.top_k(np.arange(50, 55), k=5)
+    np.testing.assert_array_equal(neighbours[50:], exact_new)
+    np.testing.assert_allclose(scores[50:], exact_new_scores)
+    assert np.isin(neighbours[:50], np.arange(50, 55)).any()
+    assert (np.diff(scores, axis=1) <= 1e-6).all()
+    # The extended lists are served from the cache by a freshly loaded index
+    index.save()
+    cached, _ = ContentIndex(str(tmp_path / "index")).neighbours(k=5)
+    np.testing.assert_array_equal(cached, neighbours)
+
+    # Past rebuild_growth every list is recomputed with the current IDF weights
+    index.add_videos(_videos(55, 20, seed=2))
+    neighbours, scores = index.neighbours(k=5)
+    exact, exact_scores = index.top_k(np.arange(len(index)), k=5)
+    np.testing.assert_allclose(scores, exact_scores)
+
+
+def test_recommend_all_lists_the_neighbours_of_each_video(tmp_path):
+    index = ContentIndex(str(tmp_path / "index"))
+    index.add_videos(_videos(0, 20, seed=0))
+    output_path = str(tmp_path / "recommendations.csv")
+    recommendations = recommend_all(index, ["v3", "v7", "v3", "unknown"], k=3, output_path=output_path)
+    assert recommendations['video_id'].tolist() == ["v3"] * 3 + ["v7"] * 3
+    assert recommendations['rank'].tolist() == [1, 2, 3] * 2
+    expected = index.similar_videos("v7", k=3)
+    pd.testing.assert_frame_equal(
+        recommendations[recommendations['video_id'] == "v7"][['similar_video_id', 'title', 'similarity_score']]
+        .rename(columns={'similar_video_id': 'video_id'}).reset_index(drop=True), expected)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from src.evaluation import ranking_metrics, time_split
+from src.factor_model import FactorModel
+
+N_USERS, N_ITEMS, K = 30, 40, 5
+
+
+def _interactions():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'user_id': rng.integers(0, 10, 200),
+        'timestamp': pd.date_range('2024-01-01', periods=200, freq='h').strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+    df.loc[[3, 50], 'timestamp'] = 'not a time'
+    return df.sample(frac=1.0, random_state=0)
+
+
+def test_time_split_matches_a_quantile_filter():
+    df = _interactions()
+    train, test = time_split(df, test_fraction=0.25)
+
+    times = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+    cutoff = times.quantile(0.75)
+    pdt.assert_frame_equal(train, df[times < cutoff])
+    pdt.assert_frame_equal(test, df[times >= cutoff])
+
+
+def test_time_split_at_an_explicit_cutoff():
+    df = _interactions()
+    train, test = time_split(df, cutoff='2024-01-05')
+
+    assert pd.to_datetime(train['timestamp']).max() < pd.Timestamp('2024-01-05')
+    assert pd.to_datetime(test['timestamp']).min() >= pd.Timestamp('2024-01-05')
+    assert len(train) + len(test) == len(df) - 2
+
+
+def _model():
+    rng = np.random.default_rng(1)
+    # A wide rating scale keeps scores unclipped, so the naive ranking has no ties
+    return FactorModel(rng.normal(size=(N_USERS, 4)), rng.normal(size=(N_ITEMS, 4)), rng.normal(size=N_USERS),
+                       rng.normal(size=N_ITEMS), 0.5, np.arange(N_USERS), np.arange(N_ITEMS) * 2,
+                       rating_scale=(-100, 100))
+
+
+def _naive_metrics(model, train, test):
+    # Rank every item per user with pandas, one user at a time
+    precision, recall, ndcg, recommended = [], [], [], set()
+    for user, relevant in test.groupby('user')['item']:
+        relevant = set(relevant)
+        candidates = pd.Series(model.item_codes)
+        candidates = candidates[~candidates.isin(train.loc[train['user'] == user, 'item'])]
+        scores = pd.Series(model.score(np.full(len(candidates), user), candidates.to_numpy()),
+                           index=candidates.to_numpy())
+        top = scores.nlargest(K).index.tolist()
+        recommended.update(top)
+        hits = [item in relevant for item in top]
+        dcg = sum(1 / np.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+        ideal = sum(1 / np.log2(rank + 2) for rank in range(min(len(relevant), K)))
+        precision.append(sum(hits) / K)
+        recall.append(sum(hits) / len(relevant))
+        ndcg.append(dcg / ideal)
+    return {'users': len(precision), f'precision@{K}': np.mean(precision), f'recall@{K}': np.mean(recall),
+            f'ndcg@{K}': np.mean(ndcg), 'coverage': len(recommended) / len(model.item_codes)}
+
+
+def _split():
+    rng = np.random.default_rng(2)
+    pairs = pd.DataFrame({'user': rng.integers(0, N_USERS, 600), 'item': rng.integers(0, N_ITEMS, 600) * 2,
+                          'rating': rng.random(600)}).drop_duplicates(['user', 'item'])
+    return pairs.iloc[:400], pairs.iloc[400:]
+
+
+def test_ranking_metrics_match_a_per_user_computation():
+    model = _model()
+    train, test = _split()
+
+    metrics = ranking_metrics(model, train['user'], train['item'], test['user'], test['item'], k=K)
+
+    assert metrics == pytest.approx(_naive_metrics(model, train, test))
+
+
+def test_ranking_metrics_only_count_relevant_ratings():
+    model = _model()
+    train, test = _split()
+
+    metrics = ranking_metrics(model, train['user'], train['item'], test['user'], test['item'], k=K,
+                              test_ratings=test['rating'], min_rating=0.5)
+
+    assert metrics == pytest.approx(_naive_metrics(model, train, test[test['rating'] >= 0.5]))
+
+
+def test_ranking_metrics_without_known_test_users():
+    metrics = ranking_metrics(_model(), [0], [0], [-1], [2], k=K)
+    assert metrics['users'] == 0
+    assert np.isnan(metrics[f'precision@{K}'])
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from src.exploration import CoMoments, ColumnSummary, TopN, profile_table
+
+
+def _videos(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    views = rng.lognormal(10, 2, n)
+    df = pd.DataFrame({
+        'video_id': [f"v{i}" for i in rng.integers(0, n // 5, n)],
+        'view_count': views,
+        'like_count': views * rng.beta(2, 40, n),
+        'comment_count': views * rng.beta(1, 400, n),
+    })
+    df['title'] = 'Title ' + df['video_id']
+    df.loc[rng.choice(n, 200, replace=False), 'like_count'] = np.nan
+    return df
+
+
+def _chunks(df, size=700):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def test_column_summary_matches_describe():
+    df = _videos()
+    summaries = [ColumnSummary().update(chunk['like_count'].to_numpy()) for chunk in _chunks(df)]
+    summary = summaries[0]
+    for other in summaries[1:]:
+        summary.merge(other)
+
+    described = summary.describe()
+    expected = df['like_count'].describe()
+    for statistic in ['count', 'mean', 'std', 'min', 'max']:
+        assert np.isclose(described[statistic], expected[statistic], rtol=1e-9)
+    # Quartiles are approximate: compare ranks rather than values
+    values = np.sort(df['like_count'].dropna().to_numpy())
+    for q in ['25%', '50%', '75%']:
+        rank = np.searchsorted(values, described[q]) / len(values)
+        assert abs(rank - float(q[:-1]) / 100) < 0.02
+
+
+def test_correlation_matches_pandas_on_complete_rows():
+    df = _videos()
+    columns = ['view_count', 'like_count', 'comment_count']
+    comoments = CoMoments(columns)
+    for chunk in _chunks(df):
+        comoments.update(chunk[columns].to_numpy())
+
+    pdt.assert_frame_equal(comoments.correlation(), df[columns].dropna().corr(), rtol=1e-9)
+
+
+def test_top_n_matches_groupby_max_and_nlargest():
+    df = _videos()
+    top = TopN(10, 'like_count')
+    for chunk in _chunks(df):
+        top.merge(TopN(10, 'like_count').update(chunk))
+
+    expected = df.groupby('video_id')['like_count'].max().nlargest(10)
+    frame = top.to_frame()
+    assert frame['video_id'].tolist() == expected.index.tolist()
+    np.testing.assert_allclose(frame['like_count'], expected.to_numpy())
+    assert (frame['title'] == 'Title ' + frame['video_id']).all()
+
+
+def test_profile_table_streams_a_csv(tmp_path):
+    df = _videos(n=1000)
+    path = str(tmp_path / "trending_videos.csv")
+    df.to_csv(path, index=False)
+
+    profile = profile_table(path, chunksize=300)
+
+    assert profile.rows == len(df)
+    info = profile.info()
+    assert info['non_null'].to_dict() == df.notna().sum().to_dict()
+    described = profile.describe()
+    expected = df.describe()
+    for statistic in ['count', 'mean', 'std', 'min', 'max']:
+        np.testing.assert_allclose(described.loc[statistic, expected.columns], expected.loc[statistic], rtol=1e-9)
@@ -0,0 +1,45 @@
+import httplib2
+from googleapiclient.errors import HttpError
+
+from scripts.extract.fetch_trending import fetch_trending_regions
+
+
+def _item(video_id):
+    return {
+        "id": video_id,
+        "snippet": {"title": video_id, "channelTitle": "c", "categoryId": "10",
+                    "publishedAt": "2024-01-01T00:00:00Z", "description": ""},
+        "statistics": {"viewCount": "1"},
+    }
+
+
+class FakeYouTube:
+    # Two pages of two videos per region; region "XX" fails on its second page
+    def videos(self):
+        return self
+
+    def list(self, regionCode, pageToken=None, **kwargs):
+        self.request = (regionCode, pageToken)
+        return self
+
+    def execute(self):
+        region_code, page_token = self.request
+        if region_code == "XX" and page_token:
+            raise HttpError(httplib2.Response({"status": 500}), b"backend error")
+        page = 1 if page_token else 0
+        response = {"items": [_item(f"{region_code}{page}{i}") for i in range(2)]}
+        if not page_token:
+            response["nextPageToken"] = "next"
+        return response
+
+
+def test_failed_regions_keep_their_fetched_pages():
+    videos = fetch_trending_regions(["SG", "XX"], client=FakeYouTube(), max_workers=1)
+    assert videos.groupby("region_code").size().to_dict() == {"SG": 4, "XX": 2}
+    assert list(videos.attrs["incomplete_regions"]) == ["XX"]
+
+
+def test_quota_exhaustion_keeps_the_paid_pages():
+    videos = fetch_trending_regions(["SG"], client=FakeYouTube(), quota_limit=1)
+    assert videos["video_id"].tolist() == ["SG00", "SG01"]
+    assert "Quota limit" in videos.attrs["incomplete_regions"]["SG"]
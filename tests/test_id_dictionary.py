@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.id_dictionary import IdDictionary
+
+
+def _encode_in_process(path, ids):
+    dictionary = IdDictionary.load(path)
+    codes = dictionary.encode(ids)
+    dictionary.save()
+    return dict(zip(ids, codes.tolist()))
+
+
+def test_dictionaries_loaded_together_never_reuse_a_code(tmp_path):
+    path = str(tmp_path / "video_id.txt")
+    IdDictionary.load(path).encode(["a", "b"])
+
+    first = IdDictionary.load(path)
+    second = IdDictionary.load(path)
+    first_codes = first.encode(["x", "a"])
+    second_codes = second.encode(["y", "x"])
+    first.save()
+    second.save()
+
+    assert first_codes.tolist() == [2, 0]
+    assert second_codes.tolist() == [3, 2]
+    assert IdDictionary.load(path).ids.tolist() == ["a", "b", "x", "y"]
+
+
+def test_concurrent_processes_agree_on_codes(tmp_path):
+    path = str(tmp_path / "user_id.txt")
+    batches = [[f"user{i}" for i in range(start, start + 200)] for start in range(0, 800, 100)]
+    with ProcessPoolExecutor(4) as pool:
+        results = list(pool.map(_encode_in_process, [path] * len(batches), batches))
+
+    ids = IdDictionary.load(path).ids.tolist()
+    assert len(ids) == len(set(ids)) == 900
+    for codes in results:
+        assert all(ids[code] == value for value, code in codes.items())
+
+
+def test_codes_already_returned_never_change(tmp_path):
+    path = str(tmp_path / "video_id.txt")
+    dictionary = IdDictionary(["a"])
+    codes = dictionary.encode(["b", "a"])
+    dictionary.save(path)
+    IdDictionary.load(path).encode(["c"])
+
+    # New ids are assigned under the lock after the ids other processes appended
+    assert dictionary.encode(["d", "b", "a"]).tolist() == [3, 1, 0]
+    assert dictionary.encode(["b", "a"]).tolist() == codes.tolist()
+    assert IdDictionary.load(path).ids.tolist() == ["a", "b", "c", "d"]
+
+    # Ids added while detached cannot keep their codes once the file moved on
+    dictionary.path = None
+    dictionary.encode(["e"])
+    dictionary.path = path
+    IdDictionary.load(path).encode(["f"])
+    with pytest.raises(RuntimeError):
+        dictionary.save()
+    assert IdDictionary.load(path).ids.tolist() == ["a", "b", "c", "d", "f"]
+
+
+def test_saving_a_copy_never_overwrites_an_existing_dictionary(tmp_path):
+    path = str(tmp_path / "video_id.txt")
+    IdDictionary.load(path).encode(["a", "b"])
+    with pytest.raises(FileExistsError):
+        IdDictionary(["x"]).save(path)
+    assert IdDictionary.load(path).ids.tolist() == ["a", "b"]
+
+
+def test_wide_merge_joins_on_the_video_codes(tmp_path):
+    import pandas as pd
+    from scripts.user_behavior_processing import merge_user_video_data
+    from src.id_dictionary import IdDictionaries
+
+    users = pd.DataFrame({'user_id': ['u1', 'u2', 'u3'], 'video_id': ['A-b', 'x', 'ab'], 'watch_time': [1, 2, 3]})
+    videos = pd.DataFrame({'video_id': ['AB', 'zz'], 'title': ['t', 'z']})
+    merged = merge_user_video_data(users, videos, id_dictionaries=IdDictionaries(str(tmp_path)))
+
+    assert merged['user_id'].tolist() == ['u1', 'u3']
+    assert merged['video_code'].tolist() == [0, 0]
+    assert merged['video_id'].tolist() == ['ab', 'ab']
+    assert users['video_id'].tolist() == ['A-b', 'x', 'ab']
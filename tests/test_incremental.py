@@ -0,0 +1,89 @@
+import numpy as np
+
+from src.als import ImplicitALS
+from src.incremental import IncrementalUpdater, update_artifact
+from src.model_artifact import load_factor_model, load_seen_items, save_factor_model
+from src.retrieval import SeenItems
+
+N_USERS, N_ITEMS, N_GROUPS = 200, 80, 4
+
+
+def _history():
+    # Every user watches most videos of their own group (video % 4 == user % 4)
+    rng = np.random.default_rng(0)
+    users, items = [], []
+    for user in range(N_USERS):
+        group_items = np.arange(user % N_GROUPS, N_ITEMS, N_GROUPS)
+        watched = rng.choice(group_items, size=12, replace=False)
+        users += [user] * len(watched)
+        items += watched.tolist()
+    return np.array(users), np.array(items), np.ones(len(users), dtype=np.float32)
+
+
+def _top_items(model, user, k=10):
+    row = model.user_rows[user]
+    scores = model.item_factors @ model.user_factors[row]
+    return set(model.item_codes[np.argsort(-scores)[:k]].tolist())
+
+
+def _update(model, history, batch, **kwargs):
+    users, items, values = batch
+    return IncrementalUpdater(kind="als", **kwargs).update(model, users, items, values, history=history)
+
+
+def test_returning_user_keeps_old_top_items():
+    history = _history()
+    model = ImplicitALS(factors=8, iterations=10, seed=0).fit(*history)
+    before = _top_items(model, 0)
+    own_group = set(range(0, N_ITEMS, N_GROUPS))
+    assert len(before & own_group) >= 8
+
+    # User 0 returns and watches a single video of another group
+    batch = (np.array([0]), np.array([1]), np.array([1.0], dtype=np.float32))
+    for updated in (_update(model, history, batch), _update(model, None, batch)):
+        after = _top_items(updated, 0)
+        assert len(after & before) >= 8
+        assert len(after & own_group) >= 8
+
+
+def test_new_users_and_videos_are_folded_in():
+    history = _history()
+    model = ImplicitALS(factors=8, iterations=10, seed=0).fit(*history)
+    # A new user watching group 2 videos and a new video watched by group 2 users
+    new_user, new_item = N_USERS, N_ITEMS
+    batch_users = np.array([new_user] * 6 + [2, 6, 10, 14])
+    batch_items = np.array([2, 6, 10, 14, 18, 22] + [new_item] * 4)
+    batch = (batch_users, batch_items, np.ones(len(batch_users), dtype=np.float32))
+    for updated in (_update(model, history, batch), _update(model, None, batch)):
+        assert new_user in updated.user_codes and new_item in updated.item_codes
+        top = _top_items(updated, new_user)
+        assert len(top & set(range(2, N_ITEMS, N_GROUPS))) >= 8
+
+
+def test_artifact_updates_remember_earlier_batches(tmp_path):
+    history = _history()
+    model = ImplicitALS(factors=8, iterations=10, seed=0).fit(*history)
+    path = str(tmp_path / "als.fmodel")
+    save_factor_model(model, path, metadata={"algorithm": "implicit_als"},
+                      seen=SeenItems.from_codes(model, *history))
+    first = (np.array([0, 0]), np.array([1, 5]), np.array([1.0, 2.0], dtype=np.float32))
+    second = (np.array([0]), np.array([9]), np.array([1.0], dtype=np.float32))
+    update_artifact(path, *first)
+    updated = update_artifact(path, *second)
+
+    # The second update re-solves user 0 against the original history and the first batch
+    stored = load_factor_model(path, mmap=False)
+    seen = load_seen_items(path, mmap=False)
+    users, items = seen.codes(stored)
+    pairs = set(zip(users.tolist(), items.tolist(), seen.values.tolist()))
+    assert {(0, 1, 1.0), (0, 5, 2.0), (0, 9, 1.0)} <= pairs
+    assert len(seen.values) == len(history[0]) + 3
+
+    reference = save_factor_model(model, str(tmp_path / "reference.fmodel"))
+    reference = IncrementalUpdater(kind="als").update(load_factor_model(reference, mmap=False), *first,
+                                                      history=history)
+    save_factor_model(reference, str(tmp_path / "reference.fmodel"))
+    reference = load_factor_model(str(tmp_path / "reference.fmodel"), mmap=False)
+    merged = tuple(np.concatenate([a, b]) for a, b in zip(history, first))
+    reference = IncrementalUpdater(kind="als").update(reference, *second, history=merged)
+    np.testing.assert_allclose(updated.user_factors, reference.user_factors, atol=1e-5)
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from src import instrumentation
+
+SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+from src import instrumentation
+instrumentation.configure(metrics_path="logs/metrics.prom", events_path="logs/events.jsonl")
+with instrumentation.span("stage"):
+    pass
+{opt_in}
+"""
+
+
+def _run(tmp_path, opt_in=""):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", SCRIPT.format(root=root, opt_in=opt_in)], cwd=tmp_path, check=True)
+
+
+def test_processes_that_do_not_opt_in_write_no_files(tmp_path):
+    _run(tmp_path)
+    assert not (tmp_path / "logs").exists()
+
+
+def test_jobs_write_their_own_textfile_on_exit(tmp_path):
+    _run(tmp_path, 'instrumentation.export_metrics("pipeline")')
+    _run(tmp_path, 'instrumentation.export_metrics("cli-train")')
+    assert sorted(os.listdir(tmp_path / "logs")) == ["metrics.cli-train.prom", "metrics.pipeline.prom"]
+    text = (tmp_path / "logs" / "metrics.pipeline.prom").read_text()
+    assert 'youtube_pipeline_stage_runs_total{stage="stage",status="ok"} 1' in text
+
+
+def test_flush_leaves_no_staging_file(tmp_path):
+    path = str(tmp_path / "metrics.test.prom")
+    assert instrumentation.flush(path) == path
+    assert os.listdir(tmp_path) == ["metrics.test.prom"]
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o644)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src.factor_model import FactorModel
+from src.id_dictionary import IdDictionaries
+from src.incremental import update_artifact
+from src.model_artifact import load_factor_model, load_ids, load_seen_items, save_factor_model
+from src.retrieval import RetrievalEngine, SeenItems
+
+
+def _model():
+    rng = np.random.default_rng(0)
+    users = rng.integers(0, 30, 400)
+    items = rng.integers(0, 20, 400)
+    model = FactorModel(rng.normal(size=(30, 4)), rng.normal(size=(20, 4)), np.zeros(30), np.zeros(20), 0.5,
+                        np.arange(30), np.arange(20))
+    return model, users, items
+
+
+def test_seen_items_round_trip_and_mask_top_k(tmp_path):
+    model, users, items = _model()
+    path = str(tmp_path / "model.fmodel")
+    save_factor_model(model, path, seen=SeenItems.from_codes(model, users, items))
+
+    loaded = load_factor_model(path)
+    seen = load_seen_items(path)
+    item_codes, _ = RetrievalEngine(loaded, seen=seen).top_k(np.arange(30), k=5)
+    for user in range(30):
+        watched = set(items[users == user].tolist())
+        recommended = set(item_codes[user][item_codes[user] >= 0].tolist())
+        assert not recommended & watched
+
+
+def test_artifact_without_seen_items(tmp_path):
+    model, _, _ = _model()
+    path = str(tmp_path / "model.fmodel")
+    save_factor_model(model, path)
+    assert load_seen_items(path) is None
+    assert len(load_factor_model(path).user_codes) == len(model.user_codes)
+
+
+def test_update_adds_batch_to_seen_items(tmp_path):
+    model, users, items = _model()
+    path = str(tmp_path / "model.fmodel")
+    save_factor_model(model, path, seen=SeenItems.from_codes(model, users, items))
+
+    # An existing user watches a new video; a new user watches an existing one
+    updated = update_artifact(path, np.array([0, 99]), np.array([50, 3]), np.array([1.0, 1.0]), kind="als")
+    seen = load_seen_items(path)
+    assert 50 in updated.item_codes[seen.of(updated.user_rows[0])]
+    assert set(items[users == 0].tolist()) <= set(updated.item_codes[seen.of(updated.user_rows[0])].tolist())
+    assert updated.item_codes[seen.of(updated.user_rows[99])].tolist() == [3]
+
+
+def test_ids_are_stored_with_the_artifact(tmp_path):
+    model, users, items = _model()
+    id_dictionaries = IdDictionaries(str(tmp_path / "ids"))
+    # Codes 0..29 and 0..19 belong to these raw ids
+    id_dictionaries.encode_values('user_id', [f" user {code}" for code in range(30)])
+    id_dictionaries.encode_values('video_id', [f"Vid-{code}" for code in range(20)])
+    path = str(tmp_path / "model.fmodel")
+    save_factor_model(model, path, id_dictionaries=id_dictionaries)
+
+    ids = load_ids(path)
+    raw = [" user 3", "user 7 ", "stranger", None]
+    np.testing.assert_array_equal(ids.encode_values('user_id', raw),
+                                  id_dictionaries.encode_values('user_id', raw, add=False))
+    np.testing.assert_array_equal(ids.encode_values('video_id', ["VID-5", "vid 19", "x"]), [5, 19, -1])
+    assert ids['video_id'].decode(np.array([4, -1, 99])).tolist() == ["vid4", None, None]
+
+    # Folding in a batch stores the ids of the new rows too
+    id_dictionaries.encode_values('user_id', ["newcomer"])
+    update_artifact(path, np.array([30]), np.array([3]), np.array([1.0]), kind="als", id_dictionaries=id_dictionaries)
+    assert load_ids(path).encode_values('user_id', ["newcomer", "user 3"]).tolist() == [30, 3]
+
+
+def test_ids_must_cover_every_model_code(tmp_path):
+    model, _, _ = _model()
+    id_dictionaries = IdDictionaries(str(tmp_path / "ids"))
+    id_dictionaries.encode_values('user_id', ["only one"])
+    with pytest.raises(ValueError):
+        save_factor_model(model, str(tmp_path / "model.fmodel"), id_dictionaries=id_dictionaries)
+    assert load_ids(save_factor_model(model, str(tmp_path / "plain.fmodel"))) is None
@@ -0,0 +1,51 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.als import ImplicitALS
+from src.model_search import write_search_output
+
+
+def _model():
+    rng = np.random.default_rng(0)
+    return ImplicitALS(factors=2, iterations=1).fit(rng.integers(0, 5, 50), rng.integers(0, 5, 50), np.ones(50))
+
+
+def test_readers_always_see_a_complete_output(tmp_path):
+    output_dir = str(tmp_path / "search")
+    model = _model()
+    write_search_output(pd.DataFrame({'rmse': [1.0]}), model, output_dir)
+
+    missing = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            if not os.path.exists(os.path.join(output_dir, "results.csv")):
+                missing.append(output_dir)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for rmse in range(5):
+        write_search_output(pd.DataFrame({'rmse': [rmse]}), model, output_dir, metadata={'rmse': rmse})
+    done.set()
+    reader.join()
+
+    assert missing == []
+    assert os.path.islink(output_dir)
+    assert pd.read_csv(os.path.join(output_dir, "results.csv"))['rmse'].tolist() == [4]
+    versions = [name for name in os.listdir(tmp_path) if name.startswith("search.v-")]
+    assert len(versions) == 2
+
+
+def test_a_plain_directory_is_not_replaced(tmp_path):
+    output_dir = tmp_path / "search"
+    output_dir.mkdir()
+    (output_dir / "results.csv").write_text("rmse\n1.0\n")
+    with pytest.raises(FileExistsError):
+        write_search_output(pd.DataFrame({'rmse': [0.5]}), _model(), str(output_dir))
+    assert (output_dir / "results.csv").read_text() == "rmse\n1.0\n"
+    assert os.listdir(tmp_path) == ["search"]
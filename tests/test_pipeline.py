@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from src.pipeline import Artifact, Pipeline, Stage
+from src.storage import write_table
+
+CALLS = []
+
+
+def parse(raw, output_path):
+    CALLS.append('parse')
+    with open(raw) as f:
+        df = pd.DataFrame({'value': [int(line) for line in f if line.strip()]})
+    write_table(df, output_path, format='csv')
+    return df
+
+
+def total(parsed, output_path):
+    CALLS.append('total')
+    with open(output_path, 'w') as f:
+        f.write(str(int(parsed['value'].abs().sum())))
+
+
+def fail(raw):
+    CALLS.append('fail')
+    raise RuntimeError("broken stage")
+
+
+def after_fail(failing, output_path):
+    CALLS.append('after_fail')
+
+
+@pytest.fixture(autouse=True)
+def _reset_calls():
+    CALLS.clear()
+
+
+def _pipeline(tmp_path, failing=False, scale=1):
+    parsed_path, total_path = str(tmp_path / "parsed.csv"), str(tmp_path / "total.txt")
+    stages = [
+        Stage('parse', parse, inputs=['raw'], outputs=[Artifact('parsed', parsed_path, 'table', format='csv')],
+              params={'output_path': parsed_path}),
+        Stage('total', total, inputs=['parsed'], outputs=[Artifact('total', total_path, 'file')],
+              params={'output_path': total_path}),
+    ]
+    if failing:
+        failing_path = str(tmp_path / "failing.txt")
+        stages += [
+            Stage('fail', fail, inputs=['raw'], outputs=[Artifact('failing', failing_path, 'file')]),
+            Stage('after_fail', after_fail, inputs=['failing'], params={'output_path': str(tmp_path / "after.txt")}),
+        ]
+    return Pipeline(stages, sources=[Artifact('raw', str(tmp_path / "raw.txt"), 'file')],
+                    state_path=str(tmp_path / "state.json"), config_path=str(tmp_path / "config.yaml"))
+
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    (tmp_path / "raw.txt").write_text("1\n2\n3\n")
+    assert _pipeline(tmp_path).run() == {'parse': 'ran', 'total': 'ran'}
+    assert (tmp_path / "total.txt").read_text() == "6"
+    assert _pipeline(tmp_path).run() == {'parse': 'skipped', 'total': 'skipped'}
+    assert CALLS == ['parse', 'total']
+
+    # A deleted output is rebuilt even though its inputs did not change
+    (tmp_path / "total.txt").unlink()
+    assert _pipeline(tmp_path).run() == {'parse': 'skipped', 'total': 'ran'}
+    assert (tmp_path / "total.txt").read_text() == "6"
+
+
+def test_changed_inputs_rerun_only_what_they_affect(tmp_path):
+    (tmp_path / "raw.txt").write_text("1\n2\n3\n")
+    _pipeline(tmp_path).run()
+
+    (tmp_path / "raw.txt").write_text("1\n2\n4\n")
+    assert _pipeline(tmp_path).run() == {'parse': 'ran', 'total': 'ran'}
+    assert (tmp_path / "total.txt").read_text() == "7"
+
+    # Parsing a new raw file that gives the same table does not rerun the downstream stage
+    (tmp_path / "raw.txt").write_text("1\n\n2\n4\n")
+    assert _pipeline(tmp_path).run() == {'parse': 'ran', 'total': 'skipped'}
+    assert _pipeline(tmp_path).run(force=True) == {'parse': 'ran', 'total': 'ran'}
+
+
+def test_failures_block_downstream_stages_only(tmp_path):
+    (tmp_path / "raw.txt").write_text("1\n2\n")
+    statuses = _pipeline(tmp_path, failing=True).run()
+    assert statuses == {'parse': 'ran', 'total': 'ran', 'fail': 'failed', 'after_fail': 'blocked'}
+    assert 'after_fail' not in CALLS
+
+    # The failed stage is retried on the next run; the others stay up to date
+    CALLS.clear()
+    statuses = _pipeline(tmp_path, failing=True).run()
+    assert statuses == {'parse': 'skipped', 'total': 'skipped', 'fail': 'failed', 'after_fail': 'blocked'}
+    assert CALLS == ['fail']
+
+
+def test_missing_sources_fail_before_any_stage_runs(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        _pipeline(tmp_path).run()
+    assert CALLS == []
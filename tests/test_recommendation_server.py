@@ -0,0 +1,73 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from src.factor_model import FactorModel
+from src.id_dictionary import IdDictionaries
+from src.model_artifact import save_factor_model
+from src.recommendation_server import create_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    rng = np.random.default_rng(0)
+    model = FactorModel(rng.normal(size=(10, 4)), rng.normal(size=(10, 4)), np.zeros(10), np.zeros(10), 0.5,
+                        np.arange(10), np.arange(10))
+    model_path = str(tmp_path / "model.fmodel")
+    # The ids are stored with the artifact; there are no dictionaries on disk
+    id_dictionaries = IdDictionaries(str(tmp_path / "ids"))
+    id_dictionaries.encode_values('user_id', [f"u{code}" for code in range(10)])
+    id_dictionaries.encode_values('video_id', [f"v{code}" for code in range(10)])
+    save_factor_model(model, model_path, id_dictionaries=id_dictionaries)
+    server = create_server(model_path, port=0, id_dictionary_dir=str(tmp_path / "missing"), poll_interval=60)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.model_holder.stop()
+    server.server_close()
+
+
+def _request(url, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("n", ["abc", "0", "2.5", "100000"])
+def test_invalid_n_in_the_query_is_a_bad_request(server, n):
+    status, payload = _request(f"{server}/top?user_id=u&n={n}")
+    assert status == 400
+    assert "n must be" in payload["error"]
+
+
+@pytest.mark.parametrize("body", [{"user_ids": ["u"], "n": "abc"}, {"user_ids": ["u"], "n": None},
+                                  {"user_ids": ["u"], "n": 2.5}, {"user_ids": ["u"], "n": True}, ["u"],
+                                  {"user_ids": "u"}, {"user_ids": [1, 2]}, {"user_ids": [["u"]]},
+                                  {"user_ids": None}, {"user_ids": {"u": 1}}])
+def test_invalid_post_bodies_are_bad_requests(server, body):
+    status, payload = _request(f"{server}/top", body)
+    assert status == 400
+
+
+def test_valid_n_is_served(server):
+    status, payload = _request(f"{server}/top?user_id=u&n=3")
+    assert status == 200
+    assert len(payload["recommendations"]) == 3
+    status, payload = _request(f"{server}/top", {"user_ids": ["u", "v"], "n": "2"})
+    assert status == 200
+    assert [len(result["recommendations"]) for result in payload["results"]] == [2, 2]
+
+
+def test_ids_come_from_the_artifact(server):
+    status, payload = _request(f"{server}/top?user_id=u3&n=10")
+    assert status == 200
+    videos = [result["video_id"] for result in payload["recommendations"]]
+    assert videos and set(videos) <= {f"v{code}" for code in range(10)}
@@ -0,0 +1,110 @@
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from src.s3_cache import S3ReadCache
+
+
+class RecordingClient:
+    # Records the arguments of every get_object call; `before_range` runs ahead of ranged GETs
+    def __init__(self, client, before_range=None):
+        self.client = client
+        self.gets = []
+        self.before_range = before_range
+
+    def get_object(self, **kwargs):
+        self.gets.append(kwargs)
+        if 'Range' in kwargs and self.before_range is not None:
+            self.before_range()
+        return self.client.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='bucket')
+        yield client
+
+
+def _leftovers(cache_dir):
+    return [name for name in os.listdir(cache_dir) if name.endswith('.tmp')]
+
+
+def test_unchanged_objects_are_revalidated_with_a_conditional_get(s3, tmp_path):
+    s3.put_object(Bucket='bucket', Key='data.csv', Body=b'a,b\n1,2\n')
+    client = RecordingClient(s3)
+    cache = S3ReadCache(str(tmp_path / "cache"), client=client)
+
+    path = cache.get_path('bucket', 'data.csv')
+    assert cache.get_path('bucket', 'data.csv') == path
+    assert (cache.hits, cache.misses) == (1, 1)
+    etag = s3.head_object(Bucket='bucket', Key='data.csv')['ETag']
+    assert client.gets[-1]['IfNoneMatch'] == etag
+
+    # A changed object fails the condition and is downloaded again
+    s3.put_object(Bucket='bucket', Key='data.csv', Body=b'a,b\n3,4\n')
+    new_path = cache.get_path('bucket', 'data.csv')
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert open(new_path, 'rb').read() == b'a,b\n3,4\n'
+    assert not os.path.exists(path)
+    assert cache.read_dataframe('bucket', 'data.csv')['a'].tolist() == [3]
+    assert _leftovers(tmp_path / "cache") == []
+
+
+def test_large_objects_are_fetched_as_ranges_pinned_to_the_etag(s3, tmp_path):
+    body = bytes(range(256)) * 40
+    s3.put_object(Bucket='bucket', Key='big.bin', Body=body)
+    etag = s3.head_object(Bucket='bucket', Key='big.bin')['ETag']
+    client = RecordingClient(s3)
+    cache = S3ReadCache(str(tmp_path / "cache"), client=client, range_threshold=1000, range_size=3000,
+                        max_workers=3)
+
+    path = cache.get_path('bucket', 'big.bin')
+    assert open(path, 'rb').read() == body
+    ranges = [get for get in client.gets if 'Range' in get]
+    assert sorted(get['Range'] for get in ranges) == ['bytes=0-2999', 'bytes=3000-5999', 'bytes=6000-8999',
+                                                       'bytes=9000-10239']
+    assert all(get['IfMatch'] == etag for get in ranges)
+
+
+def test_an_object_changing_mid_download_is_not_cached(s3, tmp_path):
+    s3.put_object(Bucket='bucket', Key='big.bin', Body=b'x' * 5000)
+
+    def overwrite():
+        # Once, before the first range: the remaining ranges would mix the two versions
+        if len(client.gets) == 1:
+            s3.put_object(Bucket='bucket', Key='big.bin', Body=b'y' * 5000)
+
+    client = RecordingClient(s3, before_range=overwrite)
+    cache = S3ReadCache(str(tmp_path / "cache"), client=client, range_threshold=1000, range_size=2000,
+                        max_workers=1)
+    with pytest.raises(ClientError) as excinfo:
+        cache.get_path('bucket', 'big.bin')
+    assert excinfo.value.response['Error']['Code'] == 'PreconditionFailed'
+    assert _leftovers(tmp_path / "cache") == []
+    assert cache._entry('bucket', 'big.bin') is None
+
+
+def test_least_recently_used_objects_are_evicted(s3, tmp_path):
+    for key in ('a', 'b', 'c'):
+        s3.put_object(Bucket='bucket', Key=key, Body=key.encode() * 100)
+    cache = S3ReadCache(str(tmp_path / "cache"), client=s3, max_bytes=250)
+
+    path_a = cache.get_path('bucket', 'a')
+    path_b = cache.get_path('bucket', 'b')
+    cache.get_path('bucket', 'a')
+    path_c = cache.get_path('bucket', 'c')
+
+    # b was used least recently, so it makes room for c
+    assert os.path.exists(path_a) and os.path.exists(path_c)
+    assert not os.path.exists(path_b)
+    assert cache._entry('bucket', 'b') is None
+    assert cache.get_path('bucket', 'b') == path_b
+    assert not os.path.exists(path_a)
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from src.s3_sink import MIN_PART_SIZE, S3MultipartWriter, upload_dataframe
+
+
+class SlowClient:
+    # Delays part uploads and records when each call starts and ends
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _log(self, event):
+        with self._lock:
+            self.calls.append(event)
+
+    def upload_part(self, **kwargs):
+        self._log('upload_part:start')
+        time.sleep(0.2)
+        response = self.client.upload_part(**kwargs)
+        self._log('upload_part:end')
+        return response
+
+    def abort_multipart_upload(self, **kwargs):
+        self._log('abort')
+        return self.client.abort_multipart_upload(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='bucket')
+        yield client
+
+
+def _assert_nothing_left(s3):
+    assert s3.list_multipart_uploads(Bucket='bucket').get('Uploads', []) == []
+    assert s3.list_objects_v2(Bucket='bucket')['KeyCount'] == 0
+
+
+def test_abort_waits_for_in_flight_parts_and_leaves_nothing(s3):
+    client = SlowClient(s3)
+    writer = S3MultipartWriter('bucket', 'key', client=client, part_size=MIN_PART_SIZE, max_workers=2)
+    writer.write(b'x' * (2 * MIN_PART_SIZE + 10))
+    writer.abort()
+    writer.close()
+
+    assert client.calls[-1] == 'abort'
+    assert client.calls.count('upload_part:end') == client.calls.count('upload_part:start')
+    _assert_nothing_left(s3)
+
+
+class Unprintable:
+    def __str__(self):
+        raise RuntimeError("serialization failed")
+
+
+def test_failed_dataframe_upload_is_aborted(s3):
+    client = SlowClient(s3)
+    rows = MIN_PART_SIZE // 100 + 1000
+    df = pd.DataFrame({'text': ['y' * 100] * rows + [Unprintable()]})
+    with pytest.raises(RuntimeError, match="serialization failed"):
+        upload_dataframe(df, 'bucket', 'key', client=client, part_size=MIN_PART_SIZE, chunksize=rows)
+    assert 'upload_part:start' in client.calls
+    assert client.calls[-1] == 'abort'
+    _assert_nothing_left(s3)
@@ -0,0 +1,76 @@
+import pandas as pd
+
+from src import snapshot_store
+from src.aggregates import AnalyticsViews
+from src.snapshot_store import TrendingSnapshotStore
+
+
+def _chart(video_ids, views):
+    return pd.DataFrame({
+        'video_id': video_ids, 'title': video_ids, 'channel_title': 'c', 'category_id': '10',
+        'published_at': '2024-01-01T00:00:00Z', 'description': '', 'view_count': views,
+        'like_count': 1, 'comment_count': 1,
+    })
+
+
+def test_rows_committed_during_a_read_are_not_skipped(tmp_path, monkeypatch):
+    path = str(tmp_path / "trending.sqlite")
+    store = TrendingSnapshotStore(path)
+    store.append(_chart(['a'], [10]), 'US')
+
+    # Another fetch commits right after the statistics query ran
+    read_sql_query = pd.read_sql_query
+
+    def read_then_append(*args, **kwargs):
+        rows = read_sql_query(*args, **kwargs)
+        monkeypatch.undo()
+        with TrendingSnapshotStore(path) as writer:
+            writer.append(_chart(['b'], [20]), 'US')
+        return rows
+
+    monkeypatch.setattr(snapshot_store.pd, "read_sql_query", read_then_append)
+    changes, watermark = store.stats_changes_since(0)
+
+    assert changes['video_id'].tolist() == ['a']
+    later, _ = store.stats_changes_since(watermark)
+    assert later['video_id'].tolist() == ['b']
+    store.close()
+
+
+def test_views_advance_past_metadata_only_snapshots(tmp_path):
+    with TrendingSnapshotStore(str(tmp_path / "trending.sqlite")) as store:
+        store.append(_chart(['a'], [10]), 'US')
+        renamed = _chart(['a'], [10]).assign(title='renamed')
+        snapshot_id = store.append(renamed, 'US')
+        views = AnalyticsViews(str(tmp_path / "state"))
+        views.refresh_from_store(store)
+    assert views.watermark == snapshot_id
+    assert views.engagement_metrics()['title'].tolist() == ['renamed']
+
+
+def test_appends_in_the_same_second_are_kept(tmp_path):
+    path = str(tmp_path / "trending.sqlite")
+    with TrendingSnapshotStore(path) as store:
+        first = store.append(_chart(['a'], [10]), 'US', fetched_at='2024-01-01T00:00:00Z')
+        second = store.append(_chart(['a'], [11]), 'US', fetched_at='2024-01-01T00:00:00Z')
+        assert second > first
+
+
+def test_stats_are_deduplicated_per_region(tmp_path):
+    path = str(tmp_path / "trending.sqlite")
+    with TrendingSnapshotStore(path) as store:
+        us = store.append(_chart(['a'], [10]), 'US')
+        store.append(_chart(['a'], [20]), 'GB')
+        # The US chart sees the views GB already recorded: still a change for the US series
+        us_again = store.append(_chart(['a'], [20]), 'US')
+        unchanged = store.append(_chart(['a'], [20]), 'US')
+
+        changes, _ = store.stats_changes_since(0, region_code='US')
+        assert changes['snapshot_id'].tolist() == [us, us_again]
+        assert changes['view_count'].tolist() == [10, 20]
+        assert unchanged > us_again
+        assert store.latest_chart('US')['view_count'].tolist() == [20]
+
+        # A region's latest chart shows the counts of its own latest fetch
+        store.append(_chart(['a'], [30]), 'GB')
+        assert store.latest_chart('US')['view_count'].tolist() == [20]
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from src.aggregates import AnalyticsViews
+from src.snapshot_store import TrendingSnapshotStore
+from src.storage import read_table
+
+pytest.importorskip("pyspark")
+
+
+def _chart(views, description="#music #live"):
+    return pd.DataFrame({
+        'video_id': ['v1', 'v2', 'v3'],
+        'title': ['One', 'Two', 'Three'],
+        'channel_title': ['a', 'a', 'b'],
+        'category_id': ['10', '10', '20'],
+        'published_at': ['2024-01-01T00:00:00Z'] * 3,
+        'description': [description, 'no tags', '#music'],
+        'view_count': views,
+        'like_count': [10, 20, 30],
+        'comment_count': [1, 2, 3],
+    })
+
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+    session = SparkSession.builder.master("local[1]").appName("tests").getOrCreate()
+    yield session
+    session.stop()
+
+
+def test_spark_aggregates_match_the_pandas_views(tmp_path, spark):
+    from src.spark_engine import build_aggregates_spark
+
+    store_path = str(tmp_path / "trending.sqlite")
+    with TrendingSnapshotStore(store_path) as store:
+        store.append(_chart([1000, 500, 300]), 'US', fetched_at='2024-01-01T00:00:00Z')
+        # Views can drop (spam removal), and the description changes: the latest snapshot wins
+        store.append(_chart([900, 600, 300], description="#news"), 'US', fetched_at='2024-01-02T00:00:00Z')
+
+    update = AnalyticsViews(str(tmp_path / "state"))
+    with TrendingSnapshotStore(store_path) as store:
+        update.refresh_from_store(store)
+    pandas_paths = update.write(str(tmp_path / "pandas"), format='csv')
+    spark_paths = build_aggregates_spark(store_path, str(tmp_path / "spark"), output_format='csv', spark=spark)
+
+    keys = ['video_id', 'channel_title', 'Hashtag']
+    for pandas_path, spark_path in zip(pandas_paths, spark_paths):
+        expected, actual = read_table(pandas_path), read_table(spark_path)
+        key = next(column for column in keys if column in expected.columns)
+        pd.testing.assert_frame_equal(
+            actual.sort_values(key).reset_index(drop=True), expected.sort_values(key).reset_index(drop=True),
+            check_dtype=False)
+    engagement = read_table(spark_paths[0]).set_index('video_id')
+    assert engagement.loc['v1', 'view_count'] == 900
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from src.id_dictionary import IdDictionaries
+from src.star_schema import StarView, build_star
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+    videos = pd.DataFrame({
+        'video_id': [f"vid{i}" for i in range(20)],
+        'title': [f"Title {i}" for i in range(20)],
+        'category_id': rng.integers(1, 30, 20),
+    })
+    # Some interactions point at videos that are not in the trending table
+    interactions = pd.DataFrame({
+        'user_id': [f"user{i}" for i in rng.integers(0, 15, 300)],
+        'video_id': [f"vid{i}" for i in rng.integers(0, 25, 300)],
+        'watch_time': rng.gamma(2.0, 60.0, 300),
+    })
+    return interactions, videos
+
+
+def _merged(interactions, videos, video_columns):
+    # The inner join build_star replaces
+    merged = pd.merge(interactions, videos[['video_id'] + video_columns], on='video_id', how='inner')
+    return merged.drop(columns=['video_id']).reset_index(drop=True)
+
+
+def test_to_frame_matches_the_pandas_merge(tmp_path):
+    interactions, videos = _frames()
+    star = build_star(interactions, videos, IdDictionaries(str(tmp_path)))
+
+    frame = star.to_frame(['title', 'category_id'], fact_columns=['user_id', 'watch_time'])
+
+    expected = _merged(interactions, videos, ['title', 'category_id'])
+    pdt.assert_frame_equal(frame.drop(columns=['video_code']), expected, check_dtype=False)
+
+
+def test_each_video_is_stored_once(tmp_path):
+    interactions, videos = _frames()
+    star = build_star(interactions, pd.concat([videos, videos]), IdDictionaries(str(tmp_path)))
+
+    assert len(star.videos()) == len(videos)
+    assert 'video_id' not in star.fact_columns
+    assert len(star.facts()) == interactions['video_id'].isin(videos['video_id']).sum()
+
+
+def test_saved_star_reads_only_the_requested_columns(tmp_path):
+    interactions, videos = _frames()
+    star = build_star(interactions, videos, IdDictionaries(str(tmp_path / "ids")))
+    star.save(str(tmp_path / "star.csv"))
+
+    loaded = StarView.load(str(tmp_path / "star.csv"))
+    frame = loaded.to_frame(['title'], fact_columns=['user_id'])
+
+    assert list(frame.columns) == ['video_code', 'user_id', 'title']
+    expected = _merged(interactions, videos, ['title'])[['user_id', 'title']]
+    # Text columns come back dictionary-encoded from disk
+    pdt.assert_frame_equal(frame[['user_id', 'title']].astype(str), expected.astype(str))
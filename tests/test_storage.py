@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src import storage
+from src.storage import COLUMN_TYPES, get_storage_format, read_table, write_table
+
+
+def _frame():
+    return pd.DataFrame({
+        'video_id': ['a', 'b', 'a', 'c'], 'region_code': ['US', 'GB', 'US', 'US'],
+        'title': ['x', 'y', 'x', None], 'view_count': [10, 20, 30, 40], 'watch_time': [1.5, None, 2.0, 3.0],
+        'extra': [1, 2, 3, 4],
+    })
+
+
+def _records(df):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+@pytest.mark.parametrize("format", ["parquet", "csv"])
+def test_round_trip(tmp_path, format):
+    df = _frame()
+    path = str(tmp_path / "table.csv")
+    written = write_table(df, path, format=format)
+    assert written == (str(tmp_path / "table") if format == 'parquet' else path)
+
+    # Dictionary-encoded ids load as categoricals from Parquet; the values are the same
+    assert _records(read_table(written)) == _records(df)
+
+    filtered = read_table(written, columns=['video_id', 'view_count'], filters=[('region_code', '=', 'US'),
+                                                                               ('view_count', '>', 10)])
+    assert filtered.astype({'video_id': str}).to_dict('list') == {'video_id': ['a', 'c'], 'view_count': [30, 40]}
+
+
+def test_parquet_columns_use_the_shared_types(tmp_path):
+    written = write_table(_frame(), str(tmp_path / "table.csv"), format='parquet')
+    schema = pq.read_schema(os.path.join(written, os.listdir(written)[0]))
+    assert schema.field('video_id').type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field('region_code').type == COLUMN_TYPES['region_code']
+    assert schema.field('view_count').type == pa.int64()
+    assert schema.field('watch_time').type == pa.float64()
+    # Columns without a shared type keep the inferred one
+    assert schema.field('extra').type == pa.int64()
+    assert isinstance(read_table(written)['video_id'].dtype, pd.CategoricalDtype)
+
+
+def test_the_configured_format_wins_over_leftovers(tmp_path):
+    path = str(tmp_path / "table.csv")
+    _frame().head(1).to_csv(path, index=False)
+    # Only the CSV exists: it is read although Parquet is configured
+    assert storage._resolve_existing(path, 'parquet') == (path, 'csv')
+    assert len(read_table(path)) == 1
+
+    write_table(_frame(), path, format='parquet')
+    assert storage._resolve_existing(path, 'parquet') == (str(tmp_path / "table"), 'parquet')
+    assert storage._resolve_existing(path, 'csv') == (path, 'csv')
+    assert len(read_table(path)) == 4
+    with pytest.raises(FileNotFoundError):
+        storage._resolve_existing(str(tmp_path / "missing.csv"), 'parquet')
+
+
+def test_config_is_parsed_once_per_version(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("storage:\n  format: csv\n")
+    loads = []
+    safe_load = storage.yaml.safe_load
+    monkeypatch.setattr(storage.yaml, 'safe_load', lambda f: loads.append(f) or safe_load(f))
+
+    assert [get_storage_format(str(config_path)) for _ in range(3)] == ['csv'] * 3
+    assert len(loads) == 1
+    config_path.write_text("storage:\n  format: parquet\n")
+    os.utime(config_path, ns=(0, 10 ** 18))
+    assert get_storage_format(str(config_path)) == 'parquet'
+    assert len(loads) == 2
+    assert get_storage_format(str(tmp_path / "missing.yaml")) == 'parquet'
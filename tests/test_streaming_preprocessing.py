@@ -0,0 +1,50 @@
+import importlib
+
+import pandas as pd
+import pytest
+
+from src.streaming_preprocessing import preprocess_user_behavior_frame, preprocess_user_behavior_streaming
+
+
+def test_reusing_missing_statistics_fails_instead_of_refitting(tmp_path):
+    data_path = str(tmp_path / "user_behavior.csv")
+    pd.DataFrame({'user_id': ['u1', 'u2'], 'video_id': ['v1', 'v2'], 'watch_time': ['10%', '20%']}).to_csv(
+        data_path, index=False)
+    output_path = str(tmp_path / "preprocessed.csv")
+
+    with pytest.raises(FileNotFoundError):
+        preprocess_user_behavior_streaming(data_path, output_path, stats_path=str(tmp_path / "stats.json"),
+                                           output_format='csv', refit=False)
+    with pytest.raises(FileNotFoundError):
+        preprocess_user_behavior_streaming(data_path, output_path, output_format='csv', refit=False)
+
+    stats_path = str(tmp_path / "stats.json")
+    preprocess_user_behavior_streaming(data_path, output_path, stats_path=stats_path, output_format='csv')
+    preprocess_user_behavior_streaming(data_path, output_path, stats_path=stats_path, output_format='csv',
+                                       refit=False)
+    assert len(pd.read_csv(output_path)) == 2
+
+
+@pytest.mark.parametrize("module", ["scripts.preprocessing.user_behavior_preprocessing",
+                                    "scripts.extract.data_processing.preprocess_user_behavior"])
+def test_in_memory_and_streaming_results_match(tmp_path, module):
+    preprocess_user_behavior = importlib.import_module(module).preprocess_user_behavior
+    data_path = str(tmp_path / "user_behavior.csv")
+    # An odd number of values per column, so the streaming median sketch is exact
+    pd.DataFrame({
+        'user_id': ['u1', 'u2', 'u3', 'u4', 'u5', 'u6'], 'video_id': ['v1', 'v2', 'v3', 'v4', 'v5', 'v6'],
+        'watch_time': ['10%', None, '30%', '50%', '20%', '40%'], 'CTR': ['1.5%', '2%', '2%', None, '4%', '1%'],
+        'likes': [3, 1, None, 7, 5, 9], 'shares': [2, 2, 2, 2, 2, 2],
+    }).to_csv(data_path, index=False)
+
+    in_memory = preprocess_user_behavior(data_path, str(tmp_path / "in_memory.csv"), output_format='csv',
+                                         engine='pandas')
+    preprocess_user_behavior(data_path, str(tmp_path / "streamed.csv"), output_format='csv', chunksize=2,
+                             engine='pandas')
+    streamed = pd.read_csv(tmp_path / "streamed.csv")
+    pd.testing.assert_frame_equal(in_memory.reset_index(drop=True), streamed, check_dtype=False)
+    assert in_memory['watch_time'].tolist() == [0.0, 0.5, 0.5, 1.0, 0.25, 0.75]
+    assert in_memory['shares'].tolist() == [0.0] * 6
+
+    with pytest.raises(ValueError):
+        preprocess_user_behavior_frame(pd.DataFrame())
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from src.storage import read_table
+from src.synthetic_data import generate_interactions, generate_videos, write_synthetic_dataset, zipf_probabilities
+
+
+def test_generation_is_reproducible_per_seed():
+    pdt.assert_frame_equal(generate_videos(50, seed=3), generate_videos(50, seed=3))
+    pdt.assert_frame_equal(generate_interactions(100, ['a', 'b'], 10, seed=3, start_row=7),
+                           generate_interactions(100, ['a', 'b'], 10, seed=3, start_row=7))
+    assert not generate_videos(50, seed=3)['video_id'].equals(generate_videos(50, seed=4)['video_id'])
+
+
+def test_videos_are_unique_and_ranked_by_popularity():
+    videos = generate_videos(500, seed=0, vocabulary_size=1000)
+
+    assert videos['video_id'].is_unique
+    assert videos['video_id'].str.len().eq(11).all()
+    # Rank 0 is the most popular video
+    assert videos['view_count'].idxmax() == 0
+
+
+def test_video_draws_follow_the_zipf_law():
+    video_ids = [f"v{i}" for i in range(20)]
+    interactions = generate_interactions(200_000, video_ids, 100, seed=0)
+
+    # Same frequencies pandas reports for a rng.choice(video_ids, p=zipf) sample
+    observed = interactions['video_id'].value_counts(normalize=True, sort=False).reindex(video_ids)
+    np.testing.assert_allclose(observed.to_numpy(), zipf_probabilities(20), atol=0.005)
+
+
+def test_timestamps_increase_across_chunks():
+    first = generate_interactions(100, ['a'], 10, seed=0, start_row=0)
+    second = generate_interactions(100, ['a'], 10, seed=0, start_row=100)
+
+    times = pd.to_datetime(pd.concat([first['timestamp'], second['timestamp']]))
+    assert times.is_monotonic_increasing
+
+
+def test_chunked_dataset_matches_the_generated_chunks(tmp_path):
+    paths = write_synthetic_dataset(str(tmp_path), n_rows=250, n_videos=30, n_users=20, chunksize=100)
+
+    videos = read_table(paths['videos'])
+    interactions = read_table(paths['interactions'])
+    expected = pd.concat([generate_interactions(min(100, 250 - start), videos['video_id'].to_numpy(), 20,
+                                                start_row=start) for start in range(0, 250, 100)])
+    assert len(videos) == 30
+    assert interactions['user_id'].astype(str).tolist() == expected['user_id'].astype(str).tolist()
+    np.testing.assert_allclose(interactions['rating'], expected['rating'])
@@ -0,0 +1,43 @@
+from scripts.test_youtube_recommendations import VideoDetailsCache, VideoDetailsService
+
+
+class FakeYouTube:
+    # Returns every requested id except the deleted ones
+    def __init__(self, deleted=()):
+        self.deleted = set(deleted)
+        self.requested = []
+
+    def videos(self):
+        return self
+
+    def list(self, id, part, **kwargs):
+        self.request = (id.split(","), part.split(","))
+        return self
+
+    def execute(self):
+        ids, parts = self.request
+        self.requested.extend(ids)
+        return {"items": [dict({"id": video_id}, **{part: {} for part in parts})
+                          for video_id in ids if video_id not in self.deleted]}
+
+
+def test_ids_the_api_does_not_return_are_cached_as_missing():
+    client = FakeYouTube(deleted={"gone"})
+    cache = VideoDetailsCache(":memory:", missing_ttl=60)
+    service = VideoDetailsService(cache=cache, client=client, max_workers=1)
+
+    assert service.lookup(["a", "gone"])["video_id"].tolist() == ["a"]
+    assert service.lookup(["a", "gone"])["video_id"].tolist() == ["a"]
+    assert client.requested == ["a", "gone"]
+
+    # The negative entry expires after its own TTL
+    assert cache.get_missing(["gone"]) == {"gone"}
+    assert cache.get_missing(["gone"], now=cache._conn.execute(
+        "SELECT checked_at FROM missing_videos").fetchone()[0] + 61) == set()
+
+
+def test_videos_that_come_back_are_no_longer_missing():
+    cache = VideoDetailsCache(":memory:")
+    cache.put_missing(["v"])
+    cache.put([{"id": "v", "snippet": {}}], ["snippet"])
+    assert cache.get_missing(["v"]) == set()